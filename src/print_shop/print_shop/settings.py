@@ -145,6 +145,31 @@ LOGIN_REDIRECT_URL = "/profile/"
 LOGOUT_REDIRECT_URL = "/login/"
 LOGIN_URL = "/login/"
 
+# Minutes a custom cart item keeps its grams reserved without cart activity
+CART_HOLD_MINUTES = env.int("CART_HOLD_MINUTES", default=60)
+
+# How a spool is picked among those that fit: "fifo" (oldest first)
+# or "best_fit" (least material left first, to use up nearly empty spools)
+SPOOL_ALLOCATION_POLICY = env("SPOOL_ALLOCATION_POLICY", default="fifo")
+
+# Answer spool capacity lookups from an in-process sorted index,
+# reloaded from the database every SPOOL_INDEX_RESYNC_SECONDS
+SPOOL_INDEX_ENABLED = env.bool("SPOOL_INDEX_ENABLED", default=False)
+SPOOL_INDEX_RESYNC_SECONDS = env.int("SPOOL_INDEX_RESYNC_SECONDS", default=300)
+
+# Seconds a ledger row must age before the inventory feed serves it,
+# longer than any transaction that writes ledger rows
+INVENTORY_FEED_LAG_SECONDS = env.int("INVENTORY_FEED_LAG_SECONDS", default=30)
+
+# Cache backend from CACHE_URL, e.g. redis://127.0.0.1:6379/1
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+
+# Seconds a custom item price quote stays cached, 0 turns the cache off.
+# Needs a CACHE_URL shared by every worker process
+QUOTE_CACHE_SECONDS = env.int("QUOTE_CACHE_SECONDS", default=0)
+
 # Media files (uploads for FileField and ImageField)
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
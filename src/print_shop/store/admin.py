@@ -6,12 +6,17 @@ from store.models import (
     Suppliers,
     RawMaterials,
     InventoryChange,
+    InventoryBalance,
+    LowStockAlert,
+    InventoryAdjustment,
+    InventoryCheckpoint,
     Models,
     Shipping,
     Orders,
     OrderItems,
     FulfillmentStatus,
 )
+from store.repricing import reprice_premade_items
 
 
 class UserProfileAdmin(admin.ModelAdmin):
@@ -20,14 +25,36 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ("user__is_staff", "user__is_active")
 
 
+class OrderItemsAdmin(admin.ModelAdmin):
+    actions = ["reprice_premade"]
+
+    @admin.action(description="Reprice selected unsold premade items")
+    def reprice_premade(self, request, queryset):
+        result = reprice_premade_items(queryset)
+        message = (
+            f"Repriced {result['repriced']} of {result['checked']} unsold premade "
+            f"items, total change {result['total_delta']:+}."
+        )
+        if result["skipped"]:
+            message += (
+                f" {result['skipped']} items weigh differently at the new costs "
+                "and must be re-saved from the premade item form."
+            )
+        self.message_user(request, message)
+
+
 admin.site.register(UserProfiles, UserProfileAdmin)
 admin.site.register(Materials)
 admin.site.register(Filament)
 admin.site.register(Suppliers)
 admin.site.register(RawMaterials)
 admin.site.register(InventoryChange)
+admin.site.register(InventoryBalance)
+admin.site.register(LowStockAlert)
+admin.site.register(InventoryAdjustment)
+admin.site.register(InventoryCheckpoint)
 admin.site.register(Models)
 admin.site.register(Shipping)
 admin.site.register(Orders)
-admin.site.register(OrderItems)
+admin.site.register(OrderItems, OrderItemsAdmin)
 admin.site.register(FulfillmentStatus)
@@ -0,0 +1,114 @@
+"""
+Replay of past orders under each spool allocation policy
+
+FIFO picks the oldest spool that fits, so stock rotates.
+Best fit picks the fitting spool with the least material left,
+so small jobs finish off nearly empty spools instead of leaving scraps.
+Replaying the order history through both shows which one wastes fewer grams
+before switching SPOOL_ALLOCATION_POLICY.
+"""
+
+from collections import defaultdict
+from store.models import (
+    ALLOCATION_POLICIES,
+    InventoryChange,
+    OrderItems,
+    RawMaterials,
+)
+
+
+def load_order_history():
+    """
+    Read every spool as purchased and every single-spool order item in the
+    order they were placed. An item's time is the date of the ledger row
+    it was allocated from, which every item has.
+
+    Returns:
+        (spools, lines) where spools are dicts with 'id', 'Filament_id',
+        'MaterialWeightPurchased' and 'PurchasedDate', and lines are dicts
+        with 'Filament_id', 'TotalWeight' and 'date'
+    """
+    spools = list(
+        RawMaterials.objects.order_by("PurchasedDate", "id").values(
+            "id", "Filament_id", "MaterialWeightPurchased", "PurchasedDate"
+        )
+    )
+    lines = [
+        {"Filament_id": filament_id, "TotalWeight": weight, "date": date}
+        for filament_id, weight, date in OrderItems.objects.filter(
+            allocations__isnull=True
+        )
+        .order_by("InventoryChange__InventoryChangeDate", "id")
+        .values_list(
+            "InventoryChange__RawMaterial__Filament_id",
+            "TotalWeight",
+            "InventoryChange__InventoryChangeDate",
+        )
+    ]
+    return spools, lines
+
+
+def replay_allocation(spools, lines, policy):
+    """
+    Allocate past order lines to fresh spools under one policy.
+
+    A line fits a spool bought by the line's date that holds its weight
+    plus the safety margin, as in InventoryChangeManager.find_for_weight,
+    and among fitting spools the policy's ordering picks one.
+    Leftovers smaller than the lightest line of the filament count as scraps.
+
+    Args:
+        spools: Spool dicts as returned by load_order_history
+        lines: Line dicts in placement order as returned by load_order_history
+        policy: Key of ALLOCATION_POLICIES
+
+    Returns:
+        dict with 'placed', 'unplaced', 'unplaced_grams', 'spools_opened'
+        and 'scrap_grams'
+    """
+    ordering = ALLOCATION_POLICIES[policy]
+    spools_by_filament = defaultdict(list)
+    for spool in spools:
+        spools_by_filament[spool["Filament_id"]].append(
+            {
+                "id": spool["id"],
+                "PurchasedDate": spool["PurchasedDate"],
+                "QuantityWeightAvailable": spool["MaterialWeightPurchased"],
+                "opened": False,
+            }
+        )
+
+    lightest = {}
+    result = {
+        "placed": 0,
+        "unplaced": 0,
+        "unplaced_grams": 0,
+        "spools_opened": 0,
+        "scrap_grams": 0,
+    }
+    for line in lines:
+        filament_id, weight = line["Filament_id"], line["TotalWeight"]
+        needed = InventoryChange.objects.weight_with_margin(weight)
+        lightest[filament_id] = min(lightest.get(filament_id, needed), needed)
+        fitting = [
+            spool
+            for spool in spools_by_filament[filament_id]
+            if spool["PurchasedDate"] <= line["date"]
+            and spool["QuantityWeightAvailable"] >= needed
+        ]
+        if not fitting:
+            result["unplaced"] += 1
+            result["unplaced_grams"] += weight
+            continue
+        spool = min(fitting, key=lambda s: tuple(s[field] for field in ordering))
+        spool["QuantityWeightAvailable"] -= weight
+        result["spools_opened"] += not spool["opened"]
+        spool["opened"] = True
+        result["placed"] += 1
+
+    for filament_id, filament_spools in spools_by_filament.items():
+        for spool in filament_spools:
+            left = spool["QuantityWeightAvailable"]
+            if spool["opened"] and 0 < left < lightest.get(filament_id, 0):
+                result["scrap_grams"] += left
+    return result
@@ -0,0 +1,35 @@
+"""
+System checks for the store app
+"""
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends that keep entries inside a single process
+PER_PROCESS_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register()
+def check_quote_cache_backend(app_configs, **kwargs):
+    """
+    Quote cache stamps are bumped in the writing process only, so quote
+    caching needs a cache every worker shares.
+    """
+    if not settings.QUOTE_CACHE_SECONDS:
+        return []
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [
+        Error(
+            "QUOTE_CACHE_SECONDS is set but the default cache is not shared "
+            "between processes.",
+            hint="Set CACHE_URL to a shared backend such as Redis or "
+            "Memcached, or set QUOTE_CACHE_SECONDS=0.",
+            obj=backend,
+            id="store.E001",
+        )
+    ]
@@ -0,0 +1,114 @@
+"""
+Fixed-point pricing kernel
+
+OrderItems prices an item in three rounded steps: the weight to whole grams,
+the material cost and cost of goods to ten-thousandths of a dollar, and the
+price to cents, all ROUND_HALF_UP. required_weight and price_components do
+that with Decimal and are what OrderItems runs.
+
+Every input is stored with a fixed number of decimal places (two, four for a
+computed infill multiplier), so each step is also exact on integers:
+
+- the unrounded weight in 10**-8 grams (volume x base infill x multiplier x
+  density x quantity), halved up to grams;
+- costs in 10**-4 dollars, which weight x unit cost x wear already is,
+  so the first two quantize steps need no rounding;
+- cost of goods x markup in 10**-6 dollars, halved up to cents.
+
+weight_grams and price_units are that integer version. They pay off in loops
+pricing many items, which convert each model's and spool's amounts once with
+to_units and then price every item without creating Decimals. Amounts that
+are not exact in those units, or past Decimal's 28 digit precision, must go
+through the Decimal functions instead. The check_pricing_kernel command
+compares both versions on random inputs and times them.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+# Decimal's default context keeps 28 significant digits and would start
+# rounding intermediate products past this, so larger amounts need Decimal
+EXACT_LIMIT = 10**28
+
+
+def round_half_up_div(numerator, denominator):
+    """numerator / denominator rounded half up, for non-negative integers or arrays"""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def to_units(value, places):
+    """
+    A non-negative amount as an integer number of 10**-places,
+    or None when it is not exact in those units.
+    """
+    try:
+        numerator, denominator = value.as_integer_ratio()
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    units, remainder = divmod(numerator * 10**places, denominator)
+    return units if not remainder and units >= 0 else None
+
+
+def weight_grams(volume, base_infill, multiplier, density, quantity):
+    """
+    Integer version of required_weight: volume in cm3, base infill and density
+    in hundredths, multiplier in ten-thousandths. None past EXACT_LIMIT.
+    """
+    size = volume * base_infill * multiplier * density * quantity
+    if size >= EXACT_LIMIT:
+        return None
+    return max(1, round_half_up_div(size, 10**8))
+
+
+def price_units(grams, unit_cost, wear, fixed_cost, quantity, markup):
+    """
+    Integer version of price_components: unit cost, wear, fixed cost and markup
+    in hundredths. Returns the material cost and cost of goods in ten-thousandths
+    of a dollar and the price in cents, or None past EXACT_LIMIT.
+    """
+    material_cost = grams * unit_cost * wear
+    cost_of_goods = fixed_cost * quantity * 100 + material_cost
+    if cost_of_goods * markup >= EXACT_LIMIT:
+        return None
+    return (
+        material_cost,
+        cost_of_goods,
+        round_half_up_div(cost_of_goods * markup, 10**4),
+    )
+
+
+def required_weight(volume, base_infill, multiplier, density, quantity):
+    """
+    Grams needed for an item: the print volume at the base infill, scaled by
+    the infill multiplier, times density and quantity, rounded half up, at least 1.
+    """
+    volume_cm3 = Decimal(volume) * Decimal(base_infill) * Decimal(multiplier)
+    weight = volume_cm3 * Decimal(density) * Decimal(quantity)
+    return max(1, int(weight.quantize(Decimal("1"), rounding=ROUND_HALF_UP)))
+
+
+def price_components(weight, unit_cost, wear, fixed_cost, quantity, markup):
+    """
+    Price components of an item weighing the given grams.
+
+    Returns:
+        dict: 'weight', 'material_cost', 'fixed_cost', 'cost_of_goods' and
+        'price' as Decimals
+    """
+    weight = Decimal(weight)
+    fixed_cost = Decimal(fixed_cost) * Decimal(quantity)
+    material_cost = (weight * Decimal(unit_cost) * Decimal(wear)).quantize(
+        Decimal("0.0001"), rounding=ROUND_HALF_UP
+    )
+    cost_of_goods = (fixed_cost + material_cost).quantize(
+        Decimal("0.0001"), rounding=ROUND_HALF_UP
+    )
+    price = (cost_of_goods * Decimal(markup)).quantize(
+        Decimal("0.01"), rounding=ROUND_HALF_UP
+    )
+    return {
+        "weight": weight,
+        "material_cost": material_cost,
+        "fixed_cost": fixed_cost,
+        "cost_of_goods": cost_of_goods,
+        "price": price,
+    }
@@ -0,0 +1,254 @@
+"""
+Inventory forecasting for raw materials
+
+Ledger history for every raw material is loaded in one query and
+reduced with NumPy, so the forecast costs the same handful of array
+operations whether there are ten spools or ten thousand. Reorders are
+forecast per filament: any spool of a filament can fill its orders,
+so usage and stock on hand are summed over its spools.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from store.models import (
+    FulfillmentStatus,
+    InventoryBalance,
+    InventoryChange,
+    OrderItems,
+)
+
+SECONDS_PER_DAY = 86400
+# Stock-outs further out than this are reported as no forecast
+MAX_FORECAST_DAYS = 3650
+
+
+def forecast_reorders(lookback_days=90, now=None):
+    """
+    Estimate daily consumption per filament and predict stock-out and reorder dates.
+
+    Each spool's net grams consumed across the lookback window is its first
+    ledger row in the window minus its current balance. A filament's daily
+    usage is the sum over its spools divided by the days between its first
+    row in the window and now, and its stock is the sum of its spool balances.
+    The reorder-by date is the stock-out date minus the longest
+    ReorderLeadTime among the filament's spools.
+
+    Args:
+        lookback_days: How many days of ledger history to learn usage from
+        now: Reference time (default: timezone.now())
+
+    Returns:
+        dict keyed by filament id with 'daily_usage' (grams per day),
+        'days_until_stockout', 'stockout_date', 'reorder_by' and 'reorder_now'.
+        Dates and days are None for filaments with no measurable usage
+        or a stock-out beyond MAX_FORECAST_DAYS.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=lookback_days)
+
+    balances = list(
+        InventoryBalance.objects.values_list(
+            "RawMaterial_id",
+            "RawMaterial__Filament_id",
+            "QuantityWeightAvailable",
+            "RawMaterial__ReorderLeadTime",
+        ).order_by("RawMaterial_id")
+    )
+    if not balances:
+        return {}
+    material_ids, material_filaments, material_stock, material_lead_times = (
+        np.array(column) for column in zip(*balances)
+    )
+    material_stock = material_stock.astype(float)
+    filament_ids, spool_filament = np.unique(material_filaments, return_inverse=True)
+    stock = np.bincount(spool_filament, weights=material_stock)
+    lead_times = np.zeros(len(filament_ids))
+    np.maximum.at(lead_times, spool_filament, material_lead_times.astype(float))
+
+    history = list(
+        InventoryChange.objects.filter(InventoryChangeDate__gte=since)
+        .order_by("RawMaterial_id", "InventoryChangeDate", "id")
+        .values_list("RawMaterial_id", "InventoryChangeDate", "QuantityWeightAvailable")
+    )
+
+    daily_usage = np.zeros(len(filament_ids))
+    if history:
+        history_ids = np.fromiter((row[0] for row in history), dtype=np.int64)
+        history_days = np.fromiter(
+            ((now - row[1]).total_seconds() / SECONDS_PER_DAY for row in history),
+            dtype=float,
+        )
+        history_quantity = np.fromiter((row[2] for row in history), dtype=float)
+
+        # Rows are sorted by material, so the first row of each material
+        # is where the material id changes
+        seen_ids, first_rows = np.unique(history_ids, return_index=True)
+        positions = np.searchsorted(material_ids, seen_ids)
+        matched = (positions < len(material_ids)) & (
+            material_ids[np.minimum(positions, len(material_ids) - 1)] == seen_ids
+        )
+        positions, first_rows = positions[matched], first_rows[matched]
+
+        filaments = spool_filament[positions]
+        consumed = np.zeros(len(filament_ids))
+        np.add.at(
+            consumed,
+            filaments,
+            np.maximum(history_quantity[first_rows] - material_stock[positions], 0.0),
+        )
+        span_days = np.zeros(len(filament_ids))
+        np.maximum.at(span_days, filaments, history_days[first_rows])
+        daily_usage = consumed / np.maximum(span_days, 1.0)
+
+    with np.errstate(divide="ignore"):
+        days_until_stockout = np.where(daily_usage > 0, stock / daily_usage, np.inf)
+    days_until_reorder = days_until_stockout - lead_times
+
+    forecasts = {}
+    for index, filament_id in enumerate(filament_ids.tolist()):
+        if days_until_stockout[index] <= MAX_FORECAST_DAYS:
+            stockout_date = now + timedelta(days=float(days_until_stockout[index]))
+            reorder_by = now + timedelta(days=float(days_until_reorder[index]))
+            forecasts[filament_id] = {
+                "daily_usage": round(float(daily_usage[index]), 2),
+                "days_until_stockout": round(float(days_until_stockout[index]), 1),
+                "stockout_date": stockout_date,
+                "reorder_by": reorder_by.date(),
+                "reorder_now": bool(days_until_reorder[index] <= 0),
+            }
+        else:
+            forecasts[filament_id] = {
+                "daily_usage": 0.0,
+                "days_until_stockout": None,
+                "stockout_date": None,
+                "reorder_by": None,
+                "reorder_now": False,
+            }
+    return forecasts
+
+
+BACKLOG_STATUSES = [
+    FulfillmentStatus.Status.PAID,
+    FulfillmentStatus.Status.PRINTING,
+]
+
+
+def simulate_backlog(print_margin=Decimal("1.15")):
+    """
+    Simulate printing the PAID/PRINTING backlog and find the lines that run short.
+
+    Orders are printed first come, first served. Each line draws
+    TotalWeight * print_margin grams from the pool of its filament, which is
+    every spool of that filament in the FIFO order of InventoryChangeManager.available().
+    A spool's physical grams are its balance plus the grams still reserved for
+    backlog lines, since those have not been printed yet.
+    The margin stands for print waste; without it a reserved backlog can never run short.
+
+    Args:
+        print_margin: Multiplier on TotalWeight for grams actually used when printing
+
+    Returns:
+        list of dicts, one per short line in print order, with 'order_id',
+        'order_item_id', 'filament_id', 'raw_material_id' (the spool the line
+        starts on), 'required', 'shortfall' (grams) and 'date'
+        (the order's estimated ship date, or its creation date).
+    """
+    latest_status = (
+        FulfillmentStatus.objects.filter(Order=OuterRef("Order"))
+        .order_by("-StatusChangeDate", "-id")
+        .values("OrderStatus")[:1]
+    )
+    lines = list(
+        OrderItems.objects.annotate(order_status=Subquery(latest_status))
+        .filter(order_status__in=BACKLOG_STATUSES)
+        .order_by("Order__CreatedAt", "Order_id", "id")
+        .values_list(
+            "id",
+            "Order_id",
+            "InventoryChange__RawMaterial_id",
+            "InventoryChange__RawMaterial__Filament_id",
+            "TotalWeight",
+            "Order__EstimatedShipDate",
+            "Order__CreatedAt",
+        )
+    )
+    if not lines:
+        return []
+    item_ids, order_ids, line_spools, line_filaments, weights, ship_dates, created = (
+        zip(*lines)
+    )
+    line_spools = np.array(line_spools, dtype=np.int64)
+    line_filaments = np.array(line_filaments, dtype=np.int64)
+    weights = np.array(weights, dtype=float)
+
+    spools = list(
+        InventoryBalance.objects.filter(
+            RawMaterial__Filament_id__in=np.unique(line_filaments).tolist()
+        )
+        .order_by("PurchasedDate", "id")
+        .values_list(
+            "RawMaterial_id", "RawMaterial__Filament_id", "QuantityWeightAvailable"
+        )
+    )
+    spool_ids = np.array([row[0] for row in spools], dtype=np.int64)
+    spool_filaments = np.array([row[1] for row in spools], dtype=np.int64)
+    physical = np.array([row[2] for row in spools], dtype=float)
+    # Add back the grams reserved for backlog lines on each spool
+    if len(spool_ids):
+        sorter = np.argsort(spool_ids)
+        positions = np.searchsorted(spool_ids, line_spools, sorter=sorter)
+        matches = sorter[np.minimum(positions, len(spool_ids) - 1)]
+        known = spool_ids[matches] == line_spools
+        np.add.at(physical, matches[known], weights[known])
+    physical = np.maximum(physical, 0.0)
+
+    # Spools grouped by filament, FIFO within each filament, with a running supply
+    spool_order = np.lexsort((np.arange(len(spool_ids)), spool_filaments))
+    spool_filaments = spool_filaments[spool_order]
+    spool_ids = spool_ids[spool_order]
+    supply = np.cumsum(physical[spool_order])
+    filament_starts = np.searchsorted(spool_filaments, spool_filaments, side="left")
+    supply_before = np.concatenate(([0.0], supply))[filament_starts]
+    supply = supply - supply_before
+
+    # Lines grouped by filament, print order within each filament
+    line_order = np.lexsort((np.arange(len(weights)), line_filaments))
+    demand = weights[line_order] * float(print_margin)
+    filaments = line_filaments[line_order]
+    used = np.cumsum(demand)
+    line_starts = np.searchsorted(filaments, filaments, side="left")
+    used = used - np.concatenate(([0.0], used))[line_starts]
+
+    # Total supply of each line's filament and the spool its first gram comes from
+    first = np.searchsorted(spool_filaments, filaments, side="left")
+    last = np.searchsorted(spool_filaments, filaments, side="right")
+    has_spools = last > first
+    # A trailing zero stands in for the supply of filaments with no spools
+    total_supply = np.append(supply, 0.0)[np.where(has_spools, last - 1, len(supply))]
+    shortfall = np.minimum(np.maximum(used - total_supply, 0.0), demand)
+
+    shortages = []
+    for index in sorted(np.flatnonzero(shortfall > 0), key=lambda i: line_order[i]):
+        line = line_order[index]
+        spool = None
+        if has_spools[index]:
+            filament_supply = supply[first[index] : last[index]]
+            start = np.searchsorted(
+                filament_supply, used[index] - demand[index], "right"
+            )
+            spool = int(spool_ids[first[index] + min(start, len(filament_supply) - 1)])
+        shortages.append(
+            {
+                "order_id": order_ids[line],
+                "order_item_id": item_ids[line],
+                "filament_id": int(filaments[index]),
+                "raw_material_id": spool,
+                "required": round(float(demand[index]), 1),
+                "shortfall": round(float(shortfall[index]), 1),
+                "date": ship_dates[line] or created[line],
+            }
+        )
+    return shortages
@@ -6,3 +6,9 @@ class InventoryChangeForm(forms.ModelForm):
     class Meta:
         model = InventoryChange
         fields = "__all__"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # A correction stays on the spool of the row it corrects
+        if self.instance.pk:
+            self.fields["RawMaterial"].disabled = True
@@ -0,0 +1,198 @@
+import csv
+import io
+import uuid
+from decimal import Decimal
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from openpyxl import load_workbook
+from store.models import (
+    RawMaterials,
+    InventoryChange,
+    InventoryBalance,
+    Suppliers,
+    Filament,
+)
+from store.quote_cache import bump_all_filaments
+from store.spool_index import invalidate_index
+
+REQUIRED_COLUMNS = [
+    "Supplier",
+    "Filament",
+    "Cost",
+    "MaterialWeightPurchased",
+    "MaterialDensity",
+    "ReorderLeadTime",
+]
+OPTIONAL_COLUMNS = ["BrandName", "WearAndTearMultiplier"]
+
+
+def cell_to_text(value):
+    """
+    Convert spreadsheet floats to text so they validate like CSV values,
+    e.g. 19.99 stays 19.99 instead of a long binary expansion and 1000.0 becomes 1000
+    """
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else str(value)
+    return value
+
+
+def read_sheet(upload):
+    """
+    Read a CSV or XLSX upload into a list of dictionaries keyed by column header.
+    Only the first worksheet of an XLSX workbook is read.
+    """
+    if upload.name.lower().endswith(".xlsx"):
+        workbook = load_workbook(upload, read_only=True, data_only=True)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [str(header or "").strip() for header in next(rows, [])]
+        return [
+            dict(zip(headers, (cell_to_text(value) for value in row)))
+            for row in rows
+            if any(value not in (None, "") for value in row)
+        ]
+
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig")
+    return [
+        {(key or "").strip(): value for key, value in row.items()}
+        for row in csv.DictReader(text)
+        if any((value or "").strip() for value in row.values())
+    ]
+
+
+def lookup_by_id_or_name(value, by_id, by_name):
+    """Find a supplier or filament by its id or its unique name"""
+    value = str(value or "").strip()
+    if value.isdigit() and int(value) in by_id:
+        return by_id[int(value)]
+    matches = by_name.get(value.lower(), [])
+    return matches[0] if len(matches) == 1 else None
+
+
+class RawMaterialsImportForm(forms.Form):
+    """
+    Form for importing a supplier delivery sheet of raw materials (spools).
+    Every row is validated before anything is saved;
+    the import is all or nothing and per-row errors are kept in row_errors.
+    """
+
+    file = forms.FileField(
+        help_text="CSV or XLSX with columns: "
+        + ", ".join(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.row_errors = []
+        self.raw_materials = []
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not upload.name.lower().endswith((".csv", ".xlsx")):
+            raise ValidationError("Upload a .csv or .xlsx file.")
+        try:
+            rows = read_sheet(upload)
+        except Exception as e:
+            raise ValidationError(f"Could not read the file: {e}")
+
+        if not rows:
+            raise ValidationError("The file has no rows to import.")
+        missing = [column for column in REQUIRED_COLUMNS if column not in rows[0]]
+        if missing:
+            raise ValidationError(f"Missing columns: {', '.join(missing)}")
+
+        suppliers = {supplier.id: supplier for supplier in Suppliers.objects.all()}
+        filaments = {filament.id: filament for filament in Filament.objects.all()}
+        suppliers_by_name = {}
+        for supplier in suppliers.values():
+            suppliers_by_name.setdefault(supplier.Name.lower(), []).append(supplier)
+        filaments_by_name = {}
+        for filament in filaments.values():
+            filaments_by_name.setdefault(filament.Name.lower(), []).append(filament)
+
+        for row_number, row in enumerate(rows, start=2):
+            errors = []
+            supplier = lookup_by_id_or_name(
+                row.get("Supplier"), suppliers, suppliers_by_name
+            )
+            if not supplier:
+                errors.append(f"Unknown or ambiguous supplier '{row.get('Supplier')}'")
+            filament = lookup_by_id_or_name(
+                row.get("Filament"), filaments, filaments_by_name
+            )
+            if not filament:
+                errors.append(f"Unknown or ambiguous filament '{row.get('Filament')}'")
+
+            raw_material = RawMaterials(
+                Supplier=supplier,
+                Filament=filament,
+                BrandName=row.get("BrandName") or None,
+                Cost=row.get("Cost"),
+                MaterialWeightPurchased=row.get("MaterialWeightPurchased"),
+                MaterialDensity=row.get("MaterialDensity"),
+                ReorderLeadTime=row.get("ReorderLeadTime"),
+                WearAndTearMultiplier=row.get("WearAndTearMultiplier")
+                or Decimal("1.00"),
+            )
+            try:
+                raw_material.full_clean(exclude=["Supplier", "Filament"])
+            except ValidationError as e:
+                errors.extend(
+                    f"{field}: {' '.join(messages)}"
+                    for field, messages in e.message_dict.items()
+                )
+            if not errors and raw_material.MaterialWeightPurchased <= 0:
+                errors.append("MaterialWeightPurchased: must be greater than zero.")
+
+            if errors:
+                self.row_errors.append((row_number, errors))
+            else:
+                self.raw_materials.append(raw_material)
+
+        if self.row_errors:
+            raise ValidationError(
+                f"{len(self.row_errors)} row(s) have errors. Nothing was imported."
+            )
+        return upload
+
+    def save(self):
+        """
+        Create the raw materials, their initial InventoryChange rows and
+        their InventoryBalance rows with one bulk insert each.
+        bulk_create skips the post_save signals, so this does their work here.
+        Not every database returns the new ids from a bulk insert (MySQL
+        doesn't), so the spools are tagged with an import batch and read back.
+        """
+        batch = uuid.uuid4()
+        for raw_material in self.raw_materials:
+            raw_material.ImportBatch = batch
+        with transaction.atomic():
+            RawMaterials.objects.bulk_create(self.raw_materials)
+            raw_materials = list(
+                RawMaterials.objects.filter(ImportBatch=batch).order_by("id")
+            )
+            InventoryChange.objects.bulk_create(
+                InventoryChange(
+                    RawMaterial=raw_material,
+                    QuantityWeightAvailable=raw_material.MaterialWeightPurchased,
+                    UnitCost=Decimal(raw_material.Cost)
+                    / Decimal(raw_material.MaterialWeightPurchased),
+                )
+                for raw_material in raw_materials
+            )
+            inventory_changes = InventoryChange.objects.filter(
+                RawMaterial__ImportBatch=batch
+            ).select_related("RawMaterial")
+            InventoryBalance.objects.bulk_create(
+                InventoryBalance(
+                    RawMaterial=inventory_change.RawMaterial,
+                    InventoryChange=inventory_change,
+                    QuantityWeightAvailable=inventory_change.QuantityWeightAvailable,
+                    UnitCost=inventory_change.UnitCost,
+                    PurchasedDate=inventory_change.RawMaterial.PurchasedDate,
+                )
+                for inventory_change in inventory_changes
+            )
+            invalidate_index()
+            bump_all_filaments()
+        return raw_materials
@@ -0,0 +1,170 @@
+"""
+Inventory level history per filament for charting
+
+The ledger stores one snapshot row per spool change, so a filament's
+grams on hand at any moment is the sum of the latest row of each of its spools.
+History is read as a single streamed pass over the ledger and folded
+into min/max time buckets, so memory and response size depend on the
+number of points requested, not on how long the history is.
+
+Balances at a single past moment start from the nearest InventoryCheckpoint
+and replay only the ledger rows written after it.
+"""
+
+from datetime import timedelta
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from store.models import (
+    Filament,
+    InventoryChange,
+    InventoryCheckpoint,
+    InventoryCheckpointEntry,
+    RawMaterials,
+)
+
+DEFAULT_POINTS = 200
+MAX_POINTS = 2000
+CHUNK_SIZE = 2000
+
+
+class MinMaxBuckets:
+    """
+    Fold a time-ordered series into equal-width time buckets,
+    keeping the lowest and highest point of each bucket in time order.
+    Peaks and troughs survive downsampling, which averaging would flatten.
+    """
+
+    def __init__(self, start, end, points):
+        self.start = start
+        self.span = max((end - start).total_seconds(), 1.0)
+        # Two points per bucket plus the fixed first and last points of the series
+        self.bucket_count = max((points - 2) // 2, 1)
+        self.buckets = {}
+
+    def add(self, moment, value):
+        offset = (moment - self.start).total_seconds() / self.span
+        index = min(max(int(offset * self.bucket_count), 0), self.bucket_count - 1)
+        bucket = self.buckets.get(index)
+        if bucket is None:
+            self.buckets[index] = [(moment, value), (moment, value)]
+        elif value < bucket[0][1]:
+            bucket[0] = (moment, value)
+        elif value > bucket[1][1]:
+            bucket[1] = (moment, value)
+
+    def points(self):
+        """Return the kept points as [timestamp, value] pairs in time order"""
+        result = []
+        for index in sorted(self.buckets):
+            low, high = self.buckets[index]
+            pair = sorted({low, high}, key=lambda point: point[0])
+            result.extend([moment.isoformat(), value] for moment, value in pair)
+        return result
+
+
+def filament_history(filament_ids=None, days=180, points=DEFAULT_POINTS, now=None):
+    """
+    Downsampled grams on hand over time for each filament.
+
+    Args:
+        filament_ids: Filaments to chart (default: every filament)
+        days: How far back the history starts
+        points: Maximum number of points returned per filament
+        now: End of the history (default: timezone.now())
+
+    Returns:
+        list of dicts with 'filament_id', 'name' and 'points',
+        where points are [ISO timestamp, grams] pairs in time order.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=days)
+    filaments = Filament.objects.order_by("Name")
+    if filament_ids is not None:
+        filaments = filaments.filter(id__in=filament_ids)
+    filaments = list(filaments.values_list("id", "Name"))
+
+    filament_ids = [filament_id for filament_id, _ in filaments]
+
+    # Opening balance of every spool: its last ledger row before the window
+    spools = RawMaterials.objects.filter(Filament_id__in=filament_ids).annotate(
+        opening=Subquery(
+            InventoryChange.objects.filter(
+                RawMaterial=OuterRef("pk"), InventoryChangeDate__lt=since
+            )
+            .order_by("-InventoryChangeDate", "-id")
+            .values("QuantityWeightAvailable")[:1]
+        )
+    )
+    spool_filament = {}
+    spool_quantity = {}
+    totals = {filament_id: 0 for filament_id, _ in filaments}
+    for spool_id, filament_id, opening in spools.values_list(
+        "id", "Filament_id", "opening"
+    ):
+        spool_filament[spool_id] = filament_id
+        spool_quantity[spool_id] = opening or 0
+        totals[filament_id] += opening or 0
+
+    opening_totals = dict(totals)
+    series = {
+        filament_id: MinMaxBuckets(since, now, points) for filament_id, _ in filaments
+    }
+
+    rows = (
+        InventoryChange.objects.filter(
+            RawMaterial__Filament_id__in=filament_ids,
+            InventoryChangeDate__gte=since,
+            InventoryChangeDate__lte=now,
+        )
+        .order_by("InventoryChangeDate", "id")
+        .values_list("RawMaterial_id", "InventoryChangeDate", "QuantityWeightAvailable")
+    )
+    for spool_id, moment, quantity in rows.iterator(chunk_size=CHUNK_SIZE):
+        filament_id = spool_filament[spool_id]
+        totals[filament_id] += quantity - spool_quantity[spool_id]
+        spool_quantity[spool_id] = quantity
+        series[filament_id].add(moment, totals[filament_id])
+
+    return [
+        {
+            "filament_id": filament_id,
+            "name": name,
+            "points": [[since.isoformat(), opening_totals[filament_id]]]
+            + series[filament_id].points()
+            + [[now.isoformat(), totals[filament_id]]],
+        }
+        for filament_id, name in filaments
+    ]
+
+
+def inventory_at(moment):
+    """
+    Grams on hand per raw material at a past moment.
+
+    Starts from the latest checkpoint at or before the moment and
+    applies the ledger rows written between the checkpoint and the moment.
+    Ledger rows are snapshots, so the last row of each raw material wins.
+    Without an earlier checkpoint the whole ledger up to the moment is replayed.
+
+    Returns:
+        dict of raw material id to grams available, for raw materials
+        that had a ledger row by then
+    """
+    checkpoint = InventoryCheckpoint.objects.nearest_before(moment)
+    rows = InventoryChange.objects.filter(InventoryChangeDate__lte=moment)
+    balances = {}
+    if checkpoint:
+        balances = dict(
+            InventoryCheckpointEntry.objects.filter(Checkpoint=checkpoint).values_list(
+                "RawMaterial_id", "QuantityWeightAvailable"
+            )
+        )
+        rows = rows.filter(InventoryChangeDate__gt=checkpoint.CheckpointDate)
+
+    for raw_material_id, quantity in (
+        rows.order_by("InventoryChangeDate", "id")
+        .values_list("RawMaterial_id", "QuantityWeightAvailable")
+        .iterator(chunk_size=CHUNK_SIZE)
+    ):
+        balances[raw_material_id] = quantity
+    return balances
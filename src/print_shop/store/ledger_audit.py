@@ -0,0 +1,97 @@
+"""
+Work done in the pool processes of the verify_inventory_ledger command
+
+Under the spawn and forkserver start methods a worker imports this module to
+unpickle its tasks before setup_worker has run django.setup(), so models are
+only imported inside the functions, never at the top of the module.
+"""
+
+from django.db import connections
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def setup_worker(database_names):
+    """
+    Give each pool process its own Django setup and database connections.
+    Workers use the databases of the parent, which in test runs are the test
+    databases rather than those named in the settings.
+    """
+    import django
+
+    django.setup()
+    connections.close_all()
+    for alias, name in database_names.items():
+        connections[alias].settings_dict["NAME"] = name
+
+
+def audit_raw_materials(raw_material_ids):
+    """
+    Replay the history of a chunk of raw materials and return the mismatches.
+
+    The expected balance of a spool is the weight purchased plus its stock count
+    adjustments, minus the TotalWeight of every order item printed from it
+    (or, for items split across spools, the grams allocated to it). Cart items
+    whose hold was released hold no grams. The expected balance is compared
+    with both the InventoryBalance and the latest ledger row.
+
+    Returns:
+        list of (raw material id, expected, balance, latest ledger quantity) tuples
+    """
+    from store.models import (
+        InventoryAdjustment,
+        InventoryChange,
+        OrderItemAllocation,
+        OrderItems,
+        RawMaterials,
+    )
+
+    consumed = (
+        OrderItems.objects.filter(
+            InventoryChange__RawMaterial=OuterRef("pk"), allocations__isnull=True
+        )
+        .exclude(cart_hold__Released=True)
+        .values("InventoryChange__RawMaterial")
+        .annotate(total=Sum("TotalWeight"))
+        .values("total")
+    )
+    consumed_split = (
+        OrderItemAllocation.objects.filter(RawMaterial=OuterRef("pk"))
+        .values("RawMaterial")
+        .annotate(total=Sum("Weight"))
+        .values("total")
+    )
+    adjusted = (
+        InventoryAdjustment.objects.filter(RawMaterial=OuterRef("pk"))
+        .values("RawMaterial")
+        .annotate(total=Sum("Weight"))
+        .values("total")
+    )
+    latest = (
+        InventoryChange.objects.filter(RawMaterial=OuterRef("pk"))
+        .order_by("-InventoryChangeDate", "-id")
+        .values("QuantityWeightAvailable")[:1]
+    )
+    rows = (
+        RawMaterials.objects.filter(id__in=raw_material_ids)
+        .annotate(
+            consumed=Subquery(consumed),
+            consumed_split=Subquery(consumed_split),
+            adjusted=Subquery(adjusted),
+            latest=Subquery(latest),
+        )
+        .values_list(
+            "id",
+            "MaterialWeightPurchased",
+            "consumed",
+            "consumed_split",
+            "adjusted",
+            "inventory_balance__QuantityWeightAvailable",
+            "latest",
+        )
+    )
+    mismatches = []
+    for raw_material_id, purchased, used, used_split, adjusted, balance, ledger in rows:
+        expected = purchased + (adjusted or 0) - (used or 0) - (used_split or 0)
+        if balance != expected or ledger != expected:
+            mismatches.append((raw_material_id, expected, balance, ledger))
+    return mismatches
@@ -0,0 +1,157 @@
+import random
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.management.base import BaseCommand, CommandError
+from store import fixed_point
+
+# Distinct configurations the benchmark draws from; a shop prices many items
+# over a catalogue of models and spools, so amounts repeat
+CATALOGUE_SIZE = 500
+
+
+def hundredths(rng, low, high):
+    """A random amount with two decimal places between low and high hundredths"""
+    return Decimal(rng.randint(low, high)).scaleb(-2)
+
+
+def random_inputs(rng):
+    """
+    Random (weight inputs, cost inputs) within the model field ranges.
+    The infill multiplier is computed as calculate_infill_multiplier does,
+    and half the time rounded to the two places it is stored with.
+    """
+    base_infill = hundredths(rng, 0, 99)
+    multiplier = (
+        Decimal(rng.randint(1, 100)) / (base_infill * 100 or Decimal("20"))
+    ).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+    if rng.random() < 0.5:
+        multiplier = multiplier.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    quantity = rng.randint(1, 100)
+    return (
+        (
+            rng.randint(1, 5000),
+            base_infill,
+            multiplier,
+            hundredths(rng, 1, 999),
+            quantity,
+        ),
+        (
+            hundredths(rng, 0, 500),
+            hundredths(rng, 100, 999),
+            hundredths(rng, 0, 9999),
+            quantity,
+            hundredths(rng, 100, 999),
+        ),
+    )
+
+
+def as_units(inputs):
+    """The inputs converted with to_units, as a bulk caller holds them"""
+    (volume, base_infill, multiplier, density, quantity), costs = inputs
+    unit_cost, wear, fixed_cost, _, markup = costs
+    return (
+        (
+            volume,
+            fixed_point.to_units(base_infill, 2),
+            fixed_point.to_units(multiplier, 4),
+            fixed_point.to_units(density, 2),
+        ),
+        (
+            fixed_point.to_units(unit_cost, 2),
+            fixed_point.to_units(wear, 2),
+            fixed_point.to_units(fixed_cost, 2),
+        ),
+        quantity,
+        fixed_point.to_units(markup, 2),
+    )
+
+
+def decimal_pricing(weight_inputs, cost_inputs):
+    weight = fixed_point.required_weight(*weight_inputs)
+    return fixed_point.price_components(weight, *cost_inputs)
+
+
+def integer_pricing(weight_units, cost_units, quantity, markup):
+    grams = fixed_point.weight_grams(*weight_units, quantity)
+    unit_cost, wear, fixed_cost = cost_units
+    return (
+        grams,
+        *fixed_point.price_units(grams, unit_cost, wear, fixed_cost, quantity, markup),
+    )
+
+
+def converting_pricing(weight_inputs, cost_inputs):
+    return integer_pricing(*as_units((weight_inputs, cost_inputs)))
+
+
+def as_integers(components):
+    """Components in the kernel's units: grams, 10**-4 dollars and cents"""
+    return (
+        int(components["weight"]),
+        int(components["material_cost"].scaleb(4)),
+        int(components["cost_of_goods"].scaleb(4)),
+        int(components["price"].scaleb(2)),
+    )
+
+
+def time_per_item(pricing, sample):
+    """Microseconds per call of pricing over the sample"""
+    started = time.perf_counter()
+    for inputs in sample:
+        pricing(*inputs)
+    return (time.perf_counter() - started) / len(sample) * 10**6
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the integer pricing kernel with the Decimal pricing OrderItems "
+        "uses on random inputs, then time both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cases",
+            type=int,
+            default=1_000_000,
+            help="Random inputs to compare (default: 1000000).",
+        )
+        parser.add_argument(
+            "--benchmark-cases",
+            type=int,
+            default=100_000,
+            help="Items priced by each path when timing (default: 100000).",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        mismatches = 0
+        for _ in range(options["cases"]):
+            inputs = random_inputs(rng)
+            expected = decimal_pricing(*inputs)
+            if integer_pricing(*as_units(inputs)) != as_integers(expected):
+                mismatches += 1
+                if mismatches <= 5:
+                    self.stderr.write(f"Priced differently: {inputs}")
+        if mismatches:
+            raise CommandError(
+                f"{mismatches} of {options['cases']} random inputs priced differently."
+            )
+        self.stdout.write(f"Checked {options['cases']} random inputs: 0 mismatches")
+
+        if not options["benchmark_cases"]:
+            return
+        catalogue = [random_inputs(rng) for _ in range(CATALOGUE_SIZE)]
+        sample = rng.choices(catalogue, k=options["benchmark_cases"])
+        decimal_time = time_per_item(decimal_pricing, sample)
+        converting_time = time_per_item(converting_pricing, sample)
+        integer_time = time_per_item(
+            integer_pricing, [as_units(inputs) for inputs in sample]
+        )
+        self.stdout.write(
+            f"Decimal: {decimal_time:.2f} us per item\n"
+            f"Fixed point, converting every item: {converting_time:.2f} us per item "
+            f"({decimal_time / converting_time:.1f}x)\n"
+            f"Fixed point, amounts converted once: {integer_time:.2f} us per item "
+            f"({decimal_time / integer_time:.1f}x)"
+        )
@@ -0,0 +1,142 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from store.models import InventoryBalance, InventoryChange, OrderItems, RawMaterials
+
+PERIODS = {
+    "day": lambda date: date.date(),
+    "week": lambda date: date.isocalendar()[:2],
+    "month": lambda date: (date.year, date.month),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact InventoryChange rows older than a cutoff into one snapshot row "
+        "per raw material and period. Rows referenced by order items "
+        "or by a current InventoryBalance are always kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=90,
+            help="Only compact rows older than this many days (default: 90).",
+        )
+        parser.add_argument(
+            "--period",
+            choices=PERIODS.keys(),
+            default="month",
+            help="Keep the last row of each period (default: month).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Ledger rows read and deleted per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be removed without deleting anything.",
+        )
+
+    def handle(self, *args, **options):
+        if options["older_than"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--older-than and --batch-size must be positive.")
+
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+        period_key = PERIODS[options["period"]]
+        removed = 0
+
+        raw_material_ids = RawMaterials.objects.order_by("id").values_list(
+            "id", flat=True
+        )
+        for raw_material_id in raw_material_ids.iterator():
+            removed += self.compact_raw_material(
+                raw_material_id,
+                cutoff,
+                period_key,
+                options["batch_size"],
+                options["dry_run"],
+            )
+
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {removed} ledger rows older than {cutoff:%Y-%m-%d}."
+            )
+        )
+
+    def compact_raw_material(
+        self, raw_material_id, cutoff, period_key, batch_size, dry_run
+    ):
+        """
+        Walk one raw material's history in (date, id) order, one page at a time,
+        and drop every row that is followed by a later row in the same period.
+        Pages are read by keyset so deletes never shift the next page,
+        and memory stays bounded by the batch size.
+        """
+        rows = (
+            InventoryChange.objects.filter(
+                RawMaterial_id=raw_material_id, InventoryChangeDate__lt=cutoff
+            )
+            .annotate(
+                referenced=Exists(
+                    OrderItems.objects.filter(InventoryChange=OuterRef("pk"))
+                )
+                | Exists(
+                    InventoryBalance.objects.filter(InventoryChange=OuterRef("pk"))
+                )
+            )
+            .order_by("InventoryChangeDate", "id")
+            .values_list("id", "InventoryChangeDate", "referenced")
+        )
+
+        removed = 0
+        previous = None
+        last_seen = None
+        while True:
+            page = rows
+            if last_seen:
+                page = page.filter(
+                    Q(InventoryChangeDate__gt=last_seen[1])
+                    | Q(InventoryChangeDate=last_seen[1], id__gt=last_seen[0])
+                )
+            page = list(page[:batch_size])
+            if not page:
+                break
+
+            superseded = []
+            for row in page:
+                if (
+                    previous
+                    and not previous[2]
+                    and period_key(previous[1]) == period_key(row[1])
+                ):
+                    superseded.append(previous[0])
+                previous = row
+            last_seen = page[-1]
+
+            if dry_run:
+                removed += len(superseded)
+            elif superseded:
+                removed += self.delete_rows(superseded)
+
+        return removed
+
+    def delete_rows(self, ids):
+        """
+        Delete superseded rows, re-checking references inside the transaction
+        in case an order item picked one up since the page was read.
+        The rows are never a balance's current row, so the delete signal
+        leaves the balances alone.
+        """
+        with transaction.atomic():
+            deleted, _ = InventoryChange.objects.filter(
+                pk__in=ids, orderitems__isnull=True, current_balance__isnull=True
+            ).delete()
+            return deleted
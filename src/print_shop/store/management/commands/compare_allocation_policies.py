@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from store.allocation import load_order_history, replay_allocation
+from store.models import ALLOCATION_POLICIES
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the order history against the purchased spools under each "
+        "allocation policy and report placed lines, spools opened and scrap grams."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--policy",
+            action="append",
+            choices=ALLOCATION_POLICIES.keys(),
+            help="Policy to replay; repeat for several (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        policies = options["policy"] or list(ALLOCATION_POLICIES)
+        spools, lines = load_order_history()
+        if not lines:
+            raise CommandError("There are no order items to replay.")
+
+        for policy in policies:
+            result = replay_allocation(spools, lines, policy)
+            self.stdout.write(
+                f"{policy}: placed {result['placed']}/{len(lines)} lines, "
+                f"{result['spools_opened']} spools opened, "
+                f"{result['scrap_grams']}g in scraps, "
+                f"{result['unplaced_grams']}g unplaced"
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from store.models import InventoryCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot every raw material's current balance into an inventory checkpoint. "
+        "Run periodically (e.g. nightly) so point-in-time queries only replay "
+        "the ledger rows written since the nearest checkpoint."
+    )
+
+    def handle(self, *args, **options):
+        checkpoint = InventoryCheckpoint.objects.take()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved {checkpoint.entries.count()} balances "
+                f"at {checkpoint.CheckpointDate:%Y-%m-%d %H:%M:%S}."
+            )
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from store.models import CartHold
+
+
+class Command(BaseCommand):
+    help = (
+        "Return the grams of custom cart items whose inventory hold has expired "
+        "to the spools, one batch per transaction. The items stay in their carts "
+        "and are reserved again on the customer's next visit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Expired holds released per transaction (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        now = timezone.now()
+        released = 0
+        while True:
+            batch = CartHold.objects.release_expired(options["batch_size"], now=now)
+            if not batch:
+                break
+            released += batch
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Released {released} expired cart holds.")
+        )
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from store.repricing import CHUNK_SIZE, reprice_premade_items, unsold_premade_items
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the price of every unsold premade item from the current "
+        "model and spool costs and report the price changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            type=int,
+            action="append",
+            help="Only reprice items of this model id; repeat for several.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help=f"Items read and updated per transaction (default: {CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the price changes without saving them.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        items = unsold_premade_items()
+        if options["model"]:
+            items = items.filter(Model_id__in=options["model"])
+        result = reprice_premade_items(
+            items, chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+        )
+
+        for group in result["groups"]:
+            self.stdout.write(
+                f"{group['model']} / {group['filament']}: {group['items']} items, "
+                f"${group['old_total']} -> ${group['new_total']} "
+                f"({group['delta']:+})"
+            )
+        verb = "Would reprice" if options["dry_run"] else "Repriced"
+        self.stdout.write(
+            f"{verb} {result['repriced']} of {result['checked']} unsold premade "
+            f"items, total change {result['total_delta']:+}"
+        )
+        if result["skipped"]:
+            self.stdout.write(
+                f"{result['skipped']} items weigh differently at the new costs "
+                "and must be re-saved from the premade item form."
+            )
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from store.ledger_audit import audit_raw_materials, setup_worker
+from store.models import InventoryChange, RawMaterials
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay every raw material's history from its purchase, its stock count "
+        "adjustments and the TotalWeight of its order items, and report (or fix) spools whose InventoryBalance "
+        "or latest InventoryChange disagrees."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Write a corrective ledger row for every mismatch.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes to split the audit across (default: CPU count).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Raw materials audited per task (default: 500).",
+        )
+        parser.add_argument(
+            "--start-method",
+            choices=multiprocessing.get_all_start_methods(),
+            help="How worker processes are started (default: the platform's).",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["chunk_size"] < 1:
+            raise CommandError("--workers and --chunk-size must be positive.")
+
+        raw_material_ids = list(
+            RawMaterials.objects.order_by("id").values_list("id", flat=True)
+        )
+        chunk_size = options["chunk_size"]
+        chunks = [
+            raw_material_ids[start : start + chunk_size]
+            for start in range(0, len(raw_material_ids), chunk_size)
+        ]
+
+        mismatches = []
+        if options["workers"] == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                mismatches.extend(audit_raw_materials(chunk))
+        else:
+            # Forked workers must not share the parent's open connections
+            connections.close_all()
+            database_names = {
+                connection.alias: connection.settings_dict["NAME"]
+                for connection in connections.all()
+            }
+            with ProcessPoolExecutor(
+                max_workers=options["workers"],
+                mp_context=multiprocessing.get_context(options["start_method"]),
+                initializer=setup_worker,
+                initargs=(database_names,),
+            ) as pool:
+                for chunk_mismatches in pool.map(audit_raw_materials, chunks):
+                    mismatches.extend(chunk_mismatches)
+
+        for raw_material_id, expected, balance, ledger in mismatches:
+            self.stdout.write(
+                f"Raw material {raw_material_id}: expected {expected}g, "
+                f"balance {balance}g, ledger {ledger}g"
+            )
+        self.stdout.write(
+            f"Checked {len(raw_material_ids)} raw materials, "
+            f"found {len(mismatches)} mismatches."
+        )
+
+        if options["fix"] and mismatches:
+            fixed = self.fix_mismatches(mismatches)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} raw materials."))
+
+    def fix_mismatches(self, mismatches):
+        """
+        Append a ledger row holding the expected balance for each mismatch.
+        The ledger signals then move the InventoryBalance and low stock alert.
+        Spools whose orders use more than was purchased can't be fixed
+        by a ledger row and are left for a person to look at.
+        """
+        fixed = 0
+        raw_materials = RawMaterials.objects.in_bulk(
+            [raw_material_id for raw_material_id, *_ in mismatches]
+        )
+        with transaction.atomic():
+            for raw_material_id, expected, _, _ in mismatches:
+                if expected < 0:
+                    self.stderr.write(
+                        f"Raw material {raw_material_id} is oversold by "
+                        f"{-expected}g, skipping."
+                    )
+                    continue
+                raw_material = raw_materials[raw_material_id]
+                InventoryChange.objects.create(
+                    RawMaterial=raw_material,
+                    QuantityWeightAvailable=expected,
+                    UnitCost=Decimal(raw_material.Cost)
+                    / Decimal(raw_material.MaterialWeightPurchased),
+                )
+                fixed += 1
+        return fixed
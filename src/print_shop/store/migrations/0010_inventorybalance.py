@@ -0,0 +1,85 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_inventory_balances(apps, schema_editor):
+    """Create a balance for every raw material from its latest ledger row"""
+    RawMaterials = apps.get_model("store", "RawMaterials")
+    InventoryChange = apps.get_model("store", "InventoryChange")
+    InventoryBalance = apps.get_model("store", "InventoryBalance")
+    for raw_material_id in RawMaterials.objects.values_list("id", flat=True):
+        latest = (
+            InventoryChange.objects.filter(RawMaterial_id=raw_material_id)
+            .order_by("-InventoryChangeDate", "-id")
+            .first()
+        )
+        if latest:
+            InventoryBalance.objects.update_or_create(
+                RawMaterial_id=raw_material_id,
+                defaults={
+                    "InventoryChange": latest,
+                    "QuantityWeightAvailable": latest.QuantityWeightAvailable,
+                    "UnitCost": latest.UnitCost,
+                },
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0009_alter_orders_shipping"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("QuantityWeightAvailable", models.IntegerField()),
+                ("UnitCost", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("UpdatedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="inventorychange",
+            index=models.Index(
+                fields=["RawMaterial", "InventoryChangeDate"],
+                name="inventory_material_date_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="inventorybalance",
+            name="InventoryChange",
+            field=models.OneToOneField(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="current_balance",
+                to="store.inventorychange",
+            ),
+        ),
+        migrations.AddField(
+            model_name="inventorybalance",
+            name="RawMaterial",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="inventory_balance",
+                to="store.rawmaterials",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inventorybalance",
+            index=models.Index(
+                fields=["QuantityWeightAvailable"], name="balance_quantity_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_inventory_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_purchased_dates(apps, schema_editor):
+    """Copy each raw material's PurchasedDate onto its balance"""
+    InventoryBalance = apps.get_model("store", "InventoryBalance")
+    for balance in InventoryBalance.objects.select_related("RawMaterial"):
+        balance.PurchasedDate = balance.RawMaterial.PurchasedDate
+        balance.save(update_fields=["PurchasedDate"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0010_inventorybalance"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="inventorybalance",
+            name="balance_quantity_idx",
+        ),
+        migrations.AddField(
+            model_name="inventorybalance",
+            name="PurchasedDate",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_purchased_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="inventorybalance",
+            index=models.Index(
+                fields=["QuantityWeightAvailable", "PurchasedDate"],
+                name="balance_quantity_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inventorybalance",
+            index=models.Index(
+                fields=["RawMaterial", "QuantityWeightAvailable", "PurchasedDate"],
+                name="balance_material_fifo_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:59
+
+import math
+from decimal import Decimal
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_low_stock_alerts(apps, schema_editor):
+    """Raise an alert for every balance already below the reorder threshold"""
+    InventoryBalance = apps.get_model("store", "InventoryBalance")
+    LowStockAlert = apps.get_model("store", "LowStockAlert")
+    alerts = []
+    for balance in InventoryBalance.objects.select_related("RawMaterial"):
+        threshold = math.ceil(
+            Decimal(balance.RawMaterial.MaterialWeightPurchased) * Decimal("0.2")
+        )
+        if 0 < balance.QuantityWeightAvailable < threshold:
+            alerts.append(
+                LowStockAlert(
+                    RawMaterial_id=balance.RawMaterial_id,
+                    QuantityWeightAvailable=balance.QuantityWeightAvailable,
+                    Threshold=threshold,
+                )
+            )
+    LowStockAlert.objects.bulk_create(alerts)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0011_inventorybalance_purchaseddate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LowStockAlert",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("QuantityWeightAvailable", models.IntegerField()),
+                ("Threshold", models.IntegerField()),
+                ("CreatedAt", models.DateTimeField(auto_now_add=True)),
+                ("UpdatedAt", models.DateTimeField(auto_now=True)),
+                (
+                    "RawMaterial",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="low_stock_alert",
+                        to="store.rawmaterials",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["CreatedAt"], name="low_stock_created_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_low_stock_alerts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0012_lowstockalert"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartHold",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ExpiresAt", models.DateTimeField()),
+                ("CreatedAt", models.DateTimeField(auto_now_add=True)),
+                (
+                    "OrderItem",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart_hold",
+                        to="store.orderitems",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["ExpiresAt"], name="cart_hold_expires_idx")
+                ],
+            },
+        ),
+    ]
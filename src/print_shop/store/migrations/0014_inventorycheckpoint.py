@@ -0,0 +1,71 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0013_carthold"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("CheckpointDate", models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="InventoryCheckpointEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("QuantityWeightAvailable", models.IntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="inventorychange",
+            index=models.Index(
+                fields=["InventoryChangeDate"], name="inventory_date_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="inventorycheckpointentry",
+            name="Checkpoint",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="entries",
+                to="store.inventorycheckpoint",
+            ),
+        ),
+        migrations.AddField(
+            model_name="inventorycheckpointentry",
+            name="RawMaterial",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="store.rawmaterials"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="inventorycheckpointentry",
+            constraint=models.UniqueConstraint(
+                fields=("Checkpoint", "RawMaterial"), name="checkpoint_material_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:12
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0014_inventorycheckpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderItemAllocation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "Weight",
+                    models.IntegerField(
+                        validators=[django.core.validators.MinValueValidator(1)]
+                    ),
+                ),
+                (
+                    "OrderItem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="allocations",
+                        to="store.orderitems",
+                    ),
+                ),
+                (
+                    "RawMaterial",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="store.rawmaterials",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0015_orderitemallocation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rawmaterials",
+            name="ImportBatch",
+            field=models.UUIDField(db_index=True, editable=False, null=True),
+        ),
+    ]
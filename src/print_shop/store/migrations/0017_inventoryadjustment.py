@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0016_rawmaterials_importbatch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryAdjustment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("Weight", models.IntegerField()),
+                ("CreatedAt", models.DateTimeField(auto_now_add=True)),
+                (
+                    "RawMaterial",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="adjustments",
+                        to="store.rawmaterials",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:05
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+def backfill_cart_holds(apps, schema_editor):
+    """
+    Hold the custom items already in draft carts, which used to get
+    their hold on the next cart visit rather than when they were added
+    """
+    CartHold = apps.get_model("store", "CartHold")
+    FulfillmentStatus = apps.get_model("store", "FulfillmentStatus")
+    OrderItems = apps.get_model("store", "OrderItems")
+    latest_status = (
+        FulfillmentStatus.objects.filter(Order=OuterRef("Order"))
+        .order_by("-StatusChangeDate")
+        .values("OrderStatus")[:1]
+    )
+    unheld = (
+        OrderItems.objects.annotate(order_status=Subquery(latest_status))
+        .filter(IsCustom=True, order_status="Draft", cart_hold__isnull=True)
+        .values_list("id", flat=True)
+    )
+    expires_at = timezone.now() + timedelta(minutes=settings.CART_HOLD_MINUTES)
+    CartHold.objects.bulk_create(
+        CartHold(OrderItem_id=order_item_id, ExpiresAt=expires_at)
+        for order_item_id in unheld
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("store", "0017_inventoryadjustment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="carthold",
+            name="Released",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(backfill_cart_holds, migrations.RunPython.noop),
+    ]
@@ -2,10 +2,17 @@
 3D Print Shop Models based on ERD
 """
 
+import math
+import threading
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
-from django.db import models
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Min, Sum
+from django.db.backends.utils import format_number
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.core.validators import (
     RegexValidator,
@@ -14,6 +21,9 @@ from django.core.validators import (
 )
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from store.spool_index import index_balance, invalidate_index, spool_index
+from store import fixed_point
+from store.quote_cache import bump_all_filaments, bump_filament, bump_model
 
 
 class Materials(models.Model):
@@ -82,6 +92,8 @@ class RawMaterials(models.Model):
         validators=[MinValueValidator(Decimal("1.00"))],
     )
     PurchasedDate = models.DateTimeField(auto_now_add=True)
+    # Set by a sheet import so its bulk-inserted spools can be read back
+    ImportBatch = models.UUIDField(null=True, editable=False, db_index=True)
 
     def __str__(self):
         return f"{self.Filament.Name} - {self.Filament.ColorHexCode} - {self.MaterialWeightPurchased}g"
@@ -106,17 +118,38 @@ class RawMaterials(models.Model):
         )
 
 
+# Ordering of the spools that fit a weight, first one wins, for each allocation policy
+ALLOCATION_POLICIES = {
+    "fifo": ("PurchasedDate", "id"),
+    "best_fit": ("QuantityWeightAvailable", "PurchasedDate", "id"),
+}
+
+
 class InventoryChangeManager(models.Manager):
     """Custom manager for InventoryChange to handle FIFO inventory queries"""
 
     def available(self):
-        """Get all available inventory following FIFO principles"""
-        return self.filter(QuantityWeightAvailable__gt=0).order_by(
-            "RawMaterial__PurchasedDate", "-InventoryChangeDate"
-        )
+        """
+        Get all available inventory following FIFO principles.
+        Only the current ledger row of each raw material is considered,
+        as tracked by InventoryBalance, so older snapshots are never reused.
+        """
+        return self.filter(
+            current_balance__isnull=False, QuantityWeightAvailable__gt=0
+        ).order_by("current_balance__PurchasedDate", "-InventoryChangeDate")
+
+    @staticmethod
+    def weight_with_margin(required_weight, safety_margin=Decimal("1.15")):
+        """Whole grams a spool must hold to cover the weight plus safety margin"""
+        return math.ceil(Decimal(required_weight) * Decimal(safety_margin))
 
     def find_for_weight(
-        self, required_weight, safety_margin=Decimal("1.15"), raw_material=None
+        self,
+        required_weight,
+        safety_margin=Decimal("1.15"),
+        raw_material=None,
+        filament=None,
+        policy=None,
     ):
         """Find inventory with enough material for the required weight
 
@@ -124,20 +157,164 @@ class InventoryChangeManager(models.Manager):
             required_weight: The weight needed for the order
             safety_margin: Multiplier for safety margin (default: 1.15 for 15%)
             raw_material: Optional RawMaterials instance to filter by specific material
+            filament: Optional Filament instance or id to filter by
+            policy: Key of ALLOCATION_POLICIES choosing among the spools that fit
+                (default: settings.SPOOL_ALLOCATION_POLICY)
 
         Returns:
             InventoryChange object with enough material, or None if not found
         """
-        weight_with_margin = Decimal(required_weight) * Decimal(safety_margin)
-        available_inventory = self.available()
+        policy = policy or settings.SPOOL_ALLOCATION_POLICY
+        if policy not in ALLOCATION_POLICIES:
+            raise ValueError(f"Unknown allocation policy '{policy}'")
+
+        needed = self.weight_with_margin(required_weight, safety_margin)
+        balances = InventoryBalance.objects.filter(
+            InventoryChange__isnull=False,
+            QuantityWeightAvailable__gte=needed,
+        ).select_related("InventoryChange__RawMaterial")
+
+        if filament and not raw_material and settings.SPOOL_INDEX_ENABLED:
+            # The index names the spool; one primary key lookup confirms it.
+            # Misses and stale answers fall through to the full query.
+            hit = spool_index.first_fit(
+                getattr(filament, "pk", filament), needed, policy
+            )
+            if hit:
+                balance = balances.filter(RawMaterial_id=hit[0]).first()
+                if balance:
+                    return balance.InventoryChange
+                spool_index.invalidate()
 
         if raw_material:
-            available_inventory = available_inventory.filter(RawMaterial=raw_material)
+            balances = balances.filter(RawMaterial=raw_material)
+        if filament:
+            balances = balances.filter(RawMaterial__Filament=filament)
 
-        for inventory in available_inventory:
-            if inventory.QuantityWeightAvailable >= weight_with_margin:
-                return inventory
-        return None
+        balance = balances.order_by(*ALLOCATION_POLICIES[policy]).first()
+        return balance.InventoryChange if balance else None
+
+    def find_for_weights(self, requests, safety_margin=Decimal("1.15")):
+        """Find inventory for many (raw material, weight) pairs in one query
+
+        Args:
+            requests: Iterable of (raw_material, required_weight) pairs,
+                raw_material being a RawMaterials instance or its id
+            safety_margin: Multiplier for safety margin (default: 1.15 for 15%)
+
+        Returns:
+            List of InventoryChange objects (or None) in the same order as requests
+        """
+        requests = [
+            (getattr(raw_material, "pk", raw_material), required_weight)
+            for raw_material, required_weight in requests
+        ]
+        balances = InventoryBalance.objects.filter(
+            RawMaterial_id__in={raw_material_id for raw_material_id, _ in requests},
+            InventoryChange__isnull=False,
+            QuantityWeightAvailable__gt=0,
+        ).select_related("InventoryChange__RawMaterial")
+        balances_by_material = {balance.RawMaterial_id: balance for balance in balances}
+
+        results = []
+        for raw_material_id, required_weight in requests:
+            balance = balances_by_material.get(raw_material_id)
+            if balance and balance.QuantityWeightAvailable >= self.weight_with_margin(
+                required_weight, safety_margin
+            ):
+                results.append(balance.InventoryChange)
+            else:
+                results.append(None)
+        return results
+
+    def find_split_for_weight(
+        self, required_weight, filament, safety_margin=Decimal("1.15")
+    ):
+        """Spread a weight too large for any one spool across several spools
+
+        Spools of the filament are read oldest first and reading stops as soon as
+        they hold the weight plus margin, so only the spools used are fetched.
+        Grams are taken FIFO: earlier spools are emptied before later ones are
+        touched, and the margin is left on the last spool.
+
+        Args:
+            required_weight: The weight needed for the order item
+            filament: Filament instance or id the spools must be made of
+            safety_margin: Multiplier for safety margin (default: 1.15 for 15%)
+
+        Returns:
+            List of (InventoryChange, grams) pairs in FIFO order,
+            or None if all spools together are not enough
+        """
+        needed = self.weight_with_margin(required_weight, safety_margin)
+        balances = (
+            InventoryBalance.objects.filter(
+                RawMaterial__Filament=filament,
+                InventoryChange__isnull=False,
+                QuantityWeightAvailable__gt=0,
+            )
+            .select_related("InventoryChange__RawMaterial")
+            .order_by("PurchasedDate", "id")
+        )
+
+        chosen = []
+        total = 0
+        for balance in balances.iterator(chunk_size=20):
+            chosen.append(balance)
+            total += balance.QuantityWeightAvailable
+            if total >= needed:
+                break
+        else:
+            return None
+
+        allocations = []
+        remaining = int(required_weight)
+        for balance in chosen:
+            grams = min(balance.QuantityWeightAvailable, remaining)
+            if grams > 0:
+                allocations.append((balance.InventoryChange, grams))
+                remaining -= grams
+        return allocations
+
+    def changes_after(self, cursor, limit, now=None):
+        """Ledger rows written after a cursor, for consumers syncing incrementally
+
+        The id of the last row a consumer has seen is its cursor and each batch
+        is a range scan on the primary key. Ids are handed out at insert, not
+        at commit, so a row may become visible after rows with higher ids.
+        Rows are therefore only served once they are INVENTORY_FEED_LAG_SECONDS
+        old, and a batch stops before the first younger row, so a cursor never
+        moves past a row whose transaction may still commit. The lag must be
+        longer than any transaction writing ledger rows.
+
+        Args:
+            cursor: Id of the last row already seen (0 to start from the beginning)
+            limit: Largest number of rows to return
+            now: Reference time for the lag (default: timezone.now())
+
+        Returns:
+            (rows, has_more) where rows are (id, raw material id, grams,
+            unit cost, date) tuples in id order
+        """
+        horizon = (now or timezone.now()) - timedelta(
+            seconds=settings.INVENTORY_FEED_LAG_SECONDS
+        )
+        changes = self.filter(id__gt=cursor)
+        first_recent = changes.filter(InventoryChangeDate__gt=horizon).aggregate(
+            first=Min("id")
+        )["first"]
+        if first_recent is not None:
+            changes = changes.filter(id__lt=first_recent)
+        rows = list(
+            changes.order_by("id").values_list(
+                "id",
+                "RawMaterial_id",
+                "QuantityWeightAvailable",
+                "UnitCost",
+                "InventoryChangeDate",
+            )[: limit + 1]
+        )
+        return rows[:limit], len(rows) > limit
 
 
 class InventoryChange(models.Model):
@@ -149,9 +326,27 @@ class InventoryChange(models.Model):
     UnitCost = models.DecimalField(max_digits=10, decimal_places=2)
     objects = InventoryChangeManager()
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["RawMaterial", "InventoryChangeDate"],
+                name="inventory_material_date_idx",
+            ),
+            # Point-in-time replays read every raw material's rows in a date range
+            models.Index(fields=["InventoryChangeDate"], name="inventory_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.RawMaterial.Filament.Name} - {self.QuantityWeightAvailable}g"
 
+    def save(self, *args, **kwargs):
+        """
+        Save the ledger row and update the InventoryBalance
+        for its raw material in the same transaction.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     @property
     def needs_reorder(self):
         """
@@ -162,13 +357,378 @@ class InventoryChange(models.Model):
         return self.QuantityWeightAvailable < threshold
 
 
+# Raw material ids whose ledger row is waiting for the end of a coalesced block
+_pending_ledger_rows = threading.local()
+
+
+class InventoryBalanceManager(models.Manager):
+    """Custom manager for InventoryBalance to keep balances in step with the ledger"""
+
+    @contextmanager
+    def coalesce_ledger_writes(self):
+        """
+        Run a block in one transaction and write at most one ledger row per spool.
+        Reservations and releases inside the block still update the locked
+        balance at once, so availability checks stay exact, but their ledger rows
+        are written together just before the transaction commits.
+        Nested blocks join the outermost one.
+        """
+        if getattr(_pending_ledger_rows, "raw_material_ids", None) is not None:
+            yield
+            return
+        _pending_ledger_rows.raw_material_ids = {}
+        try:
+            with transaction.atomic():
+                yield
+                raw_material_ids = list(_pending_ledger_rows.raw_material_ids)
+                _pending_ledger_rows.raw_material_ids = None
+                for raw_material_id in raw_material_ids:
+                    self._write_ledger_row(raw_material_id)
+        finally:
+            _pending_ledger_rows.raw_material_ids = None
+
+    def record(self, inventory_change):
+        """Point the balance of a raw material at a newly written ledger row"""
+        balance, _ = self.update_or_create(
+            RawMaterial_id=inventory_change.RawMaterial_id,
+            defaults={
+                "InventoryChange": inventory_change,
+                "QuantityWeightAvailable": inventory_change.QuantityWeightAvailable,
+                "UnitCost": inventory_change.UnitCost,
+                "PurchasedDate": inventory_change.RawMaterial.PurchasedDate,
+            },
+        )
+        LowStockAlert.objects.sync(
+            inventory_change.RawMaterial, balance.QuantityWeightAvailable
+        )
+        index_balance(balance, inventory_change.RawMaterial)
+        bump_filament(inventory_change.RawMaterial.Filament_id)
+        return balance
+
+    def reserve(self, raw_material_id, weight):
+        """
+        Take grams off a spool and write the matching ledger row.
+        The balance is decremented with a conditional UPDATE, which locks the row
+        until commit, so concurrent reservations can never oversell a spool.
+        Raises ValidationError if the spool does not hold enough material.
+        """
+        with transaction.atomic():
+            reserved = self.filter(
+                RawMaterial_id=raw_material_id,
+                QuantityWeightAvailable__gte=weight,
+            ).update(QuantityWeightAvailable=F("QuantityWeightAvailable") - weight)
+            if not reserved:
+                raise ValidationError(
+                    f"Not enough inventory available. Need {weight}g "
+                    "but the selected spool does not have enough material."
+                )
+            return self._write_or_defer_ledger_row(raw_material_id)
+
+    def release(self, raw_material_id, weight):
+        """Put grams back on a spool and write the matching ledger row"""
+        with transaction.atomic():
+            self.filter(RawMaterial_id=raw_material_id).update(
+                QuantityWeightAvailable=F("QuantityWeightAvailable") + weight
+            )
+            return self._write_or_defer_ledger_row(raw_material_id)
+
+    def set_unit_cost(self, raw_material_id, unit_cost):
+        """Change the unit cost of a spool's stock and write the matching ledger row"""
+        with transaction.atomic():
+            self.filter(RawMaterial_id=raw_material_id).update(UnitCost=unit_cost)
+            return self._write_or_defer_ledger_row(raw_material_id)
+
+    def _write_or_defer_ledger_row(self, raw_material_id):
+        """
+        Write the ledger row for a balance change now, or leave it for the end
+        of the enclosing coalesce_ledger_writes block. Returns None when deferred.
+        """
+        pending = getattr(_pending_ledger_rows, "raw_material_ids", None)
+        if pending is not None:
+            pending[raw_material_id] = True
+            return None
+        return self._write_ledger_row(raw_material_id)
+
+    def _write_ledger_row(self, raw_material_id):
+        """Append a ledger row holding the locked balance of a raw material"""
+        balance = (
+            self.select_for_update()
+            .select_related("RawMaterial")
+            .get(RawMaterial_id=raw_material_id)
+        )
+        return InventoryChange.objects.create(
+            RawMaterial=balance.RawMaterial,
+            QuantityWeightAvailable=balance.QuantityWeightAvailable,
+            UnitCost=balance.UnitCost,
+        )
+
+    def refresh(self, raw_material_id):
+        """
+        Rebuild the balance of a raw material from its latest ledger row.
+        Used when a row other than a fresh insert changes,
+        e.g. an edited or deleted InventoryChange.
+        """
+        latest = (
+            InventoryChange.objects.filter(RawMaterial_id=raw_material_id)
+            .order_by("-InventoryChangeDate", "-id")
+            .first()
+        )
+        if latest is None:
+            self.filter(RawMaterial_id=raw_material_id).delete()
+            LowStockAlert.objects.filter(RawMaterial_id=raw_material_id).delete()
+            invalidate_index()
+            bump_all_filaments()
+            return None
+        return self.record(latest)
+
+
+class InventoryBalance(models.Model):
+    """
+    Materialized current balance, one row per raw material.
+    Points at the latest InventoryChange so current stock, reorder checks
+    and FIFO selection don't have to scan the ledger history.
+    """
+
+    RawMaterial = models.OneToOneField(
+        RawMaterials, on_delete=models.CASCADE, related_name="inventory_balance"
+    )
+    InventoryChange = models.OneToOneField(
+        InventoryChange,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="current_balance",
+    )
+    QuantityWeightAvailable = models.IntegerField()
+    UnitCost = models.DecimalField(max_digits=10, decimal_places=2)
+    # Copied from RawMaterials.PurchasedDate so FIFO ordering needs no join
+    PurchasedDate = models.DateTimeField()
+    UpdatedAt = models.DateTimeField(auto_now=True)
+    objects = InventoryBalanceManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["QuantityWeightAvailable", "PurchasedDate"],
+                name="balance_quantity_idx",
+            ),
+            models.Index(
+                fields=["RawMaterial", "QuantityWeightAvailable", "PurchasedDate"],
+                name="balance_material_fifo_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.RawMaterial} - {self.QuantityWeightAvailable}g"
+
+    @property
+    def needs_reorder(self):
+        """
+        Check if current balance is below reorder threshold
+        Threshold set to 20% of original amount
+        """
+        threshold = Decimal(self.RawMaterial.MaterialWeightPurchased) * Decimal("0.2")
+        return self.QuantityWeightAvailable < threshold
+
+
+class LowStockAlertManager(models.Manager):
+    """Custom manager for LowStockAlert to raise and clear alerts as balances change"""
+
+    def sync(self, raw_material, quantity):
+        """
+        Raise, update or clear the alert for a raw material after a balance change.
+        A spool is low when it still has material but less than
+        20% of the original amount, matching InventoryBalance.needs_reorder.
+        """
+        threshold = LowStockAlert.threshold_for(raw_material)
+        if 0 < quantity < threshold:
+            alert, _ = self.update_or_create(
+                RawMaterial=raw_material,
+                defaults={"QuantityWeightAvailable": quantity, "Threshold": threshold},
+            )
+            return alert
+        self.filter(RawMaterial=raw_material).delete()
+        return None
+
+    def sync_many(self, quantities):
+        """
+        Bulk sync for many raw materials at once, given (raw material, quantity) pairs.
+        Runs a fixed number of queries however many raw materials are passed.
+        """
+        low = {}
+        for raw_material, quantity in quantities:
+            threshold = LowStockAlert.threshold_for(raw_material)
+            if 0 < quantity < threshold:
+                low[raw_material.id] = (raw_material, quantity, threshold)
+        self.filter(
+            RawMaterial_id__in=[raw_material.id for raw_material, _ in quantities]
+        ).exclude(RawMaterial_id__in=low).delete()
+
+        existing = {
+            alert.RawMaterial_id: alert for alert in self.filter(RawMaterial_id__in=low)
+        }
+        now = timezone.now()
+        for raw_material_id, alert in existing.items():
+            _, alert.QuantityWeightAvailable, alert.Threshold = low[raw_material_id]
+            alert.UpdatedAt = now
+        self.bulk_update(
+            existing.values(), ["QuantityWeightAvailable", "Threshold", "UpdatedAt"]
+        )
+        self.bulk_create(
+            LowStockAlert(
+                RawMaterial=raw_material,
+                QuantityWeightAvailable=quantity,
+                Threshold=threshold,
+            )
+            for raw_material_id, (raw_material, quantity, threshold) in low.items()
+            if raw_material_id not in existing
+        )
+
+
+class LowStockAlert(models.Model):
+    """
+    Persistent queue of raw materials that have crossed the reorder threshold.
+    Rows are raised and cleared as ledger rows are written,
+    so the dashboard reads open alerts without checking every spool.
+    """
+
+    RawMaterial = models.OneToOneField(
+        RawMaterials, on_delete=models.CASCADE, related_name="low_stock_alert"
+    )
+    QuantityWeightAvailable = models.IntegerField()
+    Threshold = models.IntegerField()
+    CreatedAt = models.DateTimeField(auto_now_add=True)
+    UpdatedAt = models.DateTimeField(auto_now=True)
+    objects = LowStockAlertManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["CreatedAt"], name="low_stock_created_idx")]
+
+    def __str__(self):
+        return f"{self.RawMaterial} - {self.QuantityWeightAvailable}g left"
+
+    @staticmethod
+    def threshold_for(raw_material):
+        """Grams below which a spool needs reordering (20% of the original amount)"""
+        return math.ceil(Decimal(raw_material.MaterialWeightPurchased) * Decimal("0.2"))
+
+
+class InventoryAdjustment(models.Model):
+    """
+    Grams a stock count added to or took off a spool, outside any order.
+    The ledger keeps balances rather than changes and may be compacted,
+    so adjustments are kept here for verify_inventory_ledger to replay.
+    """
+
+    RawMaterial = models.ForeignKey(
+        RawMaterials, on_delete=models.CASCADE, related_name="adjustments"
+    )
+    Weight = models.IntegerField()
+    CreatedAt = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.RawMaterial} - {self.Weight:+}g"
+
+
+class InventoryCheckpointManager(models.Manager):
+    """Custom manager for InventoryCheckpoint to take and look up balance snapshots"""
+
+    def take(self):
+        """Copy every current InventoryBalance into a new checkpoint"""
+        with transaction.atomic():
+            checkpoint = self.create(CheckpointDate=timezone.now())
+            InventoryCheckpointEntry.objects.bulk_create(
+                InventoryCheckpointEntry(
+                    Checkpoint=checkpoint,
+                    RawMaterial_id=raw_material_id,
+                    QuantityWeightAvailable=quantity,
+                )
+                for raw_material_id, quantity in InventoryBalance.objects.values_list(
+                    "RawMaterial_id", "QuantityWeightAvailable"
+                ).iterator()
+            )
+        return checkpoint
+
+    def nearest_before(self, moment):
+        """
+        Latest checkpoint taken at or before a moment.
+        The CheckpointDate index turns this into a binary search, not a scan.
+        """
+        return (
+            self.filter(CheckpointDate__lte=moment).order_by("-CheckpointDate").first()
+        )
+
+
+class InventoryCheckpoint(models.Model):
+    """
+    Periodic snapshot of every raw material's balance.
+    Point-in-time queries start from the nearest checkpoint and replay
+    only the ledger rows written after it.
+    """
+
+    CheckpointDate = models.DateTimeField(db_index=True)
+    objects = InventoryCheckpointManager()
+
+    def __str__(self):
+        return f"Checkpoint {self.CheckpointDate}"
+
+
+class InventoryCheckpointEntry(models.Model):
+    """Balance of one raw material at a checkpoint"""
+
+    Checkpoint = models.ForeignKey(
+        InventoryCheckpoint, on_delete=models.CASCADE, related_name="entries"
+    )
+    RawMaterial = models.ForeignKey(RawMaterials, on_delete=models.CASCADE)
+    QuantityWeightAvailable = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["Checkpoint", "RawMaterial"], name="checkpoint_material_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.RawMaterial} - {self.QuantityWeightAvailable}g"
+
+
+@receiver(post_save, sender=InventoryChange)
+def update_inventory_balance(sender, instance, created, raw=False, **kwargs):
+    """
+    Keep the InventoryBalance in step with the ledger.
+    New rows are always the latest for their raw material,
+    anything else (edits, fixtures) re-reads the latest row.
+    """
+    if created and not raw:
+        InventoryBalance.objects.record(instance)
+    else:
+        InventoryBalance.objects.refresh(instance.RawMaterial_id)
+
+
+@receiver(post_delete, sender=InventoryChange)
+def refresh_inventory_balance_on_delete(sender, instance, **kwargs):
+    """
+    Move the InventoryBalance back to the latest remaining ledger row
+    when the deleted row was its current one (the delete nulls the link).
+    Older rows don't affect the balance, so deleting them leaves it alone.
+    """
+    if not InventoryBalance.objects.filter(
+        RawMaterial_id=instance.RawMaterial_id, InventoryChange__isnull=False
+    ).exists():
+        InventoryBalance.objects.refresh(instance.RawMaterial_id)
+
+
 @receiver(post_save, sender=RawMaterials)
 def create_or_update_initial_inventory(sender, instance, created, **kwargs):
     """
     Create initial inventory record when new raw material is added
-    Update the initial inventory record when raw material is updated
-    but only if there is only one inventory record for that raw material
-    and there are no order items linked to that inventory record
+    When a raw material with no order items is updated, append a ledger row
+    restating its stock from the purchase (and any stock count adjustments)
+    if that differs from its current row. Once items use the spool its stock
+    is left alone, but a Cost change still appends a row at the current
+    balance with the new unit cost, which repricing and new items pick up.
+    Ledger rows are never rewritten, so consumers of the inventory feed
+    see the change.
     """
     if created:
         InventoryChange.objects.create(
@@ -176,29 +736,41 @@ def create_or_update_initial_inventory(sender, instance, created, **kwargs):
             QuantityWeightAvailable=instance.MaterialWeightPurchased,
             UnitCost=Decimal(instance.Cost) / Decimal(instance.MaterialWeightPurchased),
         )
-    else:
-        initial_inventory = (
-            InventoryChange.objects.filter(RawMaterial=instance)
-            .order_by("InventoryChangeDate")
-            .first()
+        return
+
+    has_orders = (
+        OrderItems.objects.filter(InventoryChange__RawMaterial=instance).exists()
+        or OrderItemAllocation.objects.filter(RawMaterial=instance).exists()
+    )
+    latest = (
+        InventoryChange.objects.filter(RawMaterial=instance)
+        .order_by("-InventoryChangeDate", "-id")
+        .first()
+    )
+    # The unit cost as the database stores it, so unchanged costs compare equal
+    field = InventoryChange._meta.get_field("UnitCost")
+    unit_cost = Decimal(
+        format_number(
+            Decimal(instance.Cost) / Decimal(instance.MaterialWeightPurchased),
+            field.max_digits,
+            field.decimal_places,
         )
-        if initial_inventory:
-            inventory_count = InventoryChange.objects.filter(
-                RawMaterial=instance
-            ).count()
-            has_orders = OrderItems.objects.filter(
-                InventoryChange__RawMaterial=instance
-            ).exists()
-            if inventory_count == 1 or not has_orders:
-                initial_inventory.QuantityWeightAvailable = (
-                    instance.MaterialWeightPurchased
-                )
-                initial_inventory.UnitCost = Decimal(instance.Cost) / Decimal(
-                    instance.MaterialWeightPurchased
-                )
-                initial_inventory.save(
-                    update_fields=["QuantityWeightAvailable", "UnitCost"]
-                )
+    )
+    if latest and not has_orders:
+        adjusted = instance.adjustments.aggregate(total=Sum("Weight"))["total"] or 0
+        quantity = max(instance.MaterialWeightPurchased + adjusted, 0)
+        if (latest.QuantityWeightAvailable, latest.UnitCost) != (quantity, unit_cost):
+            InventoryChange.objects.create(
+                RawMaterial=instance,
+                QuantityWeightAvailable=quantity,
+                UnitCost=unit_cost,
+            )
+            return
+    elif latest and latest.UnitCost != unit_cost:
+        InventoryBalance.objects.set_unit_cost(instance.id, unit_cost)
+        return
+    # The purchased weight may have changed, which moves the threshold
+    InventoryBalance.objects.refresh(instance.id)
 
 
 class Models(models.Model):
@@ -232,6 +804,15 @@ class Models(models.Model):
         return f"{self.Name}"
 
 
+@receiver(post_save, sender=Models)
+@receiver(post_delete, sender=Models)
+def expire_model_quotes(sender, instance, **kwargs):
+    """
+    Cached price quotes of a model are stale once its costs change
+    """
+    bump_model(instance.id)
+
+
 class UserProfiles(models.Model):
     """Table to store all user profiles"""
 
@@ -338,6 +919,20 @@ class Orders(models.Model):
             )
 
 
+# Fields of an order item that decide its weight and price, as stored
+# (attnames, so reading them never queries), followed by the results
+PRICING_FIELDS = (
+    "Model_id",
+    "InventoryChange_id",
+    "InfillMultiplier",
+    "ItemQuantity",
+    "Markup",
+    "TotalWeight",
+    "CostOfGoodsSold",
+    "ItemPrice",
+)
+
+
 class OrderItems(models.Model):
     """Table to store all order items"""
 
@@ -379,6 +974,37 @@ class OrderItems(models.Model):
     def __str__(self):
         return f"{self.Model.Name} - {self.ItemQuantity}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the pricing fingerprint of a loaded item"""
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_pricing = instance.pricing_fingerprint()
+        return instance
+
+    def pricing_fingerprint(self):
+        """
+        The pricing inputs and results of this item as currently set,
+        or None if some were not loaded.
+        """
+        values = self.__dict__
+        if any(name not in values for name in PRICING_FIELDS):
+            return None
+        return tuple(values[name] for name in PRICING_FIELDS)
+
+    def needs_pricing(self):
+        """
+        Whether save must recompute the weight and price: always for a new item,
+        otherwise only when a pricing input or result differs from when it was
+        loaded. Cost changes on the model or spool are applied to existing items
+        by the reprice_premade_items command, not by re-saving them.
+        """
+        fingerprint = self.pricing_fingerprint()
+        return (
+            self._state.adding
+            or fingerprint is None
+            or fingerprint != getattr(self, "loaded_pricing", None)
+        )
+
     def calculate_infill_multiplier(self, infill_percentage=None):
         """
         Calculate the infill multiplier based on the given infill percentage.
@@ -408,18 +1034,13 @@ class OrderItems(models.Model):
             return 0
 
         try:
-            density = Decimal(self.InventoryChange.RawMaterial.MaterialDensity)
-            infill_multiplier = Decimal(self.InfillMultiplier)
-            quantity = Decimal(self.ItemQuantity)
-            estimated_print_volume = Decimal(self.Model.EstimatedPrintVolume)
-            base_infill = Decimal(self.Model.BaseInfill)
-            volume_cm3 = (
-                Decimal(estimated_print_volume)
-                * Decimal(base_infill)
-                * Decimal(infill_multiplier)
+            return fixed_point.required_weight(
+                self.Model.EstimatedPrintVolume,
+                self.Model.BaseInfill,
+                self.InfillMultiplier,
+                self.InventoryChange.RawMaterial.MaterialDensity,
+                self.ItemQuantity,
             )
-            weight = Decimal(volume_cm3) * Decimal(density) * Decimal(quantity)
-            return max(1, int(weight.quantize(Decimal("1"), rounding=ROUND_HALF_UP)))
 
         except (AttributeError, TypeError, InvalidOperation) as e:
             print(f"Error in calculate_required_weight: {e}")
@@ -429,60 +1050,189 @@ class OrderItems(models.Model):
         """
         Calculate and return all price components as a dictionary.
         This ensures consistent price calculation across the application.
+        The arithmetic lives in store.fixed_point, shared with bulk pricing.
         Returns:
             dict: Contains 'weight', 'material_cost', 'fixed_cost', 'cost_of_goods', 'price'
         """
-        weight = Decimal(self.calculate_required_weight())
-        cost_per_gram = Decimal(self.InventoryChange.UnitCost)
-        wear_tear = Decimal(self.InventoryChange.RawMaterial.WearAndTearMultiplier)
-        fixed_cost = Decimal(self.Model.FixedCost) * Decimal(self.ItemQuantity)
-        markup = Decimal(self.Markup)
-        material_cost = (weight * Decimal(cost_per_gram) * Decimal(wear_tear)).quantize(
-            Decimal("0.0001"), rounding=ROUND_HALF_UP
+        return fixed_point.price_components(
+            self.calculate_required_weight(),
+            self.InventoryChange.UnitCost,
+            self.InventoryChange.RawMaterial.WearAndTearMultiplier,
+            self.Model.FixedCost,
+            self.ItemQuantity,
+            self.Markup,
         )
-        cost_of_goods = (Decimal(fixed_cost) + Decimal(material_cost)).quantize(
-            Decimal("0.0001"), rounding=ROUND_HALF_UP
+
+    def spool_weights(self):
+        """
+        Grams this item holds on each spool as (raw material id, grams) pairs.
+        Split items hold their allocations, anything else holds
+        its TotalWeight on the spool of its InventoryChange.
+        Cart items whose hold was released hold nothing.
+        """
+        if self.is_released():
+            return []
+        allocations = self.allocations.all() if self.pk else []
+        if allocations:
+            return [
+                (allocation.RawMaterial_id, allocation.Weight)
+                for allocation in allocations
+            ]
+        return [(self.InventoryChange.RawMaterial_id, self.TotalWeight)]
+
+    def is_released(self):
+        """Whether this is a cart item whose grams were given back when its hold expired"""
+        return (
+            bool(self.pk)
+            and CartHold.objects.filter(OrderItem=self, Released=True).exists()
         )
-        price = (Decimal(cost_of_goods) * Decimal(markup)).quantize(
-            Decimal("0.01"), rounding=ROUND_HALF_UP
+
+    def reserve(self):
+        """
+        Reserve the TotalWeight of this item on the spool of its InventoryChange,
+        or split it in FIFO order over the spools of its filament
+        when that spool alone cannot cover it.
+        Raises ValidationError if the spools cannot cover it together.
+        """
+        raw_material_id = self.InventoryChange.RawMaterial_id
+        try:
+            InventoryBalance.objects.reserve(raw_material_id, self.TotalWeight)
+        except ValidationError:
+            split = InventoryChange.objects.find_split_for_weight(
+                self.TotalWeight, self.InventoryChange.RawMaterial.Filament_id
+            )
+            if not split:
+                raise
+            self.reserve_split(split)
+
+    def reserve_split(self, allocations):
+        """
+        Reserve the grams of a split item on each of its spools
+        and record where they came from.
+        Call inside the transaction that creates or resizes the item.
+        """
+        for inventory_change, grams in allocations:
+            InventoryBalance.objects.reserve(inventory_change.RawMaterial_id, grams)
+        OrderItemAllocation.objects.bulk_create(
+            OrderItemAllocation(
+                OrderItem=self,
+                RawMaterial_id=inventory_change.RawMaterial_id,
+                Weight=grams,
+            )
+            for inventory_change, grams in allocations
         )
 
-        return {
-            "weight": weight,
-            "material_cost": material_cost,
-            "fixed_cost": fixed_cost,
-            "cost_of_goods": cost_of_goods,
-            "price": price,
-        }
+    def move_reservation(self, previous_raw_material_id, previous_weight):
+        """
+        Adjust the inventory reserved for this item after its quantity
+        or spool changed. Call inside the transaction that saves the item.
+        A split item gives back every allocation and stays on its one spool
+        if that now holds the whole weight, else it is split again in FIFO order.
+        A spool touched twice (release then reserve) gets a single ledger row.
+        A cart item whose hold was released holds nothing to adjust;
+        its new weight is reserved when the cart is next touched.
+        Raises ValidationError if the spools cannot cover the extra grams.
+        """
+        if self.is_released():
+            return
+        with InventoryBalance.objects.coalesce_ledger_writes():
+            raw_material_id = self.InventoryChange.RawMaterial_id
+            allocations = list(self.allocations.all())
+            if allocations:
+                for allocation in allocations:
+                    InventoryBalance.objects.release(
+                        allocation.RawMaterial_id, allocation.Weight
+                    )
+                self.allocations.all().delete()
+                self.reserve()
+            elif raw_material_id != previous_raw_material_id:
+                InventoryBalance.objects.release(
+                    previous_raw_material_id, previous_weight
+                )
+                InventoryBalance.objects.reserve(raw_material_id, self.TotalWeight)
+            elif self.TotalWeight > previous_weight:
+                InventoryBalance.objects.reserve(
+                    raw_material_id, self.TotalWeight - previous_weight
+                )
+            elif self.TotalWeight < previous_weight:
+                InventoryBalance.objects.release(
+                    raw_material_id, previous_weight - self.TotalWeight
+                )
 
     def save(self, *args, **kwargs):
         """
         Override save to calculate costs before saving using the shared calculation method.
+        The save and its inventory reservation share one transaction,
+        so an item is never stored without the grams it consumes.
+        Saves that leave the pricing inputs alone, such as moving premade stock
+        in or out of a cart, skip the recomputation and its related reads.
         """
-        self.TotalWeight = self.calculate_required_weight()
         try:
-            price_components = self.calculate_price_components()
-            self.CostOfGoodsSold = price_components["cost_of_goods"]
-            self.ItemPrice = price_components["price"]
-            super().save(*args, **kwargs)
+            if self.needs_pricing():
+                self.TotalWeight = self.calculate_required_weight()
+                price_components = self.calculate_price_components()
+                self.CostOfGoodsSold = price_components["cost_of_goods"]
+                self.ItemPrice = price_components["price"]
+            with transaction.atomic():
+                super().save(*args, **kwargs)
         except (AttributeError, TypeError) as e:
             print(f"Error in OrderItems.save(): {e}")
             raise
+        self.loaded_pricing = self.pricing_fingerprint()
+
+
+class OrderItemAllocation(models.Model):
+    """
+    Grams of a split order item taken from one spool.
+    Only items too large for any single spool have allocations;
+    their InventoryChange points at the first spool, which prices the item.
+    """
+
+    OrderItem = models.ForeignKey(
+        OrderItems, on_delete=models.CASCADE, related_name="allocations"
+    )
+    RawMaterial = models.ForeignKey(RawMaterials, on_delete=models.PROTECT)
+    Weight = models.IntegerField(validators=[MinValueValidator(1)])
+
+    def __str__(self):
+        return f"{self.OrderItem} - {self.Weight}g from {self.RawMaterial}"
 
 
 @receiver(post_save, sender=OrderItems)
 def create_inventory_change(sender, instance, created, **kwargs):
     """
-    Create inventory change when order item is created
+    Reserve inventory when order item is created
+    The reservation is checked against the locked InventoryBalance,
+    not the possibly stale InventoryChange the item points to.
+    Items given split_allocations reserve on each of those spools instead.
+    Custom items added to a cart start their cart hold with the reservation.
     """
     if created:
-        inventory = instance.InventoryChange
-        new_quantity = inventory.QuantityWeightAvailable - instance.TotalWeight
-        InventoryChange.objects.create(
-            RawMaterial=inventory.RawMaterial,
-            QuantityWeightAvailable=new_quantity,
-            UnitCost=inventory.UnitCost,
-        )
+        allocations = getattr(instance, "split_allocations", None)
+        if allocations:
+            instance.reserve_split(allocations)
+        else:
+            InventoryBalance.objects.reserve(
+                instance.InventoryChange.RawMaterial_id, instance.TotalWeight
+            )
+        if (
+            instance.IsCustom
+            and instance.Order_id
+            and instance.Order.current_status == FulfillmentStatus.Status.DRAFT
+        ):
+            CartHold.objects.create(
+                OrderItem=instance,
+                ExpiresAt=timezone.now()
+                + timedelta(minutes=settings.CART_HOLD_MINUTES),
+            )
+
+
+@receiver(pre_delete, sender=OrderItems)
+def remember_spool_weights(sender, instance, **kwargs):
+    """
+    Read the spools an item holds before its allocations are deleted with it
+    """
+    instance._spool_weights = instance.spool_weights()
 
 
 @receiver(post_delete, sender=OrderItems)
@@ -490,13 +1240,153 @@ def restore_inventory_on_delete(sender, instance, **kwargs):
     """
     Restore inventory when order item is deleted
     """
-    inventory = instance.InventoryChange
-    new_quantity = inventory.QuantityWeightAvailable + instance.TotalWeight
-    InventoryChange.objects.create(
-        RawMaterial=inventory.RawMaterial,
-        QuantityWeightAvailable=new_quantity,
-        UnitCost=inventory.UnitCost,
+    spool_weights = getattr(instance, "_spool_weights", None)
+    if spool_weights is None:
+        spool_weights = instance.spool_weights()
+    for raw_material_id, weight in spool_weights:
+        InventoryBalance.objects.release(raw_material_id, weight)
+
+
+class CartHoldManager(models.Manager):
+    """Custom manager for CartHold to refresh and sweep cart inventory holds"""
+
+    def touch(self, order):
+        """
+        Extend the holds of every custom item in a draft order and reserve
+        again the grams of items whose hold was released while the cart sat idle.
+        Called on cart activity so only abandoned carts let their holds expire.
+        Returns the items whose grams could not be reserved again.
+        """
+        if order.current_status != FulfillmentStatus.Status.DRAFT:
+            return []
+        expires_at = timezone.now() + timedelta(minutes=settings.CART_HOLD_MINUTES)
+        self.filter(OrderItem__Order=order, Released=False).update(ExpiresAt=expires_at)
+        return self.reserve_released(order, expires_at)
+
+    def reserve_released(self, order, expires_at):
+        """
+        Reserve the grams of an order's released items again, on their own
+        spool or split over the spools of their filament.
+        Holds reserved again run until expires_at; the others stay released.
+        Returns the items that could not be reserved.
+        """
+        unreserved = []
+        for hold in self.filter(OrderItem__Order=order, Released=True).select_related(
+            "OrderItem__InventoryChange__RawMaterial"
+        ):
+            try:
+                with transaction.atomic():
+                    # Another visit may have reserved it since it was read
+                    if not (
+                        self.select_for_update()
+                        .filter(pk=hold.pk, Released=True)
+                        .exists()
+                    ):
+                        continue
+                    hold.OrderItem.reserve()
+                    hold.Released = False
+                    hold.ExpiresAt = expires_at
+                    hold.save(update_fields=["Released", "ExpiresAt"])
+            except ValidationError:
+                unreserved.append(hold.OrderItem)
+        return unreserved
+
+    def confirm(self, order):
+        """
+        Drop the holds of an order that left the cart; its grams stay reserved.
+        Released items are reserved again first, and those that cannot be
+        keep their released hold so they are never counted as reserved.
+        """
+        self.reserve_released(order, timezone.now())
+        self.filter(OrderItem__Order=order, Released=False).delete()
+
+    def held_by_raw_material(self):
+        """
+        Grams held by unexpired cart holds, keyed by raw material id.
+        Split items count their allocation on each spool.
+        """
+        now = timezone.now()
+        held = dict(
+            self.filter(ExpiresAt__gt=now, OrderItem__allocations__isnull=True)
+            .values("OrderItem__InventoryChange__RawMaterial")
+            .annotate(held=Sum("OrderItem__TotalWeight"))
+            .values_list("OrderItem__InventoryChange__RawMaterial", "held")
+        )
+        for raw_material_id, grams in (
+            OrderItemAllocation.objects.filter(OrderItem__cart_hold__ExpiresAt__gt=now)
+            .values("RawMaterial")
+            .annotate(held=Sum("Weight"))
+            .values_list("RawMaterial", "held")
+        ):
+            held[raw_material_id] = held.get(raw_material_id, 0) + grams
+        return held
+
+    def release_expired(self, batch_size=500, now=None):
+        """
+        Release one batch of expired holds: put the grams of their items back
+        on the spools and mark them for reservation on the next cart visit.
+        The items stay in their carts; split items give up their allocations.
+        Each spool gets one release and one ledger row for the whole batch.
+        Returns the number of holds released.
+        """
+        now = now or timezone.now()
+        with InventoryBalance.objects.coalesce_ledger_writes():
+            hold_ids = list(
+                self.select_for_update()
+                .filter(Released=False, ExpiresAt__lte=now)
+                .order_by("ExpiresAt")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not hold_ids:
+                return 0
+
+            released = dict(
+                OrderItems.objects.filter(
+                    cart_hold__in=hold_ids, allocations__isnull=True
+                )
+                .values("InventoryChange__RawMaterial")
+                .annotate(grams=Sum("TotalWeight"))
+                .values_list("InventoryChange__RawMaterial", "grams")
+            )
+            allocations = OrderItemAllocation.objects.filter(
+                OrderItem__cart_hold__in=hold_ids
+            )
+            for raw_material_id, grams in (
+                allocations.values("RawMaterial")
+                .annotate(grams=Sum("Weight"))
+                .values_list("RawMaterial", "grams")
+            ):
+                released[raw_material_id] = released.get(raw_material_id, 0) + grams
+            for raw_material_id in sorted(released):
+                InventoryBalance.objects.release(
+                    raw_material_id, released[raw_material_id]
+                )
+            allocations.delete()
+            self.filter(id__in=hold_ids).update(Released=True)
+            return len(hold_ids)
+
+
+class CartHold(models.Model):
+    """
+    Time-limited hold on the grams reserved for a custom item in a draft order.
+    Expired holds are swept by the release_expired_cart_holds command,
+    which returns the item's grams to the spools and marks the hold Released;
+    the item stays in the cart and is reserved again on the next cart visit.
+    """
+
+    OrderItem = models.OneToOneField(
+        OrderItems, on_delete=models.CASCADE, related_name="cart_hold"
     )
+    ExpiresAt = models.DateTimeField()
+    Released = models.BooleanField(default=False)
+    CreatedAt = models.DateTimeField(auto_now_add=True)
+    objects = CartHoldManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["ExpiresAt"], name="cart_hold_expires_idx")]
+
+    def __str__(self):
+        return f"{self.OrderItem} - held until {self.ExpiresAt}"
 
 
 class FulfillmentStatus(models.Model):
@@ -523,3 +1413,12 @@ class FulfillmentStatus(models.Model):
         return (
             f"{self.Order.User.username} - {self.OrderStatus} - {self.StatusChangeDate}"
         )
+
+
+@receiver(post_save, sender=FulfillmentStatus)
+def confirm_cart_holds(sender, instance, created, **kwargs):
+    """
+    Once an order moves past DRAFT its reserved grams no longer expire
+    """
+    if created and instance.OrderStatus != FulfillmentStatus.Status.DRAFT:
+        CartHold.objects.confirm(instance.Order)
@@ -0,0 +1,302 @@
+"""
+Pricing of many custom item configurations at once
+
+calculate_price prices one configuration per request with Decimal arithmetic.
+Both functions here follow its steps, the spool search of calculate_price
+then OrderItems.calculate_price_components, for many configurations while
+reading the database a fixed number of times:
+
+- price_matrix prices a model for every stocked filament, infill level and
+  quantity in one NumPy pass. Amounts are integers in fixed units (grams,
+  ten-thousandths of a dollar, cents), so every ROUND_HALF_UP step gives
+  exactly the Decimal result.
+- price_configurations prices a list of (model, filament, infill, quantity)
+  configurations through OrderItems itself, after loading every model and
+  spool they need in two queries.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from store.fixed_point import round_half_up_div
+from store.models import (
+    ALLOCATION_POLICIES,
+    InventoryBalance,
+    InventoryChange,
+    Models,
+    OrderItems,
+)
+
+INFILL_LEVELS = np.arange(5, 101)
+MAX_MATRIX_QUANTITY = 50
+MAX_CONFIGURATIONS = 500
+# calculate_price looks for a spool holding the weight plus 15%
+SEARCH_MARGIN_PERCENT = 115
+INT64_LIMIT = 2**62
+
+
+def hundredths(value):
+    """A Decimal with at most two decimal places as an integer number of hundredths"""
+    return int(Decimal(value) * 100)
+
+
+def price_matrix(model, max_quantity=10, policy=None):
+    """
+    Prices of a model for every stocked filament, infill level and quantity.
+
+    Each cell matches what calculate_price returns for the same filament,
+    infill percentage and quantity: the spool is the first one the allocation
+    policy picks among those holding the weight plus 15% (sized with the
+    density of the filament's oldest spool), and the price comes from that
+    spool's unit cost, density and wear, rounded as in calculate_price_components.
+
+    Args:
+        model: Models instance to price
+        max_quantity: Quantities 1 to max_quantity are priced
+        policy: Key of ALLOCATION_POLICIES (default: settings.SPOOL_ALLOCATION_POLICY)
+
+    Returns:
+        dict with 'infills' and 'quantities' (the axes) and 'filaments',
+        each with 'id', 'name', 'color', 'prices' (cents) and 'inventory'
+        (the InventoryChange id that would be used), both indexed
+        [infill][quantity] and None where no spool holds enough material.
+    """
+    policy = policy or settings.SPOOL_ALLOCATION_POLICY
+    if policy not in ALLOCATION_POLICIES:
+        raise ValueError(f"Unknown allocation policy '{policy}'")
+    quantities = np.arange(1, max_quantity + 1)
+
+    spools = list(
+        InventoryBalance.objects.filter(
+            InventoryChange__isnull=False, QuantityWeightAvailable__gt=0
+        )
+        .order_by(
+            "RawMaterial__Filament__Name",
+            "RawMaterial__Filament_id",
+            *ALLOCATION_POLICIES[policy],
+        )
+        .values_list(
+            "RawMaterial__Filament_id",
+            "RawMaterial__Filament__Name",
+            "RawMaterial__Filament__ColorHexCode",
+            "InventoryChange_id",
+            "QuantityWeightAvailable",
+            "PurchasedDate",
+            "id",
+            "InventoryChange__UnitCost",
+            "RawMaterial__MaterialDensity",
+            "RawMaterial__WearAndTearMultiplier",
+        )
+    )
+    result = {
+        "infills": INFILL_LEVELS.tolist(),
+        "quantities": quantities.tolist(),
+        "filaments": [],
+    }
+    if not spools:
+        return result
+
+    filament_ids = [spool[0] for spool in spools]
+    first_rows = [
+        row
+        for row in range(len(spools))
+        if not row or filament_ids[row - 1] != filament_ids[row]
+    ]
+    ranks = np.repeat(np.arange(len(first_rows)), np.diff(first_rows + [len(spools)]))
+    change_ids = np.array([spool[3] for spool in spools], dtype=np.int64)
+    grams = np.array([spool[4] for spool in spools], dtype=np.int64)
+    unit_cost = np.array([hundredths(spool[7]) for spool in spools], dtype=np.int64)
+    density = np.array([hundredths(spool[8]) for spool in spools], dtype=np.int64)
+    wear = np.array([hundredths(spool[9]) for spool in spools], dtype=np.int64)
+
+    # Density used to size the search: the oldest spool of each filament
+    oldest = {}
+    for row, spool in enumerate(spools):
+        key = (spool[5], spool[6])
+        if spool[0] not in oldest or key < oldest[spool[0]][0]:
+            oldest[spool[0]] = (key, row)
+    search_density = density[[oldest[filament_ids[row]][1] for row in first_rows]]
+
+    # Searchable capacity per filament: rows sorted by the policy, so under fifo
+    # the first spool holding X grams is where the running maximum reaches X.
+    # Offsetting each filament by its rank keeps one sorted array for all of them.
+    if policy == "fifo":
+        capacity = grams.copy()
+        for start, end in zip(first_rows, first_rows[1:] + [len(spools)]):
+            capacity[start:end] = np.maximum.accumulate(grams[start:end])
+    else:
+        capacity = grams
+    offset = int(grams.max()) + 2
+    keyed_capacity = ranks * offset + capacity
+
+    base_infill = hundredths(model.BaseInfill)
+    fixed_cost = hundredths(model.FixedCost)
+    markup = hundredths(OrderItems._meta.get_field("Markup").default)
+    volume = int(model.EstimatedPrintVolume)
+    # calculate_infill_multiplier: percentage / base percentage to 4 places
+    multiplier = round_half_up_div(INFILL_LEVELS * 10**4, base_infill or 20)
+
+    # Fall back to Python integers if the largest weight or price numerator
+    # could overflow int64
+    largest_size = (
+        volume
+        * base_infill
+        * int(multiplier.max())
+        * int(density.max())
+        * int(quantities.max())
+    )
+    largest_cost = (largest_size // 10**8 + 1) * int(unit_cost.max()) * int(
+        wear.max()
+    ) + fixed_cost * 100 * int(quantities.max())
+    largest = max(largest_size * SEARCH_MARGIN_PERCENT, largest_cost * markup) * 2
+    dtype = np.int64 if largest < INT64_LIMIT else object
+    size = (
+        volume
+        * base_infill
+        * multiplier.astype(dtype)[None, :, None]
+        * quantities.astype(dtype)[None, None, :]
+    )
+
+    # Grams searched for: int(volume_cm3 * density * quantity * 1.15), truncated
+    required = (
+        size
+        * search_density.astype(dtype)[:, None, None]
+        * SEARCH_MARGIN_PERCENT
+        // 10**10
+    )
+    required = np.minimum(required, offset - 1).astype(np.int64)
+    filament_ranks = np.arange(len(first_rows))[:, None, None]
+    found = np.searchsorted(keyed_capacity, filament_ranks * offset + required)
+    clipped = np.minimum(found, len(spools) - 1)
+    available = (found < len(spools)) & (ranks[clipped] == filament_ranks)
+
+    # calculate_price_components with the chosen spool
+    weight = np.maximum(
+        round_half_up_div(size * density[clipped].astype(dtype), 10**8), 1
+    )
+    material_cost = (
+        weight * unit_cost[clipped].astype(dtype) * wear[clipped].astype(dtype)
+    )
+    cost_of_goods = (
+        fixed_cost * 100 * quantities.astype(dtype)[None, None, :] + material_cost
+    )
+    prices = round_half_up_div(cost_of_goods * markup, 10**4)
+
+    # Casting to object turns the cells into Python ints, with None where nothing fits
+    prices = np.where(available, prices, None).tolist()
+    inventory = np.where(available, change_ids[clipped].astype(object), None).tolist()
+    result["filaments"] = [
+        {
+            "id": spools[row][0],
+            "name": spools[row][1],
+            "color": f"#{spools[row][2]}",
+            "prices": prices[rank],
+            "inventory": inventory[rank],
+        }
+        for rank, row in enumerate(first_rows)
+    ]
+    return result
+
+
+def price_configurations(configurations, policy=None):
+    """
+    Price many configurations exactly as calculate_price would, one by one.
+
+    Reads the models in one query and the spools of every filament involved
+    in another, picks each configuration's spool from those in memory, and
+    prices it with OrderItems.calculate_price_components.
+
+    Args:
+        configurations: list of dicts with 'model' and 'filament' ids,
+            'infill' (a percentage, or None for the model's base infill)
+            and 'quantity'
+        policy: Key of ALLOCATION_POLICIES (default: settings.SPOOL_ALLOCATION_POLICY)
+
+    Returns:
+        list with one dict per configuration, in order: 'status' 'success'
+        with 'price', 'weight', 'cost_of_goods', 'infill', 'quantity' and
+        'inventory_id', or 'status' 'error' with a 'message'.
+    """
+    policy = policy or settings.SPOOL_ALLOCATION_POLICY
+    if policy not in ALLOCATION_POLICIES:
+        raise ValueError(f"Unknown allocation policy '{policy}'")
+
+    models = Models.objects.in_bulk({config["model"] for config in configurations})
+    spools = defaultdict(list)
+    for balance in (
+        InventoryBalance.objects.filter(
+            RawMaterial__Filament_id__in={
+                config["filament"] for config in configurations
+            },
+            InventoryChange__isnull=False,
+            QuantityWeightAvailable__gt=0,
+        )
+        .select_related("InventoryChange__RawMaterial")
+        .order_by(*ALLOCATION_POLICIES[policy])
+    ):
+        spools[balance.InventoryChange.RawMaterial.Filament_id].append(balance)
+
+    return [
+        price_configuration(
+            models.get(config["model"]), spools[config["filament"]], config
+        )
+        for config in configurations
+    ]
+
+
+def price_configuration(model, spools, config):
+    """One configuration of price_configurations, given its model and spools"""
+    if model is None:
+        return {"status": "error", "message": "Model not found"}
+    if not spools:
+        return {
+            "status": "error",
+            "message": "No available inventory for this filament",
+        }
+
+    infill_percentage = config["infill"]
+    if infill_percentage is None:
+        infill_percentage = Decimal(int(model.BaseInfill * 100))
+    infill_percentage = max(Decimal("1"), min(Decimal("100"), infill_percentage))
+    quantity = config["quantity"]
+    infill_multiplier = OrderItems(Model=model).calculate_infill_multiplier(
+        infill_percentage
+    )
+
+    # calculate_price sizes the search with the filament's oldest spool
+    oldest = min(spools, key=lambda balance: (balance.PurchasedDate, balance.id))
+    volume_cm3 = model.EstimatedPrintVolume * model.BaseInfill * infill_multiplier
+    required_weight = int(
+        volume_cm3
+        * oldest.InventoryChange.RawMaterial.MaterialDensity
+        * quantity
+        * Decimal("1.15")
+    )
+    needed = InventoryChange.objects.weight_with_margin(required_weight, Decimal("1.0"))
+    balance = next(
+        (balance for balance in spools if balance.QuantityWeightAvailable >= needed),
+        None,
+    )
+    if balance is None:
+        return {
+            "status": "error",
+            "message": "Not enough inventory available for the selected options",
+        }
+
+    price_components = OrderItems(
+        Model=model,
+        InventoryChange=balance.InventoryChange,
+        InfillMultiplier=infill_multiplier,
+        ItemQuantity=quantity,
+        IsCustom=True,
+    ).calculate_price_components()
+    return {
+        "status": "success",
+        "price": price_components["price"].quantize(Decimal("0.01")),
+        "weight": price_components["weight"],
+        "cost_of_goods": price_components["cost_of_goods"].quantize(Decimal("0.01")),
+        "infill": infill_percentage,
+        "quantity": quantity,
+        "inventory_id": balance.InventoryChange_id,
+    }
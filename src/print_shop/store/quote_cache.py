@@ -0,0 +1,113 @@
+"""
+Cache of custom item price quotes
+
+The customizer asks calculate_price for a quote on every slider or quantity
+change, and each quote reads the model, the filament's spools and the chosen
+ledger row before running the Decimal pricing. Those inputs change rarely
+compared with how often they are read, so quotes are kept in Django's cache
+keyed by (model, filament, infill, quantity, markup). The spool a quote was
+priced from is part of the cached response.
+
+Every key also carries version stamps:
+
+- the model's, bumped when it is saved or deleted (FixedCost, BaseInfill,
+  EstimatedPrintVolume);
+- the filament's, bumped on every ledger write for one of its spools, which
+  covers UnitCost, spool grams and, through the ledger rows a RawMaterials
+  save rewrites, MaterialDensity and WearAndTearMultiplier;
+- one shared by all filaments, bumped by bulk ledger writes that skip the
+  signals (imports, stock count reconciliation).
+
+Markup is part of the key itself. Bumping a stamp makes every older quote
+unreachable, and those entries age out after QUOTE_CACHE_SECONDS. A hit is
+served from the cache alone, without touching the database.
+
+Stamps live in the same cache as the quotes, so every worker process must
+use one shared backend (CACHE_URL), or a bump made by one worker would never
+reach the others. Caching is off unless QUOTE_CACHE_SECONDS is set, and
+store.checks refuses to start with it on over a per-process backend.
+"""
+
+import uuid
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+ALL_FILAMENTS_STAMP = "quote-stamp:all"
+
+
+def model_stamp(model_id):
+    return f"quote-stamp:model:{model_id}"
+
+
+def filament_stamp(filament_id):
+    return f"quote-stamp:filament:{filament_id}"
+
+
+def current_stamps(keys):
+    """The stamps stored under the keys, starting any missing one afresh"""
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, uuid.uuid4().hex, None)
+            stamps[key] = cache.get(key)
+    return [stamps[key] for key in keys]
+
+
+def quote_key(model_id, filament_id, infill, quantity, markup):
+    """
+    Cache key of a quote under the current stamps, or None when the quote
+    should not be cached (caching disabled, or no valid infill requested).
+    """
+    if not settings.QUOTE_CACHE_SECONDS or infill is None:
+        return None
+    try:
+        infill = Decimal(infill)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    if not infill.is_finite():
+        return None
+    stamps = current_stamps(
+        [model_stamp(model_id), filament_stamp(filament_id), ALL_FILAMENTS_STAMP]
+    )
+    parts = [model_id, filament_id, infill.normalize(), quantity, markup, *stamps]
+    return "quote:" + ":".join(str(part) for part in parts)
+
+
+def get_quote(key):
+    """The cached (response data, status) of a quote, or None"""
+    return cache.get(key) if key else None
+
+
+def set_quote(key, data, status=200):
+    if key:
+        cache.set(key, (data, status), settings.QUOTE_CACHE_SECONDS)
+
+
+def bump(key):
+    """
+    Give a stamp a new value now, so the writing transaction sees fresh quotes,
+    and again on commit, so quotes priced from the old rows in between are
+    dropped too.
+    """
+    if not settings.QUOTE_CACHE_SECONDS:
+        return
+
+    def renew():
+        cache.set(key, uuid.uuid4().hex, None)
+
+    renew()
+    transaction.on_commit(renew)
+
+
+def bump_model(model_id):
+    bump(model_stamp(model_id))
+
+
+def bump_filament(filament_id):
+    bump(filament_stamp(filament_id))
+
+
+def bump_all_filaments():
+    bump(ALL_FILAMENTS_STAMP)
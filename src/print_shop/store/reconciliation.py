@@ -0,0 +1,223 @@
+"""
+Stock count reconciliation for raw materials
+
+Floor staff weigh spools and submit the readings in bulk. A spool on the scale
+still carries the grams reserved for custom items that have not been printed,
+so its expected weight is its balance plus those grams. Readings further off
+than a tolerance move the balance to match. Each adjustment is recorded as
+an InventoryAdjustment of the grams added or removed, which the ledger audit
+replays, and as a ledger row holding the new balance. Everything is written
+in one transaction with a fixed number of queries, so a whole-warehouse count
+costs about the same as a single spool.
+"""
+
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery, Sum
+from store.models import (
+    FulfillmentStatus,
+    InventoryAdjustment,
+    InventoryBalance,
+    InventoryChange,
+    LowStockAlert,
+    OrderItemAllocation,
+    OrderItems,
+)
+from store.quote_cache import bump_all_filaments
+from store.spool_index import invalidate_index
+
+# Scale error in grams that is reported but not adjusted
+DEFAULT_TOLERANCE = 5
+MAX_READINGS = 5000
+
+UNPRINTED_STATUSES = [
+    FulfillmentStatus.Status.DRAFT,
+    FulfillmentStatus.Status.PENDING_PAYMENT,
+    FulfillmentStatus.Status.PAID,
+    FulfillmentStatus.Status.PRINTING,
+]
+
+
+def unprinted_weights(raw_material_ids):
+    """
+    Grams reserved per raw material for custom items that are not printed yet,
+    i.e. items of orders whose latest status is before shipping.
+    Split items count the grams allocated to each of their spools, and cart
+    items whose hold was released count nothing.
+    """
+    latest_status = (
+        FulfillmentStatus.objects.filter(Order=OuterRef("Order"))
+        .order_by("-StatusChangeDate", "-id")
+        .values("OrderStatus")[:1]
+    )
+    items = (
+        OrderItems.objects.annotate(order_status=Subquery(latest_status))
+        .filter(IsCustom=True, order_status__in=UNPRINTED_STATUSES)
+        .exclude(cart_hold__Released=True)
+    )
+    weights = dict(
+        items.filter(
+            InventoryChange__RawMaterial_id__in=raw_material_ids,
+            allocations__isnull=True,
+        )
+        .values("InventoryChange__RawMaterial_id")
+        .annotate(total=Sum("TotalWeight"))
+        .values_list("InventoryChange__RawMaterial_id", "total")
+    )
+    for raw_material_id, total in (
+        OrderItemAllocation.objects.filter(
+            RawMaterial_id__in=raw_material_ids,
+            OrderItem__in=items.values("id"),
+        )
+        .values("RawMaterial_id")
+        .annotate(total=Sum("Weight"))
+        .values_list("RawMaterial_id", "total")
+    ):
+        weights[raw_material_id] = weights.get(raw_material_id, 0) + total
+    return weights
+
+
+def clean_readings(readings):
+    """
+    Check (raw material id, measured grams) pairs before anything is locked.
+    Raises ValidationError listing every bad reading.
+    """
+    if not readings:
+        raise ValidationError("No readings were submitted.")
+    if len(readings) > MAX_READINGS:
+        raise ValidationError(f"At most {MAX_READINGS} readings can be submitted.")
+    errors = []
+    seen = set()
+    for raw_material_id, measured in readings:
+        if measured < 0:
+            errors.append(f"Raw material {raw_material_id}: grams cannot be negative.")
+        if raw_material_id in seen:
+            errors.append(f"Raw material {raw_material_id} was weighed twice.")
+        seen.add(raw_material_id)
+    if errors:
+        raise ValidationError(errors)
+
+
+def reconcile_readings(readings, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare scale readings with the expected spool weights and adjust the balances.
+
+    A spool is adjusted when its reading differs from the expected weight by
+    more than the tolerance. Its new balance is the measured grams less
+    the grams still reserved for unprinted items; a spool weighing less than
+    its reservations is set to zero and flagged as overcommitted.
+    All balances are locked and all ledger rows written in one transaction.
+
+    Args:
+        readings: list of (raw material id, measured grams) pairs
+        tolerance: Largest variance in grams left unadjusted
+
+    Returns:
+        dict with 'lines', one per reading in raw material order with
+        'raw_material_id', 'filament', 'expected', 'measured', 'reserved',
+        'variance', 'value' (variance at the spool's unit cost),
+        'adjusted' and 'overcommitted', plus totals over all lines.
+
+    Raises:
+        ValidationError: for negative, repeated or unknown raw materials
+    """
+    clean_readings(readings)
+    measured_by_id = dict(readings)
+
+    with transaction.atomic():
+        balances = list(
+            InventoryBalance.objects.select_for_update()
+            .select_related("RawMaterial__Filament")
+            .filter(RawMaterial_id__in=measured_by_id)
+            .order_by("RawMaterial_id")
+        )
+        unknown = set(measured_by_id) - {balance.RawMaterial_id for balance in balances}
+        if unknown:
+            raise ValidationError(
+                "Unknown raw materials: "
+                + ", ".join(str(raw_material_id) for raw_material_id in sorted(unknown))
+            )
+        reserved_by_id = unprinted_weights(list(measured_by_id))
+
+        lines = []
+        adjusted = []
+        for balance in balances:
+            measured = measured_by_id[balance.RawMaterial_id]
+            reserved = reserved_by_id.get(balance.RawMaterial_id, 0)
+            expected = balance.QuantityWeightAvailable + reserved
+            variance = measured - expected
+            needs_adjustment = abs(variance) > tolerance
+            if needs_adjustment:
+                adjustment = (
+                    max(measured - reserved, 0) - balance.QuantityWeightAvailable
+                )
+                balance.QuantityWeightAvailable += adjustment
+                adjusted.append((balance, adjustment))
+            lines.append(
+                {
+                    "raw_material_id": balance.RawMaterial_id,
+                    "filament": balance.RawMaterial.Filament.Name,
+                    "expected": expected,
+                    "measured": measured,
+                    "reserved": reserved,
+                    "variance": variance,
+                    "value": (variance * balance.UnitCost).quantize(Decimal("0.01")),
+                    "adjusted": needs_adjustment,
+                    "overcommitted": measured < reserved,
+                }
+            )
+        if adjusted:
+            write_adjustments(adjusted)
+
+    return {
+        "lines": lines,
+        "readings": len(lines),
+        "adjusted": len(adjusted),
+        "total_variance": sum(line["variance"] for line in lines),
+        "total_value": sum((line["value"] for line in lines), Decimal("0.00")),
+    }
+
+
+def write_adjustments(adjustments):
+    """
+    Record (locked balance, grams added) adjustments: one InventoryAdjustment
+    and one ledger row per balance, with the balances pointed at the new rows.
+    bulk_create skips the ledger signals, so this does their work here,
+    as the raw materials import does. Not every database returns the new ids
+    from a bulk insert, so the new ledger rows are read back: the balances are
+    locked, so the only rows of their spools past the previous highest id are
+    the ones written here.
+    """
+    balances = [balance for balance, _ in adjustments]
+    InventoryAdjustment.objects.bulk_create(
+        InventoryAdjustment(RawMaterial_id=balance.RawMaterial_id, Weight=weight)
+        for balance, weight in adjustments
+    )
+    last_id = InventoryChange.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+    InventoryChange.objects.bulk_create(
+        InventoryChange(
+            RawMaterial=balance.RawMaterial,
+            QuantityWeightAvailable=balance.QuantityWeightAvailable,
+            UnitCost=balance.UnitCost,
+        )
+        for balance in balances
+    )
+    inventory_changes = dict(
+        InventoryChange.objects.filter(
+            RawMaterial_id__in=[balance.RawMaterial_id for balance in balances],
+            id__gt=last_id,
+        )
+        .order_by("id")
+        .values_list("RawMaterial_id", "id")
+    )
+    for balance in balances:
+        balance.InventoryChange_id = inventory_changes[balance.RawMaterial_id]
+    InventoryBalance.objects.bulk_update(
+        balances, ["InventoryChange", "QuantityWeightAvailable"]
+    )
+    LowStockAlert.objects.sync_many(
+        [(balance.RawMaterial, balance.QuantityWeightAvailable) for balance in balances]
+    )
+    invalidate_index()
+    bump_all_filaments()
@@ -0,0 +1,284 @@
+"""
+Repricing of unsold premade stock
+
+Premade items (no order, not custom) are priced when they are made, so their
+ItemPrice goes stale when a model's FixedCost or a spool's Cost or
+WearAndTearMultiplier changes. A Cost change appends a ledger row with the new
+UnitCost, so items are priced from the current ledger row of their spool and
+moved onto it, as the edit form does when it picks a row. Repricing then
+stores exactly what OrderItems.save would store for the item, but for many rows
+at once. Each chunk costs four reads: the ids of the items, locked, then the
+items, and the amounts of their models and of their spools (joined through to
+the raw material), each read and converted for the integer kernel once. Prices are computed with the kernel and
+written back in a few statements.
+
+An item whose recomputed weight differs (a density or print volume change)
+also needs its reserved grams moved, which only saving it through the edit
+form does, so it is skipped and counted instead of repriced.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from functools import lru_cache
+from django.db import transaction
+from django.db.backends.utils import format_number
+from store import fixed_point
+from store.models import InventoryBalance, Models, OrderItems
+
+CHUNK_SIZE = 2000
+
+
+def unsold_premade_items():
+    return OrderItems.objects.filter(Order__isnull=True, IsCustom=False)
+
+
+@lru_cache(maxsize=4096)
+def stored_cost(value):
+    """A cost of goods as the database stores it, with two decimal places"""
+    field = OrderItems._meta.get_field("CostOfGoodsSold")
+    return Decimal(format_number(value, field.max_digits, field.decimal_places))
+
+
+@lru_cache(maxsize=256)
+def item_units(multiplier, markup):
+    """Infill multiplier and markup of an item in kernel units"""
+    return fixed_point.to_units(multiplier, 4), fixed_point.to_units(markup, 2)
+
+
+def load_models(model_ids):
+    """Name, Decimal amounts and kernel units of each model by id"""
+    models = {}
+    for model_id, name, volume, base_infill, fixed_cost in Models.objects.filter(
+        id__in=model_ids
+    ).values_list("id", "Name", "EstimatedPrintVolume", "BaseInfill", "FixedCost"):
+        amounts = (volume, base_infill, fixed_cost)
+        units = (
+            fixed_point.to_units(volume, 0),
+            fixed_point.to_units(base_infill, 2),
+            fixed_point.to_units(fixed_cost, 2),
+        )
+        models[model_id] = (name, amounts, None if None in units else units)
+    return models
+
+
+def load_spools(raw_material_ids):
+    """
+    Filament name, Decimal amounts and kernel units of each spool by raw
+    material id, with the id of its current ledger row, whose UnitCost is used
+    """
+    spools = {}
+    for (
+        raw_material_id,
+        change_id,
+        filament,
+        unit_cost,
+        density,
+        wear,
+    ) in InventoryBalance.objects.filter(
+        RawMaterial_id__in=raw_material_ids, InventoryChange__isnull=False
+    ).values_list(
+        "RawMaterial_id",
+        "InventoryChange_id",
+        "RawMaterial__Filament__Name",
+        "InventoryChange__UnitCost",
+        "RawMaterial__MaterialDensity",
+        "RawMaterial__WearAndTearMultiplier",
+    ):
+        amounts = (unit_cost, density, wear)
+        units = (
+            fixed_point.to_units(unit_cost, 2),
+            fixed_point.to_units(density, 2),
+            fixed_point.to_units(wear, 2),
+        )
+        spools[raw_material_id] = (
+            filament,
+            amounts,
+            None if None in units else units,
+            change_id,
+        )
+    return spools
+
+
+def price_item(model, spool, multiplier, markup, quantity):
+    """
+    (grams, cost of goods, price) as OrderItems.save computes them, with the
+    integer kernel when every amount is exact in its units, else with Decimal.
+    """
+    _, model_amounts, model_units = model
+    _, spool_amounts, spool_units, _ = spool
+    multiplier_units, markup_units = item_units(multiplier, markup)
+    if (
+        model_units
+        and spool_units
+        and multiplier_units is not None
+        and markup_units is not None
+        and quantity >= 0
+    ):
+        volume, base_infill, fixed_cost = model_units
+        unit_cost, density, wear = spool_units
+        grams = fixed_point.weight_grams(
+            volume, base_infill, multiplier_units, density, quantity
+        )
+        amounts = grams and fixed_point.price_units(
+            grams, unit_cost, wear, fixed_cost, quantity, markup_units
+        )
+        if amounts:
+            _, cost_of_goods, cents = amounts
+            return grams, Decimal(cost_of_goods).scaleb(-4), Decimal(cents).scaleb(-2)
+
+    volume, base_infill, fixed_cost = model_amounts
+    unit_cost, density, wear = spool_amounts
+    grams = fixed_point.required_weight(
+        volume, base_infill, multiplier, density, quantity
+    )
+    components = fixed_point.price_components(
+        grams, unit_cost, wear, fixed_cost, quantity, markup
+    )
+    return grams, components["cost_of_goods"], components["price"]
+
+
+def write_prices(items):
+    """
+    Store new prices and ledger rows. Premade stock repeats a few
+    configurations, so items sharing a price and row are set with one UPDATE
+    each and only the rest go through bulk_update, whose CASE per row is slow
+    for thousands of rows.
+    """
+    by_price = defaultdict(list)
+    for item in items:
+        by_price[
+            (item.CostOfGoodsSold, item.ItemPrice, item.InventoryChange_id)
+        ].append(item)
+    singles = []
+    for (cost_of_goods, price, change_id), group in by_price.items():
+        if len(group) == 1:
+            singles.extend(group)
+        else:
+            OrderItems.objects.filter(id__in=[item.id for item in group]).update(
+                CostOfGoodsSold=cost_of_goods,
+                ItemPrice=price,
+                InventoryChange_id=change_id,
+            )
+    if singles:
+        OrderItems.objects.bulk_update(
+            singles, ["CostOfGoodsSold", "ItemPrice", "InventoryChange"]
+        )
+
+
+def reprice_premade_items(items=None, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Recompute the price of unsold premade items and store the changed ones.
+
+    Args:
+        items: OrderItems queryset to reprice, narrowed to unsold premade items
+            (default: all of them)
+        chunk_size: Rows read, priced and written per transaction
+        dry_run: Report the changes without writing them
+
+    Returns:
+        dict with 'checked', 'repriced' and 'skipped' (weight changed) counts,
+        'groups', one per model and filament with repriced items, each with
+        'model', 'filament', 'items', 'old_total', 'new_total' and 'delta',
+        and 'total_delta' over all of them.
+    """
+    items = (unsold_premade_items() if items is None else items).filter(
+        Order__isnull=True, IsCustom=False
+    )
+    checked = repriced = skipped = 0
+    groups = defaultdict(lambda: [0, Decimal("0.00"), Decimal("0.00")])
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Lock the items without joins, so only OrderItems rows are locked
+            # on every backend (MariaDB has no FOR UPDATE OF)
+            ids = list(
+                items.filter(id__gt=last_id)
+                .select_for_update()
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            rows = list(
+                OrderItems.objects.filter(id__in=ids)
+                .order_by("id")
+                .values_list(
+                    "id",
+                    "Model_id",
+                    "InventoryChange__RawMaterial_id",
+                    "InventoryChange__UnitCost",
+                    "InfillMultiplier",
+                    "Markup",
+                    "ItemQuantity",
+                    "TotalWeight",
+                    "CostOfGoodsSold",
+                    "ItemPrice",
+                )
+            )
+            last_id = ids[-1]
+            checked += len(rows)
+            models = load_models({row[1] for row in rows})
+            spools = load_spools({row[2] for row in rows})
+
+            changed = []
+            for (
+                item_id,
+                model_id,
+                raw_material_id,
+                old_unit_cost,
+                multiplier,
+                markup,
+                quantity,
+                weight,
+                old_cost,
+                old_price,
+            ) in rows:
+                model, spool = models[model_id], spools[raw_material_id]
+                grams, cost_of_goods, price = price_item(
+                    model, spool, multiplier, markup, quantity
+                )
+                if grams != weight:
+                    skipped += 1
+                    continue
+                cost_of_goods = stored_cost(cost_of_goods)
+                unit_cost = spool[1][0]
+                if (price, cost_of_goods, unit_cost) == (
+                    old_price,
+                    old_cost,
+                    old_unit_cost,
+                ):
+                    continue
+                changed.append(
+                    OrderItems(
+                        id=item_id,
+                        CostOfGoodsSold=cost_of_goods,
+                        ItemPrice=price,
+                        InventoryChange_id=spool[3],
+                    )
+                )
+                group = groups[(model[0], spool[0])]
+                group[0] += 1
+                group[1] += old_price
+                group[2] += price
+            repriced += len(changed)
+            if changed and not dry_run:
+                write_prices(changed)
+
+    lines = [
+        {
+            "model": model,
+            "filament": filament,
+            "items": count,
+            "old_total": old_total,
+            "new_total": new_total,
+            "delta": new_total - old_total,
+        }
+        for (model, filament), (count, old_total, new_total) in sorted(groups.items())
+    ]
+    return {
+        "checked": checked,
+        "repriced": repriced,
+        "skipped": skipped,
+        "groups": lines,
+        "total_delta": sum((line["delta"] for line in lines), Decimal("0.00")),
+    }
@@ -0,0 +1,209 @@
+"""
+In-process index of available grams per spool, grouped by filament
+
+Availability checks ask for the first spool of a filament holding at least
+some grams. The index answers that in O(log n) from memory:
+
+- best fit keeps each filament's spools in a SortedKeyList ordered by
+  (grams, purchase date, balance id), so the answer is one bisect;
+- FIFO keeps the spools that hold more than every older spool of the
+  filament. Their grams rise with age, so the oldest spool holding X grams
+  is the first of them with at least X, again one bisect. That list is
+  rebuilt lazily, once per filament after its spools change.
+
+Ledger writes update the index when their transaction commits. Writes made
+by other processes are only picked up when the index reloads from the
+database, which it does every SPOOL_INDEX_RESYNC_SECONDS, logging any spools
+that had drifted. Callers must treat an answer as a hint and confirm it
+against InventoryBalance, as InventoryChangeManager.find_for_weight does.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+from django.db import transaction
+from sortedcontainers import SortedKeyList
+
+logger = logging.getLogger(__name__)
+
+
+def all_spools(filaments):
+    """Every indexed spool keyed by raw material id, for comparing two loads"""
+    return {
+        raw_material_id: spool
+        for spools in filaments.values()
+        for raw_material_id, spool in spools.spools.items()
+    }
+
+
+class FilamentSpools:
+    """Spools of one filament with grams available, ordered for both policies"""
+
+    def __init__(self):
+        self.spools = {}
+        self.by_fit = SortedKeyList(key=lambda spool: (spool[1], spool[0]))
+        self.fifo_grams = None
+        self.fifo_spools = None
+
+    def put(self, raw_material_id, fifo_key, grams, inventory_change_id):
+        """Add or move a spool; fifo_key is its (PurchasedDate, balance id)"""
+        self.remove(raw_material_id)
+        if grams <= 0:
+            return
+        spool = (fifo_key, grams, raw_material_id, inventory_change_id)
+        self.spools[raw_material_id] = spool
+        self.by_fit.add(spool)
+        self.fifo_grams = None
+
+    def remove(self, raw_material_id):
+        spool = self.spools.pop(raw_material_id, None)
+        if spool:
+            self.by_fit.remove(spool)
+            self.fifo_grams = None
+
+    def first_fit(self, grams, policy):
+        """(raw material id, inventory change id) of the first spool with the grams"""
+        if policy == "best_fit":
+            position = self.by_fit.bisect_key_left((grams,))
+            if position == len(self.by_fit):
+                return None
+            spool = self.by_fit[position]
+            return spool[2], spool[3]
+
+        if self.fifo_grams is None:
+            self.fifo_grams, self.fifo_spools = [], []
+            for spool in sorted(self.spools.values()):
+                if not self.fifo_grams or spool[1] > self.fifo_grams[-1]:
+                    self.fifo_grams.append(spool[1])
+                    self.fifo_spools.append(spool)
+        position = bisect_left(self.fifo_grams, grams)
+        if position == len(self.fifo_grams):
+            return None
+        spool = self.fifo_spools[position]
+        return spool[2], spool[3]
+
+
+class SpoolIndex:
+    """Per-filament spool capacity index shared by the threads of a process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filaments = {}
+        self.filament_of = {}
+        self.loaded_at = None
+
+    def load(self):
+        """
+        Rebuild the index from InventoryBalance and return the number of spools
+        whose grams, ledger row or presence differed from the database.
+        """
+        from store.models import InventoryBalance
+
+        rows = InventoryBalance.objects.filter(
+            InventoryChange__isnull=False, QuantityWeightAvailable__gt=0
+        ).values_list(
+            "RawMaterial_id",
+            "RawMaterial__Filament_id",
+            "PurchasedDate",
+            "id",
+            "QuantityWeightAvailable",
+            "InventoryChange_id",
+        )
+        filaments = {}
+        filament_of = {}
+        for (
+            raw_material_id,
+            filament_id,
+            purchased,
+            balance_id,
+            grams,
+            change_id,
+        ) in rows:
+            filament_of[raw_material_id] = filament_id
+            filaments.setdefault(filament_id, FilamentSpools()).put(
+                raw_material_id, (purchased, balance_id), grams, change_id
+            )
+
+        with self.lock:
+            drifted = 0
+            if self.loaded_at is not None:
+                old, new = all_spools(self.filaments), all_spools(filaments)
+                drifted = sum(
+                    1
+                    for raw_material_id in old.keys() | new.keys()
+                    if old.get(raw_material_id) != new.get(raw_material_id)
+                )
+            self.filaments = filaments
+            self.filament_of = filament_of
+            self.loaded_at = time.monotonic()
+        if drifted:
+            logger.warning("Spool index resync corrected %d spools", drifted)
+        return drifted
+
+    def invalidate(self):
+        """Force a reload from the database on the next lookup"""
+        with self.lock:
+            self.loaded_at = None
+            self.filaments = {}
+            self.filament_of = {}
+
+    def update(self, raw_material_id, filament_id, fifo_key, grams, change_id):
+        """Record the committed balance of one spool"""
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            self.discard_locked(raw_material_id)
+            if grams > 0:
+                self.filament_of[raw_material_id] = filament_id
+                self.filaments.setdefault(filament_id, FilamentSpools()).put(
+                    raw_material_id, fifo_key, grams, change_id
+                )
+
+    def discard(self, raw_material_id):
+        """Drop a spool that no longer has a balance"""
+        with self.lock:
+            self.discard_locked(raw_material_id)
+
+    def discard_locked(self, raw_material_id):
+        filament_id = self.filament_of.pop(raw_material_id, None)
+        if filament_id is not None:
+            self.filaments[filament_id].remove(raw_material_id)
+
+    def first_fit(self, filament_id, grams, policy):
+        """
+        (raw material id, inventory change id) of the first spool of a filament
+        holding at least the grams under the policy, or None.
+        Reloads from the database first when the last load is too old.
+        """
+        if (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at > settings.SPOOL_INDEX_RESYNC_SECONDS
+        ):
+            self.load()
+        with self.lock:
+            spools = self.filaments.get(filament_id)
+            return spools.first_fit(grams, policy) if spools else None
+
+
+spool_index = SpoolIndex()
+
+
+def index_balance(balance, raw_material):
+    """Update the index with a spool's balance once its transaction commits"""
+    if settings.SPOOL_INDEX_ENABLED:
+        spool = (
+            raw_material.id,
+            raw_material.Filament_id,
+            (balance.PurchasedDate, balance.id),
+            balance.QuantityWeightAvailable,
+            balance.InventoryChange_id,
+        )
+        transaction.on_commit(lambda: spool_index.update(*spool))
+
+
+def invalidate_index():
+    """Reload the index after a bulk write once its transaction commits"""
+    if settings.SPOOL_INDEX_ENABLED:
+        transaction.on_commit(spool_index.invalidate)
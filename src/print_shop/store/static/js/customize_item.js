@@ -86,12 +86,14 @@ async function calculatePrice() {
     updatePriceDisplay("loading");
 
     try {
-      const data = await calculateItemPrice({
+      const config = {
         modelId,
         filamentId: filamentSelect.value,
         infill: infillValue.toString(),
         quantity: quantityValue.toString(),
-      });
+      };
+      const data =
+        (await matrixItemPrice(config)) || (await calculateItemPrice(config));
 
       if (data.status === "success") {
         updatePriceDisplay(data.price);
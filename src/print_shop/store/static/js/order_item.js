@@ -184,3 +184,58 @@ async function calculateItemPrice(config) {
     throw new Error("Invalid response from server");
   }
 }
+
+/**
+ * Price matrices already fetched, keyed by model ID
+ */
+const priceMatrices = {};
+
+/**
+ * Fetches the price matrix of a model once from the custom API endpoint.
+ * Later calls for the same model reuse the first response.
+ */
+function fetchPriceMatrix(modelId) {
+  if (!priceMatrices[modelId]) {
+    const url = `/store/api/model/${modelId}/price-matrix/`;
+    priceMatrices[modelId] = fetch(url, {
+      headers: {
+        "X-Requested-With": "XMLHttpRequest",
+      },
+      credentials: "same-origin",
+    })
+      .then((response) => (response.ok ? response.json() : null))
+      .catch(() => null);
+  }
+  return priceMatrices[modelId];
+}
+
+/**
+ * Prices a configuration from the model's price matrix.
+ * Returns a response shaped like calculateItemPrice,
+ * or null when the matrix does not cover the configuration.
+ */
+async function matrixItemPrice(config) {
+  const { modelId, filamentId, infill, quantity = 1 } = config;
+  const matrix = await fetchPriceMatrix(modelId);
+  if (!matrix || matrix.status !== "success") return null;
+
+  const infillIndex = matrix.infills.indexOf(Number(infill));
+  const quantityIndex = matrix.quantities.indexOf(Number(quantity));
+  const filament = matrix.filaments.find(
+    (item) => String(item.id) === String(filamentId)
+  );
+  if (infillIndex === -1 || quantityIndex === -1 || !filament) return null;
+
+  const cents = filament.prices[infillIndex][quantityIndex];
+  if (cents === null) {
+    return {
+      status: "error",
+      message: "Not enough inventory available for the selected options",
+    };
+  }
+  return {
+    status: "success",
+    price: new Decimal(cents).dividedBy(100).toFixed(2),
+    inventory_id: filament.inventory[infillIndex][quantityIndex],
+  };
+}
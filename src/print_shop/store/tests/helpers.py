@@ -0,0 +1,61 @@
+"""
+Shared fixtures for the inventory and pricing tests
+"""
+
+from decimal import Decimal
+from django.contrib.auth.models import User
+from store.models import Filament, Materials, Models, RawMaterials, Suppliers
+
+
+class SpoolFixtureMixin:
+    """
+    Creates a PLA material, a red PLA filament and a supplier before each test,
+    with helpers for the spools and models built on them.
+    Mix into TestCase or TransactionTestCase and call super().setUp() first.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.material = Materials.objects.create(Name="PLA")
+        self.filament = self.create_filament("PLA Red", "FF0000")
+        self.supplier = Suppliers.objects.create(
+            Name="TestSupplier",
+            Address="123 Main",
+            Phone="1234567890",
+            Email="test@supplier.com",
+        )
+
+    def create_filament(self, name, color):
+        return Filament.objects.create(
+            Name=name, Material=self.material, ColorHexCode=color
+        )
+
+    def create_spool(self, **fields):
+        """A 1000g spool of the red filament for 20.00, unless fields say otherwise"""
+        values = {
+            "Supplier": self.supplier,
+            "Filament": self.filament,
+            "Cost": Decimal("20.00"),
+            "MaterialWeightPurchased": 1000,
+            "MaterialDensity": Decimal("1.25"),
+            "ReorderLeadTime": 7,
+        }
+        values.update(fields)
+        return RawMaterials.objects.create(**values)
+
+    def create_model(self, volume, **fields):
+        """A model of the given print volume at 20% base infill"""
+        values = {
+            "Name": "Widget",
+            "FixedCost": Decimal("1.00"),
+            "EstimatedPrintVolume": volume,
+            "BaseInfill": Decimal("0.20"),
+        }
+        values.update(fields)
+        return Models.objects.create(**values)
+
+    def login_staff(self):
+        self.user = User.objects.create_user(username="admin", password="admin123")
+        self.user.is_staff = True
+        self.user.save()
+        self.client.login(username="admin", password="admin123")
@@ -475,6 +475,69 @@ class CartPageTests(TestCase):
      
        
 
+    def test_quantity_update_then_removal_restores_reserved_grams(self):
+        """Test Changing a premade item's quantity keeps its reservation in step"""
+        balance = self.raw_material.inventory_balance
+        balance.refresh_from_db()
+        available = balance.QuantityWeightAvailable + self.order_item.TotalWeight
+        OrderItems.objects.create(
+            InventoryChange=self.inventory_change,
+            Model=self.model,
+            InfillMultiplier=Decimal("1.50"),
+            Markup=Decimal("1.50"),
+            ItemQuantity=2,
+            IsCustom=False,
+        )
+        available -= OrderItems.objects.get(Order__isnull=True).TotalWeight
+        update_url = reverse("update-cart-item", args=[self.order_item.id])
+        for quantity in (3, 1):
+            self.client.post(update_url, {"quantity": quantity})
+            self.order_item.refresh_from_db()
+            self.assertEqual(self.order_item.ItemQuantity, quantity)
+            balance.refresh_from_db()
+            self.assertEqual(
+                balance.QuantityWeightAvailable,
+                available - self.order_item.TotalWeight,
+            )
+
+        self.client.post(update_url, {"quantity": 0})
+        self.assertFalse(OrderItems.objects.filter(pk=self.order_item.pk).exists())
+        balance.refresh_from_db()
+        self.assertEqual(balance.QuantityWeightAvailable, available)
+
+    def test_quantity_update_of_split_item(self):
+        """Test Growing an item spread over two spools splits it again"""
+        second = RawMaterials.objects.create(
+            Supplier=self.supplier,
+            Filament=self.filament,
+            BrandName="Brand B",
+            Cost=Decimal("20.00"),
+            MaterialWeightPurchased=1000,
+            MaterialDensity=Decimal("1.25"),
+            ReorderLeadTime=7,
+        )
+        # 25g per unit, 40 units are more than either spool holds
+        item = OrderItems(
+            InventoryChange=self.inventory_change,
+            Order=self.order,
+            Model=self.model,
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=40,
+            IsCustom=True,
+        )
+        allocations = InventoryChange.objects.find_split_for_weight(
+            item.calculate_required_weight(), self.filament
+        )
+        item.split_allocations = allocations
+        item.save()
+
+        self.client.post(reverse("update-cart-item", args=[item.id]), {"quantity": 60})
+        item.refresh_from_db()
+        self.assertEqual(item.ItemQuantity, 60)
+        self.assertEqual(sum(item.allocations.values_list("Weight", flat=True)), 1500)
+        second.inventory_balance.refresh_from_db()
+        self.assertLess(second.inventory_balance.QuantityWeightAvailable, 1000)
+
     def test_checkout_with_max_quantity(self):
         """Test Checkout with maximum quantity"""
         self.order_item.ItemQuantity = 10
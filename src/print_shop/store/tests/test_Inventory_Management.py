@@ -1,7 +1,40 @@
-from django.test import TestCase
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
-from store.models import Materials, Filament, Suppliers, RawMaterials, InventoryChange
+from store.forecasting import forecast_reorders, simulate_backlog
+from store.allocation import replay_allocation
+from store.inventory_history import inventory_at
+from store.ledger_audit import audit_raw_materials
+from store.valuation import inventory_valuation
+from store.spool_index import spool_index
+from store.tests.helpers import SpoolFixtureMixin
+from store.models import (
+    Materials,
+    Filament,
+    Suppliers,
+    RawMaterials,
+    InventoryChange,
+    InventoryBalance,
+    InventoryAdjustment,
+    InventoryCheckpoint,
+    CartHold,
+    FulfillmentStatus,
+    LowStockAlert,
+    OrderItems,
+    Orders,
+)
 
 
 class InventoryManagementTestCase(TestCase):
@@ -42,9 +75,1158 @@ class InventoryManagementTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "ABS Red")
 
+    def test_import_view_loads(self):
+        response = self.client.get(reverse("import-raw-materials"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Import Raw Materials")
+
     ## Actions: Edit / Delete
     def test_inventory_edit_view_exists(self):
         response = self.client.get(
             reverse("edit-raw-material", args=[self.raw_material.id])
         )
         self.assertEqual(response.status_code, 200)
+
+
+class InventoryReservationConcurrencyTestCase(SpoolFixtureMixin, TransactionTestCase):
+    """Parallel order item writers must never oversell a spool"""
+
+    WRITERS = 30
+
+    def setUp(self):
+        super().setUp()
+        self.raw_material = self.create_spool(BrandName="MakerBrand")
+        # 400cm3 * 20% infill * 1.25g/cm3 = 100g per item
+        self.model = self.create_model(400)
+        self.inventory = self.raw_material.current_inventory
+
+    def create_item(self):
+        try:
+            for _ in range(20):
+                try:
+                    OrderItems(
+                        InventoryChange=self.inventory,
+                        Model=self.model,
+                        InfillMultiplier=Decimal("1.00"),
+                        ItemQuantity=1,
+                        IsCustom=True,
+                    ).save()
+                    return True
+                except OperationalError:
+                    # SQLite reports lock contention instead of waiting
+                    time.sleep(0.01)
+            return False
+        except ValidationError:
+            return False
+        finally:
+            connection.close()
+
+    def test_parallel_writers_never_oversell(self):
+        with ThreadPoolExecutor(max_workers=self.WRITERS) as executor:
+            results = list(
+                executor.map(lambda _: self.create_item(), range(self.WRITERS))
+            )
+
+        successes = sum(results)
+        balance = InventoryBalance.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(successes, 10)
+        self.assertEqual(OrderItems.objects.count(), successes)
+        self.assertEqual(balance.QuantityWeightAvailable, 1000 - 100 * successes)
+        self.assertFalse(
+            InventoryChange.objects.filter(QuantityWeightAvailable__lt=0).exists()
+        )
+
+
+class CompactInventoryLedgerTestCase(SpoolFixtureMixin, TestCase):
+    """The compaction command keeps one row per period and every referenced row"""
+
+    def setUp(self):
+        super().setUp()
+        self.raw_material = self.create_spool(BrandName="MakerBrand")
+        self.model = self.create_model(400)
+        old_date = timezone.now() - timedelta(days=400)
+        self.initial = self.raw_material.current_inventory
+        self.rows = [self.initial]
+        for quantity in (900, 800, 700):
+            self.rows.append(
+                InventoryChange.objects.create(
+                    RawMaterial=self.raw_material,
+                    QuantityWeightAvailable=quantity,
+                    UnitCost=Decimal("0.02"),
+                )
+            )
+        self.order_item = OrderItems.objects.create(
+            InventoryChange=self.rows[1],
+            Model=self.model,
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=1,
+            IsCustom=False,
+        )
+        for offset, row in enumerate(self.rows):
+            InventoryChange.objects.filter(pk=row.pk).update(
+                InventoryChangeDate=old_date + timedelta(minutes=offset)
+            )
+
+    def test_compaction_keeps_referenced_and_period_end_rows(self):
+        out = StringIO()
+        call_command("compact_inventory_ledger", "--older-than", "30", stdout=out)
+
+        remaining = set(
+            InventoryChange.objects.filter(RawMaterial=self.raw_material).values_list(
+                "id", flat=True
+            )
+        )
+        self.assertNotIn(self.initial.id, remaining)
+        self.assertNotIn(self.rows[2].id, remaining)
+        self.assertIn(self.rows[1].id, remaining)
+        self.assertIn(self.rows[3].id, remaining)
+        self.assertIn("Removed 2 ledger rows", out.getvalue())
+
+        balance = InventoryBalance.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(balance.QuantityWeightAvailable, 600)
+
+    def test_dry_run_deletes_nothing(self):
+        count = InventoryChange.objects.count()
+        out = StringIO()
+        call_command("compact_inventory_ledger", "--dry-run", stdout=out)
+        self.assertEqual(InventoryChange.objects.count(), count)
+        self.assertIn("Would remove 2 ledger rows", out.getvalue())
+
+
+class ForecastReordersTestCase(SpoolFixtureMixin, TestCase):
+    """Usage forecasts come from the ledger history of every spool of a filament"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_filament = self.create_filament("PLA Blue", "0000FF")
+        self.used, self.sibling, self.unused = (
+            self.create_spool(Filament=filament)
+            for filament in (self.filament, self.filament, self.other_filament)
+        )
+        self.now = timezone.now()
+        InventoryChange.objects.filter(RawMaterial=self.used).update(
+            InventoryChangeDate=self.now - timedelta(days=10)
+        )
+        InventoryChange.objects.create(
+            RawMaterial=self.used, QuantityWeightAvailable=500, UnitCost=Decimal("0.02")
+        )
+
+    def test_forecast_uses_filament_consumption_stock_and_lead_time(self):
+        forecasts = forecast_reorders(now=self.now)
+        self.assertEqual(set(forecasts), {self.filament.id, self.other_filament.id})
+
+        used = forecasts[self.filament.id]
+        self.assertAlmostEqual(used["daily_usage"], 50.0)
+        # 500g left on the used spool and 1000g on its sibling
+        self.assertAlmostEqual(used["days_until_stockout"], 30.0)
+        self.assertEqual(used["reorder_by"], (self.now + timedelta(days=23)).date())
+        self.assertFalse(used["reorder_now"])
+
+        unused = forecasts[self.other_filament.id]
+        self.assertEqual(unused["daily_usage"], 0.0)
+        self.assertIsNone(unused["stockout_date"])
+
+    def test_usage_is_summed_over_spools(self):
+        InventoryChange.objects.create(
+            RawMaterial=self.sibling,
+            QuantityWeightAvailable=750,
+            UnitCost=Decimal("0.02"),
+        )
+        used = forecast_reorders(now=self.now)[self.filament.id]
+        self.assertAlmostEqual(used["daily_usage"], 75.0)
+        self.assertAlmostEqual(used["days_until_stockout"], 16.7)
+
+    def test_longest_lead_time_longer_than_stock_means_reorder_now(self):
+        RawMaterials.objects.filter(pk=self.sibling.pk).update(ReorderLeadTime=40)
+        self.assertTrue(
+            forecast_reorders(now=self.now)[self.filament.id]["reorder_now"]
+        )
+
+
+class LowStockAlertTestCase(SpoolFixtureMixin, TestCase):
+    """Alerts are raised and cleared as ledger rows cross the reorder threshold"""
+
+    def setUp(self):
+        super().setUp()
+        self.login_staff()
+        self.raw_material = self.create_spool()
+
+    def add_row(self, quantity):
+        return InventoryChange.objects.create(
+            RawMaterial=self.raw_material,
+            QuantityWeightAvailable=quantity,
+            UnitCost=Decimal("0.02"),
+        )
+
+    def test_alert_raised_below_threshold_and_cleared_on_restock(self):
+        self.assertFalse(LowStockAlert.objects.exists())
+
+        self.add_row(150)
+        alert = LowStockAlert.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(alert.QuantityWeightAvailable, 150)
+        self.assertEqual(alert.Threshold, 200)
+
+        self.add_row(120)
+        alert.refresh_from_db()
+        self.assertEqual(alert.QuantityWeightAvailable, 120)
+
+        self.add_row(800)
+        self.assertFalse(LowStockAlert.objects.exists())
+
+    def test_empty_spool_and_deleted_rows_clear_alert(self):
+        low = self.add_row(100)
+        empty = self.add_row(0)
+        self.assertFalse(LowStockAlert.objects.exists())
+
+        empty.delete()
+        self.assertTrue(LowStockAlert.objects.filter(RawMaterial=self.raw_material))
+        low.delete()
+        self.assertFalse(LowStockAlert.objects.exists())
+
+    def test_dashboard_counts_and_lists_alerts(self):
+        self.add_row(150)
+        response = self.client.get(reverse("admin_dashboard"))
+        self.assertEqual(response.context["inventory_warnings"], 1)
+
+        response = self.client.get(reverse("low_stock_alerts"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "PLA Red")
+        self.assertContains(response, "150g")
+
+
+class InventoryHistoryTestCase(SpoolFixtureMixin, TestCase):
+    """The history endpoint sums spools per filament and downsamples the ledger"""
+
+    def setUp(self):
+        super().setUp()
+        self.login_staff()
+        self.spools = [self.create_spool() for _ in range(2)]
+        start = timezone.now() - timedelta(days=20)
+        InventoryChange.objects.update(InventoryChangeDate=start)
+        for step in range(1, 301):
+            row = InventoryChange.objects.create(
+                RawMaterial=self.spools[step % 2],
+                QuantityWeightAvailable=1000 - step,
+                UnitCost=Decimal("0.02"),
+            )
+            InventoryChange.objects.filter(pk=row.pk).update(
+                InventoryChangeDate=start + timedelta(hours=step)
+            )
+
+    def test_history_is_downsampled_to_requested_points(self):
+        response = self.client.get(
+            reverse("inventory-history"),
+            {"filament": self.filament.id, "days": 30, "points": 20},
+        )
+        self.assertEqual(response.status_code, 200)
+        series = response.json()["series"]
+        self.assertEqual(len(series), 1)
+        points = series[0]["points"]
+        self.assertLessEqual(len(points), 20)
+        self.assertEqual(points[0][1], 0)
+        # Last rows: spool 0 at 700g and spool 1 at 701g
+        self.assertEqual(points[-1][1], 1401)
+        self.assertEqual(max(value for _, value in points), 2000)
+        self.assertEqual([p[0] for p in points], sorted(p[0] for p in points))
+
+    def test_invalid_points_rejected(self):
+        response = self.client.get(reverse("inventory-history"), {"points": "many"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["status"], "error")
+
+
+class VerifyInventoryLedgerTestCase(SpoolFixtureMixin, TestCase):
+    """The ledger verifier replays order item weights against stored balances"""
+
+    def setUp(self):
+        super().setUp()
+        self.raw_material = self.create_spool()
+        model = self.create_model(40)
+        self.order_item = OrderItems.objects.create(
+            InventoryChange=self.raw_material.current_inventory,
+            Model=model,
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=1,
+            IsCustom=False,
+        )
+
+    def verify(self, *args):
+        out = StringIO()
+        call_command("verify_inventory_ledger", "--workers", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_consistent_ledger_reports_no_mismatches(self):
+        self.assertIn("found 0 mismatches", self.verify())
+
+    def test_drift_is_reported_and_fixed(self):
+        expected = 1000 - self.order_item.TotalWeight
+        InventoryChange.objects.create(
+            RawMaterial=self.raw_material,
+            QuantityWeightAvailable=expected - 50,
+            UnitCost=Decimal("0.02"),
+        )
+
+        output = self.verify()
+        self.assertIn("found 1 mismatches", output)
+        self.assertIn(f"expected {expected}g", output)
+        self.assertEqual(
+            InventoryBalance.objects.get(
+                RawMaterial=self.raw_material
+            ).QuantityWeightAvailable,
+            expected - 50,
+        )
+
+        self.assertIn("Fixed 1 raw materials", self.verify("--fix"))
+        self.assertEqual(
+            InventoryBalance.objects.get(
+                RawMaterial=self.raw_material
+            ).QuantityWeightAvailable,
+            expected,
+        )
+        self.assertIn("found 0 mismatches", self.verify())
+
+
+class ParallelVerifyInventoryLedgerTestCase(SpoolFixtureMixin, TransactionTestCase):
+    """Pool workers audit committed rows, however their processes are started"""
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("Worker processes cannot open an in-memory database")
+        super().setUp()
+        self.spools = [self.create_spool() for _ in range(3)]
+        InventoryBalance.objects.filter(RawMaterial=self.spools[1]).update(
+            QuantityWeightAvailable=900
+        )
+
+    def test_spawned_workers(self):
+        for start_method in ("fork", "spawn"):
+            out = StringIO()
+            call_command(
+                "verify_inventory_ledger",
+                "--workers",
+                "2",
+                "--chunk-size",
+                "1",
+                "--start-method",
+                start_method,
+                stdout=out,
+            )
+            self.assertIn(
+                f"Raw material {self.spools[1].id}: expected 1000g, balance 900g",
+                out.getvalue(),
+            )
+            self.assertIn("Checked 3 raw materials, found 1 mismatches", out.getvalue())
+
+
+class CartHoldTestCase(SpoolFixtureMixin, TestCase):
+    """Custom cart items hold their grams only while the cart is active"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="customer", password="pw")
+        self.raw_material = self.create_spool()
+        model = self.create_model(400)
+        self.order = Orders.objects.create(User=self.user, TotalPrice=0)
+        self.item = OrderItems.objects.create(
+            InventoryChange=self.raw_material.current_inventory,
+            Model=model,
+            Order=self.order,
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=1,
+            IsCustom=True,
+        )
+
+    def balance(self):
+        return InventoryBalance.objects.get(
+            RawMaterial=self.raw_material
+        ).QuantityWeightAvailable
+
+    def expire_holds(self):
+        CartHold.objects.update(ExpiresAt=timezone.now() - timedelta(minutes=1))
+
+    def test_hold_starts_with_the_reservation(self):
+        hold = CartHold.objects.get(OrderItem=self.item)
+        self.assertGreater(hold.ExpiresAt, timezone.now())
+        self.assertFalse(hold.Released)
+
+    def test_expired_hold_releases_grams(self):
+        self.assertEqual(self.balance(), 900)
+        self.assertEqual(
+            CartHold.objects.held_by_raw_material(), {self.raw_material.id: 100}
+        )
+
+        self.expire_holds()
+        self.assertEqual(CartHold.objects.held_by_raw_material(), {})
+        out = StringIO()
+        call_command("release_expired_cart_holds", stdout=out)
+
+        self.assertIn("Released 1 expired cart holds", out.getvalue())
+        self.assertTrue(OrderItems.objects.filter(pk=self.item.pk).exists())
+        self.assertTrue(CartHold.objects.get(OrderItem=self.item).Released)
+        self.assertEqual(self.balance(), 1000)
+        self.assertEqual(audit_raw_materials([self.raw_material.id]), [])
+
+        call_command("release_expired_cart_holds", stdout=out)
+        self.assertIn("Released 0 expired cart holds", out.getvalue())
+        self.assertEqual(self.balance(), 1000)
+
+    def test_release_keeps_cart_items_and_totals(self):
+        OrderItems.objects.create(
+            InventoryChange=self.raw_material.current_inventory,
+            Model=self.item.Model,
+            Order=self.order,
+            InfillMultiplier=Decimal("0.50"),
+            ItemQuantity=1,
+            IsCustom=True,
+        )
+        self.order.save()
+        total = self.order.TotalPrice
+        self.expire_holds()
+
+        self.assertEqual(CartHold.objects.release_expired(), 2)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.orderitems_set.count(), 2)
+        self.assertEqual(self.order.TotalPrice, total)
+        self.assertEqual(self.balance(), 1000)
+
+    def test_released_item_is_reserved_on_next_visit(self):
+        self.expire_holds()
+        CartHold.objects.release_expired()
+        self.client.login(username="customer", password="pw")
+
+        response = self.client.get(reverse("cart"))
+        self.assertEqual(response.status_code, 200)
+        hold = CartHold.objects.get(OrderItem=self.item)
+        self.assertFalse(hold.Released)
+        self.assertGreater(hold.ExpiresAt, timezone.now())
+        self.assertEqual(self.balance(), 900)
+        self.assertEqual(audit_raw_materials([self.raw_material.id]), [])
+
+    def test_released_item_without_stock_blocks_checkout(self):
+        self.expire_holds()
+        CartHold.objects.release_expired()
+        InventoryBalance.objects.reserve(self.raw_material.id, 950)
+        self.client.login(username="customer", password="pw")
+
+        response = self.client.get(reverse("cart"))
+        self.assertContains(response, "no longer in stock")
+        self.assertTrue(CartHold.objects.get(OrderItem=self.item).Released)
+        self.assertRedirects(self.client.get(reverse("checkout")), reverse("cart"))
+
+        # Removing it gives back nothing, since it held nothing
+        self.client.post(reverse("remove-from-cart", args=[self.item.pk]))
+        self.assertFalse(OrderItems.objects.filter(pk=self.item.pk).exists())
+        self.assertEqual(self.balance(), 50)
+
+    def test_quote_starts_a_hold(self):
+        customer = User.objects.create_user(username="quoted", password="pw")
+        self.login_staff()
+        response = self.client.post(
+            reverse("product-admin-generate-quote"),
+            {"customer_id": customer.id, "model_id": self.item.Model_id},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        quote = OrderItems.objects.get(Order__User=customer)
+        self.assertFalse(CartHold.objects.get(OrderItem=quote).Released)
+
+    def test_failed_add_to_cart_leaves_no_draft_order(self):
+        customer = User.objects.create_user(username="new", password="pw")
+        self.client.login(username="new", password="pw")
+        with patch.object(
+            type(InventoryBalance.objects),
+            "reserve",
+            side_effect=ValidationError("Not enough inventory."),
+        ):
+            response = self.client.post(
+                reverse("model-detail", args=[self.item.Model_id]),
+                {"inventory_id": self.raw_material.current_inventory.id},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Orders.objects.filter(User=customer).exists())
+
+    def test_active_hold_is_kept_and_refreshed(self):
+        hold = CartHold.objects.get(OrderItem=self.item)
+        CartHold.objects.update(ExpiresAt=timezone.now() + timedelta(minutes=1))
+        CartHold.objects.touch(self.order)
+        self.assertGreater(CartHold.objects.get(pk=hold.pk).ExpiresAt, hold.ExpiresAt)
+
+        call_command("release_expired_cart_holds", stdout=StringIO())
+        self.assertTrue(OrderItems.objects.filter(pk=self.item.pk).exists())
+        self.assertEqual(self.balance(), 900)
+
+    def test_checked_out_order_keeps_its_grams(self):
+        self.expire_holds()
+        CartHold.objects.release_expired()
+        self.order.update_status(FulfillmentStatus.Status.PENDING_PAYMENT)
+        self.assertEqual(self.balance(), 900)
+        self.assertFalse(CartHold.objects.exists())
+
+        CartHold.objects.touch(self.order)
+        self.assertFalse(CartHold.objects.exists())
+
+
+class SimulateBacklogTestCase(SpoolFixtureMixin, TestCase):
+    """The backlog simulator prints paid orders in FIFO order per filament"""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username="customer", password="pw")
+        self.spool = self.add_spool()
+        model = self.create_model(1200)
+        self.items = []
+        for status in (
+            FulfillmentStatus.Status.PAID,
+            FulfillmentStatus.Status.PRINTING,
+            FulfillmentStatus.Status.PAID,
+            FulfillmentStatus.Status.DRAFT,
+        ):
+            order = Orders.objects.create(User=user, TotalPrice=0)
+            if status != FulfillmentStatus.Status.DRAFT:
+                order.update_status(status)
+            self.items.append(
+                OrderItems.objects.create(
+                    InventoryChange=self.spool.current_inventory,
+                    Model=model,
+                    Order=order,
+                    InfillMultiplier=Decimal("1.00"),
+                    ItemQuantity=1,
+                    IsCustom=True,
+                )
+            )
+
+    def add_spool(self):
+        return self.create_spool(MaterialWeightPurchased=1200)
+
+    def test_last_paid_line_runs_short_with_print_waste(self):
+        # 1200g spool, three 300g backlog lines at 345g each with waste
+        shortages = simulate_backlog()
+        self.assertEqual(len(shortages), 1)
+        shortage = shortages[0]
+        self.assertEqual(shortage["order_item_id"], self.items[2].id)
+        self.assertEqual(shortage["raw_material_id"], self.spool.id)
+        self.assertEqual(shortage["required"], 345.0)
+        self.assertEqual(shortage["shortfall"], 135.0)
+
+    def test_no_shortage_without_waste_or_with_more_spools(self):
+        self.assertEqual(simulate_backlog(print_margin=Decimal("1.00")), [])
+        self.add_spool()
+        self.assertEqual(simulate_backlog(), [])
+
+
+class InventoryCheckpointTestCase(SpoolFixtureMixin, TestCase):
+    """Point-in-time balances replay the ledger from the nearest checkpoint"""
+
+    def setUp(self):
+        super().setUp()
+        self.login_staff()
+        self.raw_material = self.create_spool()
+        self.now = timezone.now()
+        self.set_date(self.raw_material.current_inventory, 10)
+        self.set_date(self.add_row(900), 8)
+        checkpoint = InventoryCheckpoint.objects.take()
+        InventoryCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            CheckpointDate=self.now - timedelta(days=7)
+        )
+        self.set_date(self.add_row(800), 5)
+        self.set_date(self.add_row(700), 1)
+
+    def add_row(self, quantity):
+        return InventoryChange.objects.create(
+            RawMaterial=self.raw_material,
+            QuantityWeightAvailable=quantity,
+            UnitCost=Decimal("0.02"),
+        )
+
+    def set_date(self, row, days_ago):
+        InventoryChange.objects.filter(pk=row.pk).update(
+            InventoryChangeDate=self.now - timedelta(days=days_ago)
+        )
+
+    def test_balances_at_past_moments(self):
+        for days_ago, quantity in ((9, 1000), (6, 900), (3, 800), (0, 700)):
+            balances = inventory_at(self.now - timedelta(days=days_ago))
+            self.assertEqual(balances, {self.raw_material.id: quantity})
+
+    def test_checkpoint_lookup_uses_constant_queries(self):
+        with self.assertNumQueries(3):
+            inventory_at(self.now - timedelta(days=3))
+
+    def test_as_of_endpoint(self):
+        day = (self.now - timedelta(days=6)).date().isoformat()
+        response = self.client.get(reverse("inventory-as-of"), {"date": day})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["balances"][0]["quantity"], 900)
+
+        response = self.client.get(reverse("inventory-as-of"), {"date": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+
+class SplitAllocationTestCase(SpoolFixtureMixin, TestCase):
+    """Items larger than any one spool are spread over spools in FIFO order"""
+
+    def setUp(self):
+        super().setUp()
+        self.spools = [
+            self.create_spool(Cost=Decimal("10.00"), MaterialWeightPurchased=500)
+            for _ in range(3)
+        ]
+        self.model = self.create_model(4000, Name="Big Widget")
+
+    def balances(self):
+        return [
+            InventoryBalance.objects.get(RawMaterial=spool).QuantityWeightAvailable
+            for spool in self.spools
+        ]
+
+    def test_split_takes_oldest_spools_first(self):
+        self.assertIsNone(InventoryChange.objects.find_for_weight(1000))
+        allocations = InventoryChange.objects.find_split_for_weight(1000, self.filament)
+        self.assertEqual(
+            [(row.RawMaterial_id, grams) for row, grams in allocations],
+            [(self.spools[0].id, 500), (self.spools[1].id, 500)],
+        )
+        self.assertIsNone(
+            InventoryChange.objects.find_split_for_weight(1400, self.filament)
+        )
+
+    def split_item(self, multiplier="1.00", quantity=1, **fields):
+        item = OrderItems(
+            InventoryChange=self.spools[0].current_inventory,
+            Model=self.model,
+            InfillMultiplier=Decimal(multiplier),
+            ItemQuantity=quantity,
+            IsCustom=True,
+            **fields,
+        )
+        allocations = InventoryChange.objects.find_split_for_weight(
+            item.calculate_required_weight(), self.filament
+        )
+        item.InventoryChange = allocations[0][0]
+        item.split_allocations = allocations
+        item.save()
+        return item
+
+    def resize(self, item, quantity):
+        previous_weight = item.TotalWeight
+        item.ItemQuantity = quantity
+        with transaction.atomic():
+            item.save()
+            item.move_reservation(item.InventoryChange.RawMaterial_id, previous_weight)
+
+    def test_split_item_reserves_and_releases_every_spool(self):
+        item = self.split_item()
+
+        self.assertEqual(item.TotalWeight, 1000)
+        self.assertEqual(self.balances(), [0, 0, 500])
+        self.assertEqual(item.allocations.count(), 2)
+        out = StringIO()
+        call_command("verify_inventory_ledger", "--workers", "1", stdout=out)
+        self.assertIn("found 0 mismatches", out.getvalue())
+
+        item.delete()
+        self.assertEqual(self.balances(), [500, 500, 500])
+
+    def test_editing_a_split_spool_keeps_its_balance(self):
+        self.split_item()
+        self.spools[1].BrandName = "Relabelled"
+        self.spools[1].save()
+        self.assertEqual(self.balances(), [0, 0, 500])
+
+    def test_resized_split_item_is_split_again(self):
+        # 400g per unit, two units take 500g + 300g
+        item = self.split_item("0.40", quantity=2)
+        self.assertEqual(self.balances(), [0, 200, 500])
+
+        self.resize(item, 3)
+        self.assertEqual(self.balances(), [0, 0, 300])
+        self.assertEqual(
+            sorted(item.allocations.values_list("Weight", flat=True)), [200, 500, 500]
+        )
+
+        self.resize(item, 1)
+        self.assertEqual(self.balances(), [100, 500, 500])
+        self.assertFalse(item.allocations.exists())
+
+        with self.assertRaises(ValidationError):
+            self.resize(item, 4)
+        self.assertEqual(self.balances(), [100, 500, 500])
+
+    def test_cart_holds_count_each_allocation(self):
+        order = Orders.objects.create(
+            User=User.objects.create_user(username="customer", password="pw"),
+            TotalPrice=0,
+        )
+        self.split_item(Order=order)
+        CartHold.objects.touch(order)
+        self.assertEqual(
+            CartHold.objects.held_by_raw_material(),
+            {self.spools[0].id: 500, self.spools[1].id: 500},
+        )
+
+    def test_expired_split_hold_gives_back_its_allocations(self):
+        order = Orders.objects.create(
+            User=User.objects.create_user(username="customer", password="pw"),
+            TotalPrice=0,
+        )
+        item = self.split_item(Order=order)
+        CartHold.objects.update(ExpiresAt=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(CartHold.objects.release_expired(), 1)
+        self.assertEqual(self.balances(), [500, 500, 500])
+        self.assertFalse(item.allocations.exists())
+
+        self.assertEqual(CartHold.objects.touch(order), [])
+        self.assertEqual(self.balances(), [0, 0, 500])
+        self.assertEqual(item.allocations.count(), 2)
+
+
+class AllocationPolicyTestCase(SpoolFixtureMixin, TestCase):
+    """Best fit fills nearly empty spools that FIFO would leave as scraps"""
+
+    def setUp(self):
+        super().setUp()
+        self.old_spool, self.new_spool = (
+            self.create_spool(MaterialWeightPurchased=weight) for weight in (1000, 600)
+        )
+
+    def test_policy_picks_among_fitting_spools(self):
+        fifo = InventoryChange.objects.find_for_weight(400, filament=self.filament)
+        best_fit = InventoryChange.objects.find_for_weight(
+            400, filament=self.filament, policy="best_fit"
+        )
+        self.assertEqual(fifo.RawMaterial, self.old_spool)
+        self.assertEqual(best_fit.RawMaterial, self.new_spool)
+        with override_settings(SPOOL_ALLOCATION_POLICY="best_fit"):
+            self.assertEqual(
+                InventoryChange.objects.find_for_weight(
+                    400, filament=self.filament
+                ).RawMaterial,
+                self.new_spool,
+            )
+        with self.assertRaises(ValueError):
+            InventoryChange.objects.find_for_weight(400, policy="worst_fit")
+
+    def test_replay_best_fit_places_what_fifo_cannot(self):
+        spools = list(
+            RawMaterials.objects.order_by("PurchasedDate", "id").values(
+                "id", "Filament_id", "MaterialWeightPurchased", "PurchasedDate"
+            )
+        )
+        later = timezone.now() + timedelta(days=1)
+        lines = [
+            {"Filament_id": self.filament.id, "TotalWeight": weight, "date": later}
+            for weight in (400, 800)
+        ]
+
+        fifo = replay_allocation(spools, lines, "fifo")
+        best_fit = replay_allocation(spools, lines, "best_fit")
+        self.assertEqual((fifo["placed"], fifo["unplaced_grams"]), (1, 800))
+        self.assertEqual((best_fit["placed"], best_fit["unplaced_grams"]), (2, 0))
+        self.assertEqual(best_fit["scrap_grams"], 400)
+
+    def test_compare_command_reports_each_policy(self):
+        OrderItems.objects.create(
+            InventoryChange=self.old_spool.current_inventory,
+            Model=self.create_model(400),
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=1,
+            IsCustom=False,
+        )
+        out = StringIO()
+        call_command("compare_allocation_policies", stdout=out)
+        self.assertIn("fifo: placed 1/1 lines", out.getvalue())
+        self.assertIn("best_fit: placed 1/1 lines", out.getvalue())
+
+
+class CoalescedLedgerWritesTestCase(SpoolFixtureMixin, TestCase):
+    """Several reservations on a spool in one block write a single ledger row"""
+
+    def setUp(self):
+        super().setUp()
+        self.spool = self.create_spool(Cost=Decimal("10.00"))
+        self.model = self.create_model(400)
+
+    def create_item(self):
+        return OrderItems.objects.create(
+            InventoryChange=self.spool.current_inventory,
+            Model=self.model,
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=1,
+            IsCustom=False,
+        )
+
+    def ledger_rows(self):
+        return InventoryChange.objects.filter(RawMaterial=self.spool).count()
+
+    def test_one_ledger_row_per_spool(self):
+        with InventoryBalance.objects.coalesce_ledger_writes():
+            items = [self.create_item() for _ in range(4)]
+            with InventoryBalance.objects.coalesce_ledger_writes():
+                items.append(self.create_item())
+            self.assertEqual(self.ledger_rows(), 1)
+
+        expected = 1000 - sum(item.TotalWeight for item in items)
+        balance = InventoryBalance.objects.get(RawMaterial=self.spool)
+        self.assertEqual(self.ledger_rows(), 2)
+        self.assertEqual(balance.QuantityWeightAvailable, expected)
+        self.assertEqual(balance.InventoryChange.QuantityWeightAvailable, expected)
+
+    def test_failed_reservation_rolls_back_the_block(self):
+        with self.assertRaises(ValidationError):
+            with InventoryBalance.objects.coalesce_ledger_writes():
+                self.create_item()
+                InventoryBalance.objects.reserve(self.spool.id, 5000)
+
+        balance = InventoryBalance.objects.get(RawMaterial=self.spool)
+        self.assertEqual(balance.QuantityWeightAvailable, 1000)
+        self.assertEqual(self.ledger_rows(), 1)
+        self.assertFalse(OrderItems.objects.exists())
+        # Writes after a failed block are no longer deferred
+        self.assertIsNotNone(InventoryBalance.objects.reserve(self.spool.id, 10))
+
+
+class ReconcileInventoryTestCase(SpoolFixtureMixin, TestCase):
+    """Bulk scale readings adjust drifted spools and report the variance"""
+
+    def setUp(self):
+        super().setUp()
+        self.login_staff()
+        self.spools = [self.create_spool() for _ in range(3)]
+        order = Orders.objects.create(User=self.user, TotalPrice=0)
+        order.update_status(FulfillmentStatus.Status.PAID)
+        self.item = OrderItems.objects.create(
+            InventoryChange=self.spools[0].current_inventory,
+            Model=self.create_model(400),
+            Order=order,
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=1,
+            IsCustom=True,
+        )
+
+    def reconcile(self, readings, **extra):
+        return self.client.post(
+            reverse("inventory-reconcile"),
+            data={
+                "readings": [
+                    {"raw_material": spool.id, "grams": grams}
+                    for spool, grams in readings
+                ],
+                **extra,
+            },
+            content_type="application/json",
+        )
+
+    def balance(self, spool):
+        return InventoryBalance.objects.get(RawMaterial=spool)
+
+    def test_drifted_spools_are_adjusted(self):
+        response = self.reconcile(
+            [(self.spools[0], 1003), (self.spools[1], 700), (self.spools[2], 100)]
+        )
+        report = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(report["adjusted"], 2)
+        self.assertEqual(report["total_variance"], -1197)
+
+        # The unprinted item is still on the spool, so a full reading is expected
+        unprinted, drifted, low = report["lines"]
+        self.assertEqual(unprinted["reserved"], self.item.TotalWeight)
+        self.assertEqual((unprinted["expected"], unprinted["adjusted"]), (1000, False))
+        self.assertEqual(
+            self.balance(self.spools[0]).QuantityWeightAvailable,
+            1000 - self.item.TotalWeight,
+        )
+        self.assertEqual((drifted["variance"], drifted["value"]), (-300, "-6.00"))
+
+        balance = self.balance(self.spools[1])
+        self.assertEqual(balance.QuantityWeightAvailable, 700)
+        self.assertEqual(balance.InventoryChange.QuantityWeightAvailable, 700)
+        self.assertEqual(self.spools[2].low_stock_alert.QuantityWeightAvailable, 100)
+
+    def test_query_count_does_not_grow_with_readings(self):
+        with CaptureQueriesContext(connection) as few:
+            self.reconcile([(self.spools[1], 600)])
+        more_spools = [self.create_spool() for _ in range(5)]
+        with CaptureQueriesContext(connection) as many:
+            self.reconcile([(spool, 600) for spool in [self.spools[2], *more_spools]])
+        self.assertEqual(len(few), len(many))
+
+    def test_reconciled_spools_pass_the_ledger_audit(self):
+        self.reconcile([(self.spools[0], 980), (self.spools[1], 700)])
+        self.assertEqual(
+            list(InventoryAdjustment.objects.values_list("RawMaterial", "Weight")),
+            [(self.spools[0].id, -20), (self.spools[1].id, -300)],
+        )
+
+        out = StringIO()
+        call_command("verify_inventory_ledger", "--workers", "1", "--fix", stdout=out)
+        self.assertIn("found 0 mismatches", out.getvalue())
+        self.assertEqual(
+            self.balance(self.spools[0]).QuantityWeightAvailable,
+            980 - self.item.TotalWeight,
+        )
+        self.assertEqual(self.balance(self.spools[1]).QuantityWeightAvailable, 700)
+
+    def test_hand_corrections_pass_the_ledger_audit(self):
+        current = self.balance(self.spools[1]).InventoryChange
+        self.client.post(
+            reverse("edit-inventory-change", args=[current.id]),
+            {
+                "RawMaterial": self.spools[2].id,
+                "QuantityWeightAvailable": 940,
+                "UnitCost": "0.02",
+            },
+        )
+        self.assertEqual(
+            list(InventoryAdjustment.objects.values_list("RawMaterial", "Weight")),
+            [(self.spools[1].id, -60)],
+        )
+        self.assertEqual(self.balance(self.spools[1]).QuantityWeightAvailable, 940)
+        self.assertEqual(self.balance(self.spools[2]).QuantityWeightAvailable, 1000)
+
+        out = StringIO()
+        call_command("verify_inventory_ledger", "--workers", "1", "--fix", stdout=out)
+        self.assertIn("found 0 mismatches", out.getvalue())
+        self.assertEqual(self.balance(self.spools[1]).QuantityWeightAvailable, 940)
+
+    def test_adjustments_without_bulk_insert_returning(self):
+        with patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert", False
+        ):
+            self.reconcile([(self.spools[1], 700), (self.spools[2], 600)])
+        for spool, grams in ((self.spools[1], 700), (self.spools[2], 600)):
+            balance = self.balance(spool)
+            self.assertEqual(balance.QuantityWeightAvailable, grams)
+            self.assertEqual(balance.InventoryChange.QuantityWeightAvailable, grams)
+            self.assertEqual(balance.InventoryChange.RawMaterial, spool)
+
+    def test_bad_readings_write_nothing(self):
+        rows = InventoryChange.objects.count()
+        response = self.reconcile([(self.spools[1], 500), (RawMaterials(id=999), 500)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("999", response.json()["message"])
+        response = self.reconcile([(self.spools[1], 500), (self.spools[1], 400)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(InventoryChange.objects.count(), rows)
+        self.assertEqual(self.balance(self.spools[1]).QuantityWeightAvailable, 1000)
+
+
+class InventoryValuationTestCase(SpoolFixtureMixin, TestCase):
+    """Stock value comes from the latest ledger row of each spool in one query"""
+
+    def setUp(self):
+        super().setUp()
+        self.login_staff()
+        self.spools = []
+        for name, count in (("Alpha", 2), ("Beta", 1)):
+            supplier = Suppliers.objects.create(
+                Name=name,
+                Address="123 Main",
+                Phone="1234567890",
+                Email="test@supplier.com",
+            )
+            self.spools += [self.create_spool(Supplier=supplier) for _ in range(count)]
+        InventoryChange.objects.update(
+            InventoryChangeDate=timezone.now() - timedelta(days=10)
+        )
+        # 1000g at 0.02/g per spool, then one Alpha spool drops to 400g
+        InventoryBalance.objects.reserve(self.spools[0].id, 600)
+
+    def test_latest_row_per_spool_grouped_by_supplier(self):
+        with self.assertNumQueries(1):
+            valuation = inventory_valuation()
+        self.assertEqual(
+            [
+                (row["supplier"], row["spools"], row["grams"])
+                for row in valuation["rows"]
+            ],
+            [("Alpha", 2, 1400), ("Beta", 1, 1000)],
+        )
+        self.assertEqual(valuation["rows"][0]["value"], Decimal("28.00"))
+        self.assertEqual(valuation["total_value"], Decimal("48.00"))
+
+        earlier = inventory_valuation(as_of=timezone.now() - timedelta(days=5))
+        self.assertEqual(earlier["total_grams"], 3000)
+
+    def test_page_and_csv_download(self):
+        response = self.client.get(reverse("inventory_valuation"), {"format": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0], "Material,Supplier,Spools,Grams,Value")
+        self.assertEqual(lines[1], "PLA,Alpha,2,1400,28.00")
+        self.assertEqual(lines[-1], "Total,,,2400,48.00")
+
+        response = self.client.get(reverse("inventory_valuation"))
+        self.assertContains(response, "$48.00")
+
+
+class InventoryFeedTestCase(SpoolFixtureMixin, TestCase):
+    """Consumers page through the ledger by id without re-reading old rows"""
+
+    def setUp(self):
+        super().setUp()
+        self.login_staff()
+        self.spool = self.create_spool()
+        for _ in range(4):
+            InventoryBalance.objects.reserve(self.spool.id, 100)
+        self.age_rows()
+
+    def age_rows(self):
+        """Make every ledger row older than the feed's safety lag"""
+        InventoryChange.objects.update(
+            InventoryChangeDate=F("InventoryChangeDate") - timedelta(minutes=5)
+        )
+
+    def feed(self, **params):
+        return self.client.get(reverse("inventory-feed"), params).json()
+
+    def test_pages_follow_the_cursor(self):
+        first = self.feed(limit=3)
+        self.assertTrue(first["has_more"])
+        self.assertEqual([row[2] for row in first["changes"]], [1000, 900, 800])
+
+        second = self.feed(after=first["cursor"], limit=3)
+        self.assertFalse(second["has_more"])
+        self.assertEqual([row[2] for row in second["changes"]], [700, 600])
+        self.assertEqual(second["changes"][0][1], self.spool.id)
+
+        InventoryBalance.objects.reserve(self.spool.id, 100)
+        self.assertEqual(self.feed(after=second["cursor"])["changes"], [])
+        self.age_rows()
+        latest = self.feed(after=second["cursor"])
+        self.assertEqual([row[2] for row in latest["changes"]], [500])
+        self.assertEqual(self.feed(after=latest["cursor"])["changes"], [])
+
+    def test_rows_younger_than_the_lag_hold_back_the_cursor(self):
+        rows = list(InventoryChange.objects.order_by("id"))
+        # A row that may belong to a transaction still in flight
+        InventoryChange.objects.filter(pk=rows[2].pk).update(
+            InventoryChangeDate=timezone.now()
+        )
+        page = self.feed()
+        self.assertEqual([row[0] for row in page["changes"]], [rows[0].id, rows[1].id])
+        self.assertEqual(page["cursor"], rows[1].id)
+
+        self.age_rows()
+        page = self.feed(after=page["cursor"])
+        self.assertEqual(
+            [row[0] for row in page["changes"]], [row.id for row in rows[2:]]
+        )
+
+    def test_edits_are_appended_to_the_feed(self):
+        current = self.spool.inventory_balance.InventoryChange
+        cursor = current.id
+        response = self.client.post(
+            reverse("edit-inventory-change", args=[current.id]),
+            {
+                "RawMaterial": self.spool.id,
+                "QuantityWeightAvailable": 550,
+                "UnitCost": "0.02",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        current.refresh_from_db()
+        self.assertEqual(current.QuantityWeightAvailable, 600)
+        self.assertEqual(
+            InventoryBalance.objects.get(
+                RawMaterial=self.spool
+            ).QuantityWeightAvailable,
+            550,
+        )
+
+        superseded = InventoryChange.objects.order_by("id").first()
+        self.client.post(
+            reverse("edit-inventory-change", args=[superseded.id]),
+            {
+                "RawMaterial": self.spool.id,
+                "QuantityWeightAvailable": 1,
+                "UnitCost": "0.02",
+            },
+        )
+        superseded.refresh_from_db()
+        self.assertEqual(superseded.QuantityWeightAvailable, 1000)
+
+        self.age_rows()
+        self.assertEqual([row[2] for row in self.feed(after=cursor)["changes"]], [550])
+
+    def test_raw_material_updates_are_appended_to_the_feed(self):
+        spool = self.create_spool()
+        initial = spool.current_inventory
+        spool.Cost = Decimal("30.00")
+        spool.save()
+        spool.ReorderLeadTime = 9
+        spool.save()
+
+        rows = list(InventoryChange.objects.filter(RawMaterial=spool).order_by("id"))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0], initial)
+        self.assertEqual(rows[0].UnitCost, Decimal("0.02"))
+        self.assertEqual(
+            (rows[1].QuantityWeightAvailable, rows[1].UnitCost), (1000, Decimal("0.03"))
+        )
+
+    def test_invalid_cursor_rejected(self):
+        response = self.client.get(reverse("inventory-feed"), {"limit": 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("inventory-feed"), {"after": "x"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SPOOL_INDEX_ENABLED=True)
+class SpoolIndexTestCase(SpoolFixtureMixin, TestCase):
+    """The in-process spool index agrees with the database for both policies"""
+
+    def setUp(self):
+        super().setUp()
+        spool_index.invalidate()
+        self.addCleanup(spool_index.invalidate)
+        self.old, self.middle, self.new = (
+            self.create_spool(MaterialWeightPurchased=weight)
+            for weight in (300, 1000, 600)
+        )
+
+    def first_fit(self, grams, policy):
+        hit = spool_index.first_fit(self.filament.id, grams, policy)
+        return hit[0] if hit else None
+
+    def test_index_matches_database_lookups(self):
+        for policy in ("fifo", "best_fit"):
+            for grams in (1, 300, 301, 600, 601, 1000, 1001):
+                with override_settings(SPOOL_INDEX_ENABLED=False):
+                    expected = InventoryChange.objects.find_for_weight(
+                        grams, Decimal("1.0"), filament=self.filament, policy=policy
+                    )
+                self.assertEqual(
+                    self.first_fit(grams, policy),
+                    expected.RawMaterial_id if expected else None,
+                )
+
+    def test_ledger_writes_update_the_index(self):
+        self.assertEqual(self.first_fit(500, "fifo"), self.middle.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryBalance.objects.reserve(self.middle.id, 700)
+        self.assertEqual(self.first_fit(500, "fifo"), self.new.id)
+        self.assertEqual(self.first_fit(300, "best_fit"), self.old.id)
+
+    def test_stale_index_is_confirmed_and_resynced(self):
+        self.assertEqual(self.first_fit(500, "fifo"), self.middle.id)
+        # Another process empties the middle spool
+        InventoryBalance.objects.filter(RawMaterial=self.middle).update(
+            QuantityWeightAvailable=0
+        )
+        inventory = InventoryChange.objects.find_for_weight(
+            500, Decimal("1.0"), filament=self.filament
+        )
+        self.assertEqual(inventory.RawMaterial, self.new)
+
+        spool_index.load()
+        InventoryBalance.objects.filter(RawMaterial=self.new).update(
+            QuantityWeightAvailable=100
+        )
+        with self.assertLogs("store.spool_index", "WARNING"):
+            self.assertEqual(spool_index.load(), 1)
+        self.assertIsNone(self.first_fit(500, "fifo"))
@@ -0,0 +1,464 @@
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from store.pricing import price_matrix
+from store import fixed_point
+from store.checks import check_quote_cache_backend
+from store.repricing import reprice_premade_items
+from store.models import (
+    InventoryBalance,
+    Models,
+    OrderItems,
+    Orders,
+    RawMaterials,
+)
+from store.tests.helpers import SpoolFixtureMixin
+
+
+class PriceMatrixTestCase(SpoolFixtureMixin, TestCase):
+    """Every price matrix cell matches the single-configuration price endpoint"""
+
+    def setUp(self):
+        super().setUp()
+        self.empty = self.create_filament("PLA Blue", "0000FF")
+        for cost, weight, density in (
+            (Decimal("20.00"), 300, Decimal("1.24")),
+            (Decimal("27.50"), 1000, Decimal("1.31")),
+        ):
+            self.create_spool(
+                Cost=cost, MaterialWeightPurchased=weight, MaterialDensity=density
+            )
+        self.model = self.create_model(
+            37, FixedCost=Decimal("1.35"), BaseInfill=Decimal("0.15")
+        )
+
+    def endpoint_price(self, infill, quantity):
+        response = self.client.get(
+            reverse("calculate-price", args=[self.model.id, self.filament.id]),
+            {"infill": infill, "quantity": quantity},
+        )
+        if response.status_code != 200:
+            return None, None
+        data = response.json()
+        return data["price"], data["inventory_id"]
+
+    def test_cells_match_calculate_price(self):
+        for policy in ("fifo", "best_fit"):
+            with override_settings(SPOOL_ALLOCATION_POLICY=policy):
+                matrix = price_matrix(self.model, max_quantity=12)
+                (filament,) = matrix["filaments"]
+                self.assertEqual(filament["id"], self.filament.id)
+                for infill in (5, 17, 33, 50, 81, 100):
+                    for quantity in (1, 2, 7, 12):
+                        row = matrix["infills"].index(infill)
+                        cents = filament["prices"][row][quantity - 1]
+                        self.assertEqual(
+                            self.endpoint_price(infill, quantity),
+                            (
+                                f"{cents / 100:.2f}" if cents is not None else None,
+                                filament["inventory"][row][quantity - 1],
+                            ),
+                        )
+
+    def test_view_returns_empty_cells_when_nothing_fits(self):
+        response = self.client.get(
+            reverse("price-matrix", args=[self.model.id]), {"quantity": 50}
+        )
+        self.assertEqual(response.status_code, 200)
+        (filament,) = response.json()["filaments"]
+        self.assertIsNotNone(filament["prices"][0][0])
+        self.assertIsNone(filament["prices"][-1][-1])
+        self.assertEqual(
+            self.client.get(
+                reverse("price-matrix", args=[self.model.id]), {"quantity": 51}
+            ).status_code,
+            400,
+        )
+
+
+@override_settings(QUOTE_CACHE_SECONDS=300)
+class QuoteCacheTestCase(SpoolFixtureMixin, TestCase):
+    """Repeated price quotes come from the cache until a pricing input is saved"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.raw_material = self.create_spool()
+        self.model = self.create_model(40)
+        self.url = reverse("calculate-price", args=[self.model.id, self.filament.id])
+
+    def quote(self, infill=20, quantity=2):
+        response = self.client.get(self.url, {"infill": infill, "quantity": quantity})
+        return response.json()
+
+    def test_repeated_quote_skips_the_database(self):
+        first = self.quote()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.quote(), first)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.quote(infill="20.0"), first)
+        self.assertNotEqual(self.quote(infill=40)["price"], first["price"])
+
+    def test_saving_costs_expires_quotes(self):
+        first = self.quote()["price"]
+        self.model.FixedCost = Decimal("2.00")
+        self.model.save()
+        second = self.quote()["price"]
+        self.assertGreater(Decimal(second), Decimal(first))
+
+        inventory = self.raw_material.current_inventory
+        inventory.UnitCost = Decimal("0.05")
+        inventory.save()
+        self.assertGreater(Decimal(self.quote()["price"]), Decimal(second))
+
+    def test_ledger_writes_expire_quotes(self):
+        self.assertEqual(self.quote(quantity=50)["status"], "success")
+        InventoryBalance.objects.reserve(self.raw_material.id, 900)
+        self.assertEqual(self.quote(quantity=50)["status"], "error")
+
+    @override_settings(QUOTE_CACHE_SECONDS=0)
+    def test_cache_can_be_turned_off(self):
+        self.quote()
+        with CaptureQueriesContext(connection) as queries:
+            self.quote()
+        self.assertTrue(queries.captured_queries)
+
+    def test_per_process_cache_fails_the_startup_check(self):
+        self.assertEqual(
+            [error.id for error in check_quote_cache_backend(None)], ["store.E001"]
+        )
+        shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_quote_cache_backend(None), [])
+        with override_settings(QUOTE_CACHE_SECONDS=0):
+            self.assertEqual(check_quote_cache_backend(None), [])
+
+
+class PricingKernelTestCase(TestCase):
+    """The integer pricing kernel rounds exactly like the Decimal pricing"""
+
+    def test_random_inputs_match(self):
+        out = StringIO()
+        call_command("check_pricing_kernel", cases=20000, benchmark_cases=0, stdout=out)
+        self.assertIn("Checked 20000 random inputs: 0 mismatches", out.getvalue())
+
+    def test_halves_round_up(self):
+        # 5 cm3 at 50% infill and density 1.00 is exactly 2.5g
+        self.assertEqual(fixed_point.weight_grams(5, 50, 10000, 100, 1), 3)
+        self.assertEqual(
+            fixed_point.required_weight(5, Decimal("0.50"), 1, Decimal("1.00"), 1), 3
+        )
+        # Half a cent of material at markup 1.00
+        self.assertEqual(fixed_point.price_units(1, 1, 50, 0, 1, 100), (50, 50, 1))
+        self.assertEqual(
+            fixed_point.price_components(
+                1, Decimal("0.01"), Decimal("0.50"), Decimal("0.00"), 1, Decimal("1.00")
+            )["price"],
+            Decimal("0.01"),
+        )
+
+    def test_inexact_amounts_are_rejected(self):
+        self.assertEqual(fixed_point.to_units(Decimal("1.25"), 2), 125)
+        self.assertEqual(fixed_point.to_units(Decimal("1.2500"), 2), 125)
+        self.assertIsNone(fixed_point.to_units(Decimal("1.005"), 2))
+        self.assertIsNone(fixed_point.to_units(0.1, 2))
+        self.assertIsNone(fixed_point.to_units(-1, 0))
+        self.assertIsNone(fixed_point.to_units(None, 0))
+
+
+class RepricePremadeItemsTestCase(SpoolFixtureMixin, TestCase):
+    """Unsold premade stock is repriced in bulk to what a save would compute"""
+
+    def setUp(self):
+        super().setUp()
+        self.raw_material = self.create_spool(MaterialWeightPurchased=5000)
+        self.model = self.create_model(40)
+        self.items = [
+            self.create_item(multiplier) for multiplier in ("1.00", "1.00", "1.50")
+        ]
+        self.custom = self.create_item("1.00", IsCustom=True)
+
+    def create_item(self, multiplier, IsCustom=False):
+        return OrderItems.objects.create(
+            InventoryChange=self.raw_material.current_inventory,
+            Model=self.model,
+            InfillMultiplier=Decimal(multiplier),
+            ItemQuantity=1,
+            IsCustom=IsCustom,
+        )
+
+    def assert_priced_as_saved(self, item):
+        item.refresh_from_db()
+        components = item.calculate_price_components()
+        self.assertEqual(item.ItemPrice, components["price"])
+        self.assertEqual(
+            item.CostOfGoodsSold, components["cost_of_goods"].quantize(Decimal("0.01"))
+        )
+
+    def test_changed_costs_are_repriced(self):
+        old_prices = [item.ItemPrice for item in self.items]
+        Models.objects.filter(pk=self.model.pk).update(FixedCost=Decimal("2.50"))
+        RawMaterials.objects.filter(pk=self.raw_material.pk).update(
+            WearAndTearMultiplier=Decimal("1.20")
+        )
+
+        result = reprice_premade_items(chunk_size=2)
+        self.assertEqual((result["checked"], result["repriced"]), (3, 3))
+        for item in self.items:
+            self.assert_priced_as_saved(item)
+        (group,) = result["groups"]
+        self.assertEqual(group["old_total"], sum(old_prices))
+        self.assertEqual(
+            result["total_delta"],
+            sum(item.ItemPrice for item in self.items) - sum(old_prices),
+        )
+        custom_price = self.custom.ItemPrice
+        self.custom.refresh_from_db()
+        self.assertEqual(self.custom.ItemPrice, custom_price)
+        self.assertEqual(reprice_premade_items()["repriced"], 0)
+
+    def test_spool_cost_changes_are_repriced(self):
+        old_price = self.items[0].ItemPrice
+        reserved = self.raw_material.inventory_balance.QuantityWeightAvailable
+        self.raw_material.Cost = Decimal("50.00")
+        self.raw_material.save()
+
+        balance = InventoryBalance.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(balance.UnitCost, Decimal("0.01"))
+        self.assertEqual(balance.QuantityWeightAvailable, reserved)
+        self.assertEqual(reprice_premade_items()["repriced"], 3)
+        for item in self.items:
+            self.assert_priced_as_saved(item)
+            self.assertEqual(item.InventoryChange_id, balance.InventoryChange_id)
+        self.assertGreater(self.items[0].ItemPrice, old_price)
+        self.assertEqual(self.items[0].ItemPrice, self.create_item("1.00").ItemPrice)
+        self.assertEqual(reprice_premade_items()["repriced"], 0)
+
+    def test_backends_without_for_update_of(self):
+        # MariaDB locks rows but has no FOR UPDATE OF; SQLite is told to lock
+        # too, with an empty locking clause so its SQL stays valid
+        features = type(connection.features)
+        Models.objects.filter(pk=self.model.pk).update(FixedCost=Decimal("2.50"))
+        with (
+            patch.object(features, "has_select_for_update", True),
+            patch.object(features, "has_select_for_update_of", False),
+            patch.object(connection.ops, "for_update_sql", return_value=""),
+        ):
+            self.assertEqual(reprice_premade_items()["repriced"], 3)
+
+    def test_queries_do_not_grow_with_items(self):
+        Models.objects.filter(pk=self.model.pk).update(FixedCost=Decimal("2.50"))
+        with CaptureQueriesContext(connection) as few:
+            reprice_premade_items(dry_run=True)
+        for _ in range(20):
+            self.create_item("1.25")
+        with CaptureQueriesContext(connection) as many:
+            reprice_premade_items(dry_run=True)
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+
+    def test_dry_run_and_weight_changes(self):
+        Models.objects.filter(pk=self.model.pk).update(FixedCost=Decimal("2.50"))
+        out = StringIO()
+        call_command("reprice_premade_items", "--dry-run", stdout=out)
+        self.assertIn("Would reprice 3 of 3 unsold premade items", out.getvalue())
+        self.assertEqual(
+            OrderItems.objects.get(pk=self.items[0].pk).ItemPrice,
+            self.items[0].ItemPrice,
+        )
+
+        RawMaterials.objects.filter(pk=self.raw_material.pk).update(
+            MaterialDensity=Decimal("2.00")
+        )
+        result = reprice_premade_items()
+        self.assertEqual((result["repriced"], result["skipped"]), (0, 3))
+
+    def test_admin_action(self):
+        Models.objects.filter(pk=self.model.pk).update(FixedCost=Decimal("2.50"))
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+        response = self.client.post(
+            reverse("admin:store_orderitems_changelist"),
+            {
+                "action": "reprice_premade",
+                "_selected_action": [self.items[0].pk, self.custom.pk],
+            },
+            follow=True,
+        )
+        self.assertContains(response, "Repriced 1 of 1 unsold premade items")
+        self.assert_priced_as_saved(self.items[0])
+
+
+class PricingFingerprintTestCase(SpoolFixtureMixin, TestCase):
+    """Saves that leave the pricing inputs alone skip the price recomputation"""
+
+    def setUp(self):
+        super().setUp()
+        raw_material = self.create_spool()
+        model = self.create_model(40)
+        self.item = OrderItems.objects.create(
+            InventoryChange=raw_material.current_inventory,
+            Model=model,
+            InfillMultiplier=Decimal("1.00"),
+            ItemQuantity=1,
+            IsCustom=False,
+        )
+        user = User.objects.create_user(username="buyer", password="password")
+        self.order = Orders.objects.create(User=user, TotalPrice=0)
+
+    def test_cart_assignment_is_a_single_update(self):
+        item = OrderItems.objects.get(pk=self.item.pk)
+        item.Order = self.order
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        statements = [
+            query["sql"].split()[0]
+            for query in queries.captured_queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+        self.assertEqual(statements, ["UPDATE"])
+        self.assertEqual(OrderItems.objects.get(pk=item.pk).Order, self.order)
+
+    def test_changed_inputs_are_repriced(self):
+        item = OrderItems.objects.get(pk=self.item.pk)
+        item.Markup = Decimal("2.00")
+        item.save()
+        self.assertGreater(item.ItemPrice, self.item.ItemPrice)
+
+        item = OrderItems.objects.get(pk=self.item.pk)
+        item.ItemPrice = Decimal("0.01")
+        item.save()
+        self.assertEqual(item.ItemPrice, item.calculate_price_components()["price"])
+
+    def test_partially_loaded_items_are_repriced(self):
+        item = OrderItems.objects.only("id", "Order").get(pk=self.item.pk)
+        item.Order = self.order
+        item.save()
+        item = OrderItems.objects.get(pk=self.item.pk)
+        self.assertEqual(item.ItemPrice, self.item.ItemPrice)
+        self.assertEqual(item.Order, self.order)
+
+
+class BatchPricingTestCase(SpoolFixtureMixin, TestCase):
+    """Batched configurations price as calculate_price does, in fixed queries"""
+
+    def setUp(self):
+        super().setUp()
+        self.filaments = [self.filament, self.create_filament("PLA Green", "00FF00")]
+        self.empty = self.create_filament("PLA Blue", "0000FF")
+        for filament, cost, weight, density in (
+            (self.filaments[0], Decimal("20.00"), 300, Decimal("1.24")),
+            (self.filaments[0], Decimal("27.50"), 1000, Decimal("1.31")),
+            (self.filaments[1], Decimal("24.00"), 750, Decimal("1.27")),
+        ):
+            self.create_spool(
+                Filament=filament,
+                Cost=cost,
+                MaterialWeightPurchased=weight,
+                MaterialDensity=density,
+            )
+        self.models = [
+            self.create_model(
+                volume, Name=name, FixedCost=fixed_cost, BaseInfill=base_infill
+            )
+            for name, fixed_cost, volume, base_infill in (
+                ("Widget", Decimal("1.35"), 37, Decimal("0.15")),
+                ("Gadget", Decimal("2.10"), 64, Decimal("0.20")),
+            )
+        ]
+
+    def configurations(self):
+        return [
+            {
+                "model": model.id,
+                "filament": filament.id,
+                "infill": infill,
+                "quantity": quantity,
+            }
+            for model in self.models
+            for filament in self.filaments + [self.empty]
+            for infill in (5, 17.5, 50, 100)
+            for quantity in (1, 3, 12)
+        ]
+
+    def post(self, configurations):
+        return self.client.post(
+            reverse("calculate-prices"),
+            {"configurations": configurations},
+            content_type="application/json",
+        )
+
+    def endpoint_result(self, config):
+        params = {"quantity": config.get("quantity", 1)}
+        if config.get("infill") is not None:
+            params["infill"] = config["infill"]
+        data = self.client.get(
+            reverse("calculate-price", args=[config["model"], config["filament"]]),
+            params,
+        ).json()
+        data.pop("debug", None)
+        return data
+
+    def test_prices_match_calculate_price(self):
+        configurations = self.configurations() + [
+            {"model": self.models[1].id, "filament": self.filaments[1].id}
+        ]
+        for policy in ("fifo", "best_fit"):
+            with override_settings(SPOOL_ALLOCATION_POLICY=policy):
+                cache.clear()
+                response = self.post(configurations)
+                self.assertEqual(response.status_code, 200)
+                prices = response.json()["prices"]
+                self.assertEqual(len(prices), len(configurations))
+                self.assertEqual(
+                    prices, [self.endpoint_result(config) for config in configurations]
+                )
+                statuses = {result["status"] for result in prices}
+                self.assertEqual(statuses, {"success", "error"})
+
+    def test_queries_do_not_grow_with_configurations(self):
+        configurations = self.configurations()
+        with CaptureQueriesContext(connection) as few:
+            self.post(configurations[:1])
+        with CaptureQueriesContext(connection) as many:
+            self.post(configurations)
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+        self.assertLessEqual(len(many.captured_queries), 2)
+
+    def test_unknown_model_is_reported_per_configuration(self):
+        response = self.post(
+            [
+                {"model": 0, "filament": self.filaments[0].id},
+                {"model": self.models[0].id, "filament": self.filaments[0].id},
+            ]
+        )
+        missing, found = response.json()["prices"]
+        self.assertEqual(missing, {"status": "error", "message": "Model not found"})
+        self.assertEqual(found["status"], "success")
+
+    def test_invalid_requests_are_rejected(self):
+        valid = {"model": self.models[0].id, "filament": self.filaments[0].id}
+        for configurations in (
+            [],
+            [{"model": self.models[0].id}],
+            [{**valid, "quantity": 0}],
+            [{**valid, "quantity": 2.5}],
+            [{**valid, "model": self.models[0].id + 0.7}],
+            [{**valid, "filament": f"{self.filaments[0].id}.5"}],
+            [{**valid, "infill": "NaN"}],
+            [{**valid, "infill": "lots"}],
+            [valid] * 501,
+            "everything",
+        ):
+            response = self.post(configurations)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["status"], "error")
+        self.assertEqual(self.client.get(reverse("calculate-prices")).status_code, 405)
@@ -5,6 +5,7 @@ from store.forms.fulfillment_status_form import FulfillmentStatusForm
 from store.forms.materials_form import MaterialsForm
 from store.forms.models_form import ModelsForm
 from store.forms.raw_materials_form import RawMaterialsForm
+from store.forms.raw_materials_import_form import RawMaterialsImportForm
 from store.forms.shipping_form import ShippingForm
 from store.forms.suppliers_form import SuppliersForm
 from store.forms.inventory_form import InventoryChangeForm
@@ -31,6 +32,7 @@ from store.models import (
     Suppliers,
     RawMaterials,
     InventoryChange,
+    InventoryBalance,
     Models,
     Shipping,
     Orders,
@@ -38,6 +40,11 @@ from store.models import (
     FulfillmentStatus,
 )
 from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
 
 
 class TestFilamentForm(TestCase):
@@ -233,6 +240,28 @@ class TestInventoryChangeForm(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn("QuantityWeightAvailable", form.errors)
 
+    def test_raw_material_is_read_only_when_editing(self):
+        """Test that a correction cannot move a row to another raw material."""
+        other = RawMaterials.objects.create(
+            Supplier=self.supplier,
+            Filament=self.filament,
+            BrandName="Brand B",
+            Cost=Decimal("100.00"),
+            MaterialWeightPurchased=1000,
+            MaterialDensity=Decimal("1.25"),
+            ReorderLeadTime=7,
+        )
+        form = InventoryChangeForm(
+            data={
+                "RawMaterial": other.id,
+                "QuantityWeightAvailable": 500,
+                "UnitCost": Decimal("0.10"),
+            },
+            instance=self.raw_material.current_inventory,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["RawMaterial"], self.raw_material)
+
     def test_negative_quantity(self):
         """Test form doesn't allow negative values in quantityweight."""
         form_data = {
@@ -386,6 +415,113 @@ class TestRawMaterialsForm(TestCase):
         self.assertTrue(form.is_valid())
 
 
+class TestRawMaterialsImportForm(TestCase):
+    """Test suite for the RawMaterialsImportForm."""
+
+    HEADER = "Supplier,Filament,BrandName,Cost,MaterialWeightPurchased,MaterialDensity,ReorderLeadTime\n"
+
+    def setUp(self):
+        self.material = Materials.objects.create(Name="PLA")
+        self.filament = Filament.objects.create(
+            Name="Red PLA", Material=self.material, ColorHexCode="FF0000"
+        )
+        self.supplier = Suppliers.objects.create(
+            Name="Supplier A",
+            Address="123 Print Rd",
+            Phone="1234567890",
+            Email="supplier@example.com",
+        )
+
+    def upload(self, name, content):
+        return RawMaterialsImportForm(
+            data={}, files={"file": SimpleUploadedFile(name, content)}
+        )
+
+    def test_csv_import_creates_ledger_and_balances(self):
+        """Test that every row gets a raw material, ledger row and balance."""
+        rows = "".join(
+            f"Supplier A,Red PLA,Brand {i},20.00,1000,1.25,7\n" for i in range(50)
+        )
+        form = self.upload("delivery.csv", (self.HEADER + rows).encode())
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        self.assertEqual(RawMaterials.objects.count(), 50)
+        self.assertEqual(InventoryChange.objects.count(), 50)
+        self.assertEqual(
+            InventoryBalance.objects.filter(QuantityWeightAvailable=1000).count(), 50
+        )
+        raw_material = RawMaterials.objects.first()
+        self.assertEqual(raw_material.current_inventory.UnitCost, Decimal("0.02"))
+
+    def test_import_without_bulk_insert_returning(self):
+        """Test that imports use bulk inserts when the database returns no ids."""
+        rows = "".join(
+            f"Supplier A,Red PLA,Brand {i},20.00,1000,1.25,7\n" for i in range(20)
+        )
+        form = self.upload("delivery.csv", (self.HEADER + rows).encode())
+        self.assertTrue(form.is_valid(), form.errors)
+        with (
+            patch.object(
+                type(connection.features), "can_return_rows_from_bulk_insert", False
+            ),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            raw_materials = form.save()
+
+        inserts = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith("INSERT")
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(
+            [spool.BrandName for spool in raw_materials][:2], ["Brand 0", "Brand 1"]
+        )
+        for raw_material in raw_materials:
+            self.assertEqual(
+                raw_material.inventory_balance.QuantityWeightAvailable, 1000
+            )
+            self.assertEqual(raw_material.current_inventory.RawMaterial, raw_material)
+
+    def test_xlsx_import(self):
+        """Test that spreadsheet cells are read like CSV values."""
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(self.HEADER.strip().split(","))
+        sheet.append(
+            [self.supplier.id, self.filament.id, "Brand", 19.99, 1000.0, 1.24, 7]
+        )
+        content = BytesIO()
+        workbook.save(content)
+
+        form = self.upload("delivery.xlsx", content.getvalue())
+        self.assertTrue(form.is_valid(), form.errors)
+        raw_material = form.save()[0]
+        self.assertEqual(raw_material.Cost, Decimal("19.99"))
+        self.assertEqual(raw_material.MaterialWeightPurchased, 1000)
+
+    def test_row_errors_import_nothing(self):
+        """Test that invalid rows are reported and nothing is saved."""
+        rows = (
+            "Supplier A,Red PLA,Good,20.00,1000,1.25,7\n"
+            "Nobody,Red PLA,Bad,abc,1000,1.25,7\n"
+        )
+        form = self.upload("delivery.csv", (self.HEADER + rows).encode())
+        self.assertFalse(form.is_valid())
+        self.assertEqual(len(form.row_errors), 1)
+        row_number, errors = form.row_errors[0]
+        self.assertEqual(row_number, 3)
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(RawMaterials.objects.count(), 0)
+
+    def test_missing_columns(self):
+        """Test that a sheet without the required columns is rejected."""
+        form = self.upload("delivery.csv", b"Supplier,Cost\nSupplier A,20\n")
+        self.assertFalse(form.is_valid())
+        self.assertIn("file", form.errors)
+
+
 class TestShippingForm(TestCase):
     """Test suite for the ShippingForm."""
 
@@ -5,6 +5,7 @@ from store.models import (
     Suppliers,
     RawMaterials,
     InventoryChange,
+    InventoryBalance,
     Models,
     UserProfiles,
     Shipping,
@@ -188,6 +189,111 @@ class InventoryChangeModelTestCase(TestCase):
         )
 
 
+class InventoryBalanceModelTestCase(TestCase):
+    """Test case for the InventoryBalance model."""
+
+    def setUp(self):
+        """Set up a raw material, which creates its initial ledger row."""
+        self.material = Materials.objects.create(Name="PLA")
+        self.supplier = Suppliers.objects.create(
+            Name="Supplier A",
+            Address="123 Supplier St.",
+            Phone="123-456-7890",
+            Email="info@3dprintsupplies.com",
+        )
+        self.filament = Filament.objects.create(
+            Name="PLA Filament", Material=self.material, ColorHexCode="FF0000"
+        )
+        self.raw_material = RawMaterials.objects.create(
+            Supplier=self.supplier,
+            Filament=self.filament,
+            BrandName="Brand A",
+            Cost=Decimal("20.00"),
+            MaterialWeightPurchased=1000,
+            MaterialDensity=Decimal("1.25"),
+            ReorderLeadTime=7,
+            WearAndTearMultiplier=Decimal("1.00"),
+        )
+
+    def test_balance_created_with_raw_material(self):
+        """Test that a new raw material gets a balance for its initial row."""
+        balance = InventoryBalance.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(balance.QuantityWeightAvailable, 1000)
+        self.assertEqual(balance.InventoryChange, self.raw_material.current_inventory)
+
+    def test_balance_follows_latest_ledger_row(self):
+        """Test that the balance moves to each new ledger row."""
+        latest = InventoryChange.objects.create(
+            RawMaterial=self.raw_material,
+            QuantityWeightAvailable=150,
+            UnitCost=Decimal("0.02"),
+        )
+        balance = InventoryBalance.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(balance.InventoryChange, latest)
+        self.assertEqual(balance.QuantityWeightAvailable, 150)
+        self.assertTrue(balance.needs_reorder)
+        self.assertEqual(list(InventoryChange.objects.available()), [latest])
+
+    def test_balance_refreshed_on_delete(self):
+        """Test that deleting the latest row restores the previous balance."""
+        initial = self.raw_material.current_inventory
+        latest = InventoryChange.objects.create(
+            RawMaterial=self.raw_material,
+            QuantityWeightAvailable=0,
+            UnitCost=Decimal("0.02"),
+        )
+        self.assertIsNone(self.raw_material.current_inventory)
+        latest.delete()
+        balance = InventoryBalance.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(balance.InventoryChange, initial)
+        self.assertEqual(balance.QuantityWeightAvailable, 1000)
+
+    def test_balance_kept_when_older_row_deleted(self):
+        """Test that deleting a row other than the current one leaves the balance."""
+        initial = self.raw_material.current_inventory
+        latest = InventoryChange.objects.create(
+            RawMaterial=self.raw_material,
+            QuantityWeightAvailable=600,
+            UnitCost=Decimal("0.02"),
+        )
+        InventoryBalance.objects.filter(RawMaterial=self.raw_material).update(
+            QuantityWeightAvailable=550
+        )
+        InventoryChange.objects.filter(pk=initial.pk).delete()
+        balance = InventoryBalance.objects.get(RawMaterial=self.raw_material)
+        self.assertEqual(balance.InventoryChange, latest)
+        self.assertEqual(balance.QuantityWeightAvailable, 550)
+
+    def test_find_for_weight_uses_fifo_balance(self):
+        """Test that the oldest spool holding enough grams is returned."""
+        newer = RawMaterials.objects.create(
+            Supplier=self.supplier,
+            Filament=self.filament,
+            BrandName="Brand B",
+            Cost=Decimal("25.00"),
+            MaterialWeightPurchased=2000,
+            MaterialDensity=Decimal("1.25"),
+            ReorderLeadTime=7,
+        )
+        self.assertEqual(
+            InventoryChange.objects.find_for_weight(100).RawMaterial,
+            self.raw_material,
+        )
+        self.assertEqual(
+            InventoryChange.objects.find_for_weight(1000).RawMaterial, newer
+        )
+        self.assertIsNone(InventoryChange.objects.find_for_weight(2000))
+
+    def test_find_for_weights_batch(self):
+        """Test that batch lookups match single lookups, in request order."""
+        results = InventoryChange.objects.find_for_weights(
+            [(self.raw_material, 100), (self.raw_material.id, 900), (9999, 1)]
+        )
+        self.assertEqual(results[0], self.raw_material.current_inventory)
+        self.assertIsNone(results[1])
+        self.assertIsNone(results[2])
+
+
 class ModelsModelTestCase(TestCase):
     """Test case for the Models model."""
 
@@ -69,6 +69,11 @@ urlpatterns = [
         raw_materials_view.add_raw_material,
         name="add-raw-material",
     ),
+    path(
+        "raw-materials/import/",
+        raw_materials_view.import_raw_materials,
+        name="import-raw-materials",
+    ),
     path(
         "raw-materials/edit/<int:pk>/",
         raw_materials_view.edit_raw_material,
@@ -90,6 +95,26 @@ urlpatterns = [
         inventory_change_view.current_inventory_levels,
         name="current-inventory",
     ),
+    path(
+        "inventory/history/",
+        inventory_change_view.inventory_history,
+        name="inventory-history",
+    ),
+    path(
+        "inventory/as-of/",
+        inventory_change_view.inventory_as_of,
+        name="inventory-as-of",
+    ),
+    path(
+        "inventory/reconcile/",
+        inventory_change_view.reconcile_inventory,
+        name="inventory-reconcile",
+    ),
+    path(
+        "inventory/feed/",
+        inventory_change_view.inventory_feed,
+        name="inventory-feed",
+    ),
     path(
         "inventory/all",
         inventory_change_view.inventory_change_list,
@@ -232,6 +257,16 @@ urlpatterns = [
         gallery_view.calculate_price,
         name="calculate-price",
     ),
+    path(
+        "store/api/model/<int:model_id>/price-matrix/",
+        gallery_view.get_price_matrix,
+        name="price-matrix",
+    ),
+    path(
+        "store/api/prices/",
+        gallery_view.calculate_prices,
+        name="calculate-prices",
+    ),
     # Cart and Checkout URLs
     path("cart/", cart_checkout_view.cart_view, name="cart"),
     path(
@@ -298,6 +333,21 @@ urlpatterns = [
         admin_dashboard_view.inventory_management,
         name="inventory_management",
     ),
+    path(
+        "inventory-management/low-stock/",
+        admin_dashboard_view.low_stock_alerts,
+        name="low_stock_alerts",
+    ),
+    path(
+        "order-management/shortages/",
+        admin_dashboard_view.backlog_shortages,
+        name="backlog_shortages",
+    ),
+    path(
+        "inventory-management/valuation/",
+        admin_dashboard_view.inventory_valuation_report,
+        name="inventory_valuation",
+    ),
     path(
         "order-management/",
         admin_dashboard_view.order_management,
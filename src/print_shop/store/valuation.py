@@ -0,0 +1,84 @@
+"""
+Inventory valuation for finance
+
+Stock value is the grams on hand times UnitCost of the latest ledger row
+of every spool. The latest rows are picked with a ROW_NUMBER() window over
+the ledger, partitioned by spool, and summed per material and supplier by the
+database in one statement, so the report never loads ledger rows into Python.
+"""
+
+from decimal import Decimal
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import RowNumber
+from store.models import InventoryChange
+
+CSV_COLUMNS = ["Material", "Supplier", "Spools", "Grams", "Value"]
+
+
+def latest_ledger_rows(as_of=None):
+    """
+    Ids of the latest ledger row of each spool, optionally as of a past moment.
+    Returned as a subquery so it can be used inside a larger statement.
+    """
+    rows = InventoryChange.objects.all()
+    if as_of:
+        rows = rows.filter(InventoryChangeDate__lte=as_of)
+    return (
+        rows.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F("RawMaterial_id"),
+                order_by=[F("InventoryChangeDate").desc(), F("id").desc()],
+            )
+        )
+        .filter(row_number=1)
+        .values("id")
+    )
+
+
+def inventory_valuation(as_of=None):
+    """
+    Value of the grams on hand grouped by material and supplier.
+
+    Args:
+        as_of: Value the stock at this moment instead of now
+
+    Returns:
+        dict with 'rows', each with 'material', 'supplier', 'spools', 'grams'
+        and 'value' (to the cent), sorted by material and supplier,
+        plus 'total_grams' and 'total_value'.
+    """
+    groups = (
+        InventoryChange.objects.filter(
+            id__in=latest_ledger_rows(as_of), QuantityWeightAvailable__gt=0
+        )
+        .values(
+            "RawMaterial__Filament__Material_id",
+            "RawMaterial__Filament__Material__Name",
+            "RawMaterial__Supplier_id",
+            "RawMaterial__Supplier__Name",
+        )
+        .annotate(
+            spools=Count("id"),
+            grams=Sum("QuantityWeightAvailable"),
+            value=Sum(F("QuantityWeightAvailable") * F("UnitCost")),
+        )
+        .order_by(
+            "RawMaterial__Filament__Material__Name", "RawMaterial__Supplier__Name"
+        )
+    )
+    rows = [
+        {
+            "material": group["RawMaterial__Filament__Material__Name"],
+            "supplier": group["RawMaterial__Supplier__Name"],
+            "spools": group["spools"],
+            "grams": group["grams"],
+            "value": Decimal(group["value"]).quantize(Decimal("0.01")),
+        }
+        for group in groups
+    ]
+    return {
+        "rows": rows,
+        "total_grams": sum(row["grams"] for row in rows),
+        "total_value": sum((row["value"] for row in rows), Decimal("0.00")),
+    }
@@ -1,8 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
+import json
 from store.forms.inventory_form import InventoryChangeForm
-from store.models import InventoryChange, RawMaterials
+from store.models import (
+    InventoryChange,
+    InventoryBalance,
+    InventoryAdjustment,
+    CartHold,
+    RawMaterials,
+)
+from store.forecasting import forecast_reorders
+from store.inventory_history import (
+    filament_history,
+    inventory_at,
+    DEFAULT_POINTS,
+    MAX_POINTS,
+)
+from store.reconciliation import reconcile_readings, DEFAULT_TOLERANCE
+
+
+DEFAULT_FEED_LIMIT = 500
+MAX_FEED_LIMIT = 5000
 
 
 # Check if the user is admin (Staff or Superuser)
@@ -28,23 +54,32 @@ def current_inventory_levels(request):
     """
     Display the current inventory levels for all raw materials.
     If inventory levels are low, mark them for reorder.
-    Uses the RawMaterials.current_inventory property from the model manager.
+    Reads the materialized InventoryBalance rows in a single query
+    and adds the usage forecast of its filament and the grams held by active carts
+    for each raw material.
+    Held grams are already off the available weight.
     """
-    raw_materials = RawMaterials.objects.select_related(
-        'Filament__Material'
+    balances = InventoryBalance.objects.filter(
+        QuantityWeightAvailable__gt=0
+    ).select_related(
+        'RawMaterial__Filament__Material',
+        'InventoryChange',
     ).order_by(
-        'Filament__Material__Name',
-        'Filament__Name',
-        'PurchasedDate'
+        'RawMaterial__Filament__Material__Name',
+        'RawMaterial__Filament__Name',
+        'RawMaterial__PurchasedDate'
     )
+    forecasts = forecast_reorders()
+    held = CartHold.objects.held_by_raw_material()
     raw_materials_with_inventory = []
-    for raw_material in raw_materials:
-        current_inventory = raw_material.current_inventory
-        if current_inventory:
+    for balance in balances:
+        if balance.InventoryChange:
             raw_materials_with_inventory.append({
-                "raw_material": raw_material,
-                "inventory_change": current_inventory,
-                "needs_reorder": current_inventory.needs_reorder,
+                "raw_material": balance.RawMaterial,
+                "inventory_change": balance.InventoryChange,
+                "needs_reorder": balance.needs_reorder,
+                "forecast": forecasts.get(balance.RawMaterial.Filament_id),
+                "held": held.get(balance.RawMaterial_id, 0),
             })
     return render(
         request,
@@ -55,6 +90,173 @@ def current_inventory_levels(request):
     )
 
 
+# Downsampled inventory history of a filament as JSON - only accessible to admin users
+@login_required
+@user_passes_test(is_admin)
+def inventory_history(request):
+    """
+    JSON time series of grams on hand per filament, downsampled for charting.
+    Query parameters: filament (repeatable, default all), days (default 180)
+    and points (default 200, at most 2000 per filament).
+    """
+    try:
+        filament_ids = [int(value) for value in request.GET.getlist("filament")]
+        days = int(request.GET.get("days", 180))
+        points = int(request.GET.get("points", DEFAULT_POINTS))
+    except ValueError:
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": "filament, days and points must be integers",
+            },
+            status=400,
+        )
+    if days < 1 or not 4 <= points <= MAX_POINTS:
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": f"days must be positive and points between 4 and {MAX_POINTS}",
+            },
+            status=400,
+        )
+
+    series = filament_history(filament_ids or None, days=days, points=points)
+    return JsonResponse({"status": "success", "series": series})
+
+
+# Balances as of a point in time - only accessible to admin users
+@login_required
+@user_passes_test(is_admin)
+def inventory_as_of(request):
+    """
+    JSON balances of every raw material at a past moment, for audits.
+    Query parameter: date, either YYYY-MM-DD (end of that day) or an ISO datetime.
+    """
+    value = request.GET.get("date", "")
+    try:
+        moment = parse_datetime(value)
+        day = None if moment else parse_date(value)
+    except ValueError:
+        moment = day = None
+    if day:
+        moment = datetime.combine(day, time.max)
+    if not moment:
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": "date must be YYYY-MM-DD or an ISO datetime",
+            },
+            status=400,
+        )
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+
+    balances = inventory_at(moment)
+    raw_materials = RawMaterials.objects.select_related("Filament__Material").in_bulk(
+        balances.keys()
+    )
+    return JsonResponse(
+        {
+            "status": "success",
+            "as_of": moment.isoformat(),
+            "balances": [
+                {
+                    "raw_material_id": raw_material_id,
+                    "material": raw_materials[raw_material_id].Filament.Material.Name,
+                    "filament": raw_materials[raw_material_id].Filament.Name,
+                    "quantity": quantity,
+                }
+                for raw_material_id, quantity in sorted(balances.items())
+                if raw_material_id in raw_materials
+            ],
+        }
+    )
+
+
+# Page through ledger changes after a cursor - only accessible to admin users
+@login_required
+@user_passes_test(is_admin)
+def inventory_feed(request):
+    """
+    JSON feed of ledger rows after a cursor, for mirroring stock levels elsewhere.
+    Query parameters: after (id of the last row seen, default 0) and limit
+    (default 500, at most 5000). Rows are [id, raw_material_id, grams,
+    unit_cost, date] arrays; pass the returned cursor as the next after.
+    Rows are served once INVENTORY_FEED_LAG_SECONDS old, so a mirror is that
+    far behind but never skips a row committed after a higher id.
+    """
+    try:
+        after = int(request.GET.get("after", 0))
+        limit = int(request.GET.get("limit", DEFAULT_FEED_LIMIT))
+    except ValueError:
+        return JsonResponse(
+            {"status": "error", "message": "after and limit must be integers"},
+            status=400,
+        )
+    if after < 0 or not 1 <= limit <= MAX_FEED_LIMIT:
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": f"after cannot be negative and limit must be between 1 and {MAX_FEED_LIMIT}",
+            },
+            status=400,
+        )
+
+    rows, has_more = InventoryChange.objects.changes_after(after, limit)
+    return JsonResponse(
+        {
+            "status": "success",
+            "fields": ["id", "raw_material_id", "grams", "unit_cost", "date"],
+            "changes": [
+                [change_id, raw_material_id, grams, str(unit_cost), date.isoformat()]
+                for change_id, raw_material_id, grams, unit_cost, date in rows
+            ],
+            "cursor": rows[-1][0] if rows else after,
+            "has_more": has_more,
+        }
+    )
+
+
+# Reconcile a stock count of weighed spools - only accessible to admin users
+@login_required
+@user_passes_test(is_admin)
+@require_POST
+def reconcile_inventory(request):
+    """
+    Reconcile a stock count of weighed spools in one transaction.
+    Expects a JSON body {"readings": [{"raw_material": id, "grams": n}, ...]}
+    with an optional "tolerance" in grams, and returns the variance report.
+    """
+    try:
+        payload = json.loads(request.body)
+        readings = [
+            (int(reading["raw_material"]), int(reading["grams"]))
+            for reading in payload["readings"]
+        ]
+        tolerance = int(payload.get("tolerance", DEFAULT_TOLERANCE))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": "Send JSON with readings of integer raw_material and grams",
+            },
+            status=400,
+        )
+    if tolerance < 0:
+        return JsonResponse(
+            {"status": "error", "message": "tolerance cannot be negative"},
+            status=400,
+        )
+
+    try:
+        report = reconcile_readings(readings, tolerance=tolerance)
+    except ValidationError as e:
+        return JsonResponse(
+            {"status": "error", "message": " ".join(e.messages)}, status=400
+        )
+    return JsonResponse({"status": "success", "tolerance": tolerance, **report})
+
+
 # Show details of a specific inventory change - accessible to all users
 @login_required
 def inventory_change_detail(request, pk):
@@ -85,12 +287,40 @@ def add_inventory_change(request):
 @login_required
 @user_passes_test(is_admin)
 def edit_inventory_change(request, pk):
+    """
+    Correct the current ledger row of a spool. The ledger is append-only,
+    so the corrected values are recorded as a new row and the old one is kept;
+    rows a later change has superseded can no longer be corrected.
+    """
     inventory_change = get_object_or_404(InventoryChange, pk=pk)
+    not_current = "Only the latest inventory change of a raw material can be corrected"
+    if not InventoryBalance.objects.filter(InventoryChange=inventory_change).exists():
+        messages.error(request, not_current)
+        return redirect("inventory-change-list")
     if request.method == "POST":
+        previous_quantity = inventory_change.QuantityWeightAvailable
         form = InventoryChangeForm(request.POST, instance=inventory_change)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Inventory Change was updated successfully")
+            with transaction.atomic():
+                # Lock the balance so no reservation supersedes the row meanwhile
+                if (
+                    InventoryBalance.objects.select_for_update()
+                    .filter(InventoryChange=inventory_change)
+                    .first()
+                    is None
+                ):
+                    messages.error(request, not_current)
+                    return redirect("inventory-change-list")
+                # Recorded like a stock count, so the ledger audit keeps it
+                adjustment = (
+                    form.cleaned_data["QuantityWeightAvailable"] - previous_quantity
+                )
+                if adjustment:
+                    InventoryAdjustment.objects.create(
+                        RawMaterial=inventory_change.RawMaterial, Weight=adjustment
+                    )
+                InventoryChange.objects.create(**form.cleaned_data)
+            messages.success(request, "Inventory Change correction was recorded")
             return redirect("inventory-change-list")
     else:
         form = InventoryChangeForm(instance=inventory_change)
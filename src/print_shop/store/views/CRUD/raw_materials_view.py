@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from store.forms.raw_materials_form import RawMaterialsForm
+from store.forms.raw_materials_import_form import RawMaterialsImportForm
 from store.models import RawMaterials, InventoryChange
 
 
@@ -39,6 +40,24 @@ def add_raw_material(request):
     return render(request, "raw_materials/raw_material_form.html", {"form": form})
 
 
+# Import a supplier delivery sheet of raw materials - only accessible to admin users
+@login_required
+@user_passes_test(is_admin)
+def import_raw_materials(request):
+    if request.method == "POST":
+        form = RawMaterialsImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            raw_materials = form.save()
+            messages.success(
+                request,
+                f"{len(raw_materials)} Raw Materials were imported successfully",
+            )
+            return redirect("current-inventory")
+    else:
+        form = RawMaterialsImportForm()
+    return render(request, "raw_materials/raw_material_import.html", {"form": form})
+
+
 # Edit an existing raw material - only accessible to admin users
 @login_required
 @user_passes_test(is_admin)
@@ -1,6 +1,13 @@
 from django.shortcuts import render,redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
-from store.models import Orders, FulfillmentStatus, Models, InventoryChange, RawMaterials
+from store.models import Orders, FulfillmentStatus, Models, InventoryChange, LowStockAlert, Filament
+from store.forecasting import simulate_backlog
+from store.valuation import inventory_valuation, CSV_COLUMNS
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time
+import csv
 from django.db.models import Q
 
 
@@ -28,11 +35,7 @@ def admin_dashboard(request):
 
     pending_uploads = Models.objects.filter(FilePath__isnull=True).count()
 
-    inventory_warnings = sum(
-        1
-        for inv in RawMaterials.objects.all()
-        if inv.current_inventory and inv.current_inventory.needs_reorder
-    )
+    inventory_warnings = LowStockAlert.objects.count()
    
     context = {
         "total_orders": total_orders,
@@ -77,6 +80,65 @@ def inventory_management(request):
     )
 
 
+@login_required
+@user_passes_test(is_admin)
+def low_stock_alerts(request):
+    """View for listing raw materials below their reorder threshold, oldest alert first"""
+    alerts = LowStockAlert.objects.select_related(
+        "RawMaterial__Filament__Material", "RawMaterial__Supplier"
+    ).order_by("CreatedAt")
+    return render(request, "admin_dashboard/low_stock_alerts.html", {"alerts": alerts})
+
+
+@login_required
+@user_passes_test(is_admin)
+def backlog_shortages(request):
+    """View for the PAID/PRINTING order lines that will run out of filament before printing"""
+    shortages = simulate_backlog()
+    filaments = Filament.objects.select_related("Material").in_bulk(
+        {shortage["filament_id"] for shortage in shortages}
+    )
+    for shortage in shortages:
+        shortage["filament"] = filaments.get(shortage["filament_id"])
+    return render(
+        request, "admin_dashboard/backlog_shortages.html", {"shortages": shortages}
+    )
+
+
+@login_required
+@user_passes_test(is_admin)
+def inventory_valuation_report(request):
+    """
+    View for the stock value per material and supplier.
+    ?date=YYYY-MM-DD values the stock at the end of that day and ?format=csv downloads it.
+    """
+    try:
+        day = parse_date(request.GET.get("date", ""))
+    except ValueError:
+        day = None
+    as_of = timezone.make_aware(datetime.combine(day, time.max)) if day else None
+    valuation = inventory_valuation(as_of)
+
+    if request.GET.get("format") == "csv":
+        response = HttpResponse(content_type="text/csv")
+        filename = f"inventory-valuation-{day or timezone.localdate()}.csv"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        writer = csv.writer(response)
+        writer.writerow(CSV_COLUMNS)
+        # Row dicts are built in CSV_COLUMNS order
+        writer.writerows(row.values() for row in valuation["rows"])
+        writer.writerow(
+            ["Total", "", "", valuation["total_grams"], valuation["total_value"]]
+        )
+        return response
+
+    return render(
+        request,
+        "admin_dashboard/inventory_valuation.html",
+        {"valuation": valuation, "day": day},
+    )
+
+
 @login_required
 @user_passes_test(is_admin)
 def order_management(request):
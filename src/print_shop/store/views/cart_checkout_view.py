@@ -2,8 +2,11 @@ from decimal import Decimal
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
 from store.models import (
+    CartHold,
     OrderItems,
     Orders,
     Shipping,
@@ -26,7 +29,7 @@ def get_cart_items(request):
         return OrderItems.objects.none()
 
     return OrderItems.objects.filter(Order=draft_order).select_related(
-        "Model", "InventoryChange__RawMaterial__Filament__Material"
+        "Model", "InventoryChange__RawMaterial__Filament__Material", "cart_hold"
     )
 
 
@@ -64,7 +67,16 @@ def calculate_shipping(shipping, subtotal):
 def cart_view(request):
     """
     View for displaying the user's cart
+    Items whose hold expired are reserved again, or flagged if they cannot be.
     """
+    draft_order = get_draft_order(request)
+    if draft_order:
+        for item in CartHold.objects.touch(draft_order):
+            messages.warning(
+                request,
+                f"{item.Model.Name} is no longer in stock in the chosen filament. "
+                "Lower its quantity or remove it to check out.",
+            )
     cart_items = get_cart_items(request)
 
     subtotal = sum(item.ItemPrice for item in cart_items)
@@ -118,20 +130,38 @@ def update_cart_item(request, item_id):
                 return redirect("cart")
 
             original_quantity = item.ItemQuantity
+            original_inventory = item.InventoryChange
+            original_weight = item.TotalWeight
             item.ItemQuantity = new_quantity
 
             if item.IsCustom:
                 total_weight = item.calculate_required_weight()
                 weight_with_margin = total_weight * 1.15
                 inventory = item.InventoryChange
-                sufficient_inventory, error_message = validate_inventory_availability(
-                    inventory, weight_with_margin
-                )
+                if item.allocations.exists():
+                    # Split items are split again by move_reservation
+                    sufficient_inventory, error_message = inventory, None
+                else:
+                    sufficient_inventory, error_message = (
+                        validate_inventory_availability(inventory, weight_with_margin)
+                    )
                 if sufficient_inventory:
                     if sufficient_inventory != inventory:
                         item.InventoryChange = sufficient_inventory
-                    item.save()
-                    messages.success(request, f"Quantity updated to {new_quantity}.")
+                    try:
+                        with transaction.atomic():
+                            item.save()
+                            item.move_reservation(
+                                original_inventory.RawMaterial_id, original_weight
+                            )
+                        messages.success(
+                            request, f"Quantity updated to {new_quantity}."
+                        )
+                    except ValidationError as e:
+                        item.ItemQuantity = original_quantity
+                        item.InventoryChange = original_inventory
+                        item.save()
+                        messages.error(request, " ".join(e.messages))
                 else:
                     item.ItemQuantity = original_quantity
                     item.save()
@@ -157,10 +187,22 @@ def update_cart_item(request, item_id):
                         f"Only {available_quantity} of this item are available.",
                     )
                 else:
-                    item.save()
-                    messages.success(request, f"Quantity updated to {new_quantity}.")
+                    try:
+                        with transaction.atomic():
+                            item.save()
+                            item.move_reservation(
+                                original_inventory.RawMaterial_id, original_weight
+                            )
+                        messages.success(
+                            request, f"Quantity updated to {new_quantity}."
+                        )
+                    except ValidationError as e:
+                        item.ItemQuantity = original_quantity
+                        item.save()
+                        messages.error(request, " ".join(e.messages))
         except ValueError:
             messages.error(request, "Please enter a valid quantity.")
+        CartHold.objects.touch(item.Order)
 
     return redirect("cart")
 
@@ -178,6 +220,9 @@ def checkout(request):
     if not draft_order:
         messages.error(request, "Your cart could not be found.")
         return redirect("cart")
+    if CartHold.objects.touch(draft_order):
+        messages.error(request, "Some items in your cart are no longer in stock.")
+        return redirect("cart")
     subtotal = sum(item.ItemPrice for item in cart_items)
     form = CheckoutForm(request.POST or None)
     if request.method == "POST" and form.is_valid():
@@ -213,6 +258,9 @@ def checkout_confirm(request):
     if not draft_order:
         messages.error(request, "Your cart could not be found.")
         return redirect("cart")
+    if CartHold.objects.touch(draft_order):
+        messages.error(request, "Some items in your cart are no longer in stock.")
+        return redirect("cart")
     shipping_id = request.session.get("checkout_shipping_id")
     expedited = request.session.get("checkout_expedited", False)
     if not shipping_id:
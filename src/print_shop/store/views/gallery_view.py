@@ -1,10 +1,13 @@
+import json
 from decimal import Decimal, InvalidOperation
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
 from django.db.models import Q
 from store.models import (
     Models,
@@ -15,9 +18,17 @@ from store.models import (
     RawMaterials,
     Orders,
     FulfillmentStatus,
+    CartHold,
 )
 from store.forms.order_forms import CustomOrderItemForm, PremadeItemCartForm
 from store.views.cart_checkout_view import get_draft_order
+from store.pricing import (
+    price_configurations,
+    price_matrix,
+    MAX_CONFIGURATIONS,
+    MAX_MATRIX_QUANTITY,
+)
+from store.quote_cache import get_quote, quote_key, set_quote
 
 
 def custom_gallery(request):
@@ -86,7 +97,7 @@ def get_available_inventory_items(
         .distinct()
     )
 
-    sufficient_items = []
+    candidates = []
 
     for inventory in inventory_items:
         if not inventory.RawMaterial or not hasattr(inventory.RawMaterial, "Filament"):
@@ -105,9 +116,16 @@ def get_available_inventory_items(
             IsCustom=True,
         )
 
-        total_weight = temp_order_item.calculate_required_weight()
+        candidates.append((inventory, temp_order_item.calculate_required_weight()))
+
+    found_inventory = InventoryChange.objects.find_for_weights(
+        (inventory.RawMaterial, total_weight) for inventory, total_weight in candidates
+    )
+
+    sufficient_items = []
 
-        if inventory.RawMaterial.find_inventory_for_weight(total_weight):
+    for (inventory, total_weight), found in zip(candidates, found_inventory):
+        if found:
             sufficient_items.append(
                 {
                     "id": inventory.id,
@@ -210,40 +228,53 @@ def model_detail(request, model_id):
 
             total_weight = temp_order_item.calculate_required_weight()
 
+            split_allocations = None
             if not selected_inventory.RawMaterial.find_inventory_for_weight(
                 total_weight
             ):
-                return JsonResponse(
-                    {
-                        "success": False,
-                        "message": "Insufficient inventory available for the selected options",
-                    },
-                    status=400,
+                # Too large for the chosen spool: spread it over spools of the filament
+                split_allocations = InventoryChange.objects.find_split_for_weight(
+                    total_weight, selected_inventory.RawMaterial.Filament_id
                 )
-
-            draft_order = get_draft_order(request) or Orders.objects.create(
-                User=request.user,
-                TotalPrice=0,
-                ExpeditedService=False,
-                Shipping=None,
-            )
+                if not split_allocations:
+                    return JsonResponse(
+                        {
+                            "success": False,
+                            "message": "Insufficient inventory available for the selected options",
+                        },
+                        status=400,
+                    )
+                selected_inventory = split_allocations[0][0]
+                temp_order_item.InventoryChange = selected_inventory
+                if len(split_allocations) == 1:
+                    split_allocations = None
 
             calculated_price = request.POST.get("calculated_price")
 
             price_components = temp_order_item.calculate_price_components()
 
-            order_item = OrderItems(
-                Model=model,
-                InventoryChange=selected_inventory,
-                InfillMultiplier=infill_multiplier,
-                ItemQuantity=quantity,
-                IsCustom=True,
-                Order=draft_order,
-                TotalWeight=price_components["weight"],
-                CostOfGoodsSold=price_components["cost_of_goods"],
-                ItemPrice=price_components["price"],
-            )
-            order_item.save()
+            # A new cart is only kept if its first item reserves its grams
+            with transaction.atomic():
+                draft_order = get_draft_order(request) or Orders.objects.create(
+                    User=request.user,
+                    TotalPrice=0,
+                    ExpeditedService=False,
+                    Shipping=None,
+                )
+                order_item = OrderItems(
+                    Model=model,
+                    InventoryChange=selected_inventory,
+                    InfillMultiplier=infill_multiplier,
+                    ItemQuantity=quantity,
+                    IsCustom=True,
+                    Order=draft_order,
+                    TotalWeight=price_components["weight"],
+                    CostOfGoodsSold=price_components["cost_of_goods"],
+                    ItemPrice=price_components["price"],
+                )
+                order_item.split_allocations = split_allocations
+                order_item.save()
+            CartHold.objects.touch(draft_order)
 
             return JsonResponse(
                 {
@@ -253,6 +284,10 @@ def model_detail(request, model_id):
                 }
             )
 
+        except ValidationError as e:
+            return JsonResponse(
+                {"status": "error", "message": " ".join(e.messages)}, status=400
+            )
         except Exception as e:
             error_msg = f"Error adding item to cart: {str(e)}"
             return JsonResponse({"status": "error", "message": error_msg}, status=400)
@@ -280,34 +315,30 @@ def get_filaments_for_material(request, model_id, material_id):
     try:
         model = get_object_or_404(Models, pk=model_id)
         material = get_object_or_404(Materials, pk=material_id)
-        raw_materials = (
-            RawMaterials.objects.filter(
-                Filament__Material=material,
-                inventorychange__QuantityWeightAvailable__gt=0,
-            )
-            .select_related("Filament")
-            .distinct()
-        )
-
-        sufficient_filaments = set()
+        raw_materials = RawMaterials.objects.filter(
+            Filament__Material=material,
+            inventory_balance__QuantityWeightAvailable__gt=0,
+        ).select_related("Filament")
 
-        for raw_material in raw_materials.order_by("PurchasedDate"):
-            temp_order_item = OrderItems(
-                Model=model,
-                InfillMultiplier=1.0,
-                ItemQuantity=1,
-                IsCustom=True,
-            )
+        temp_order_item = OrderItems(
+            Model=model,
+            InfillMultiplier=1.0,
+            ItemQuantity=1,
+            IsCustom=True,
+        )
 
-            required_weight = temp_order_item.calculate_required_weight()
+        required_weight = temp_order_item.calculate_required_weight()
 
-            inventory = InventoryChange.objects.find_for_weight(
-                required_weight=required_weight,
-                safety_margin=Decimal("1.15"),
-                raw_material=raw_material,
-            )
-            if inventory:
-                sufficient_filaments.add(raw_material.Filament_id)
+        raw_materials = list(raw_materials.order_by("PurchasedDate"))
+        found_inventory = InventoryChange.objects.find_for_weights(
+            ((raw_material, required_weight) for raw_material in raw_materials),
+            safety_margin=Decimal("1.15"),
+        )
+        sufficient_filaments = {
+            raw_material.Filament_id
+            for raw_material, inventory in zip(raw_materials, found_inventory)
+            if inventory
+        }
 
         filaments = Filament.objects.filter(id__in=sufficient_filaments).order_by(
             "Name"
@@ -337,9 +368,24 @@ def get_filaments_for_material(request, model_id, material_id):
 def calculate_price(request, model_id, filament_id):
     """
     API endpoint to calculate the estimated price based on model, filament, infill, and quantity.
-    Uses FIFO inventory management to find the appropriate inventory record.
+    Uses the configured spool allocation policy (FIFO by default)
+    to find the appropriate inventory record.
+    Repeated quotes are served from the quote cache without database reads.
     """
     try:
+        quantity = int(request.GET.get("quantity", "1"))
+        cache_key = quote_key(
+            model_id,
+            filament_id,
+            request.GET.get("infill"),
+            quantity,
+            OrderItems._meta.get_field("Markup").default,
+        )
+        cached = get_quote(cache_key)
+        if cached:
+            data, status = cached
+            return JsonResponse(data, status=status, json_dumps_params={"default": str})
+
         model = get_object_or_404(Models, pk=model_id)
         filament = get_object_or_404(Filament, pk=filament_id)
         base_infill_percentage = model.BaseInfill * 100
@@ -353,17 +399,19 @@ def calculate_price(request, model_id, filament_id):
         except (TypeError, ValueError, InvalidOperation):
             infill_percentage = base_infill_percentage
 
-        quantity = int(request.GET.get("quantity", "1"))
-
         temp_order_item = OrderItems(Model=model)
         infill_multiplier = temp_order_item.calculate_infill_multiplier(
             infill_percentage
         )
 
         volume_cm3 = model.EstimatedPrintVolume * model.BaseInfill * infill_multiplier
-        raw_material = RawMaterials.objects.filter(
-            Filament=filament, inventorychange__QuantityWeightAvailable__gt=0
-        ).first()
+        raw_material = (
+            RawMaterials.objects.filter(
+                Filament=filament, inventory_balance__QuantityWeightAvailable__gt=0
+            )
+            .order_by("inventory_balance__PurchasedDate")
+            .first()
+        )
 
         if not raw_material:
             return JsonResponse(
@@ -377,20 +425,20 @@ def calculate_price(request, model_id, filament_id):
         weight_per_item = volume_cm3 * raw_material.MaterialDensity
         required_weight = int(weight_per_item * quantity * Decimal("1.15"))
 
+        # Any spool of the filament may fit, picked by the allocation policy
         inventory = InventoryChange.objects.find_for_weight(
             required_weight=required_weight,
             safety_margin=Decimal("1.0"),
-            raw_material=raw_material,
+            filament=filament,
         )
 
         if not inventory:
-            return JsonResponse(
-                {
-                    "status": "error",
-                    "message": "Not enough inventory available for the selected options",
-                },
-                status=400,
-            )
+            response_data = {
+                "status": "error",
+                "message": "Not enough inventory available for the selected options",
+            }
+            set_quote(cache_key, response_data, status=400)
+            return JsonResponse(response_data, status=400)
 
         temp_order_item = OrderItems(
             Model=model,
@@ -429,12 +477,104 @@ def calculate_price(request, model_id, filament_id):
             },
         }
 
+        set_quote(cache_key, response_data)
         return JsonResponse(response_data, json_dumps_params={"default": str})
 
     except Exception as e:
         return JsonResponse({"status": "error", "message": str(e)}, status=500)
 
 
+@require_http_methods(["GET"])
+def get_price_matrix(request, model_id):
+    """
+    API endpoint returning the price of a model for every stocked filament,
+    infill level (5-100%) and quantity from 1 to ?quantity (default 10),
+    so the customize page can price slider and quantity changes locally.
+    Prices are in cents and match calculate_price for the same selection.
+    """
+    model = get_object_or_404(Models, pk=model_id)
+    try:
+        max_quantity = int(request.GET.get("quantity", 10))
+    except ValueError:
+        max_quantity = 0
+    if not 1 <= max_quantity <= MAX_MATRIX_QUANTITY:
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": f"quantity must be between 1 and {MAX_MATRIX_QUANTITY}",
+            },
+            status=400,
+        )
+
+    return JsonResponse(
+        {"status": "success", **price_matrix(model, max_quantity=max_quantity)}
+    )
+
+
+def parse_integer(value, name):
+    """A whole number from the calculate_prices body; fractions are refused, not truncated"""
+    number = Decimal(str(value))
+    if not number.is_finite() or number != int(number):
+        raise ValueError(f"{name} must be an integer")
+    return int(number)
+
+
+def parse_configuration(config):
+    """A configuration of the calculate_prices body with checked values"""
+    infill = config.get("infill")
+    if infill is not None:
+        infill = Decimal(str(infill))
+        if not infill.is_finite():
+            raise ValueError("infill must be a number")
+    quantity = parse_integer(config.get("quantity", 1), "quantity")
+    if quantity < 1:
+        raise ValueError("quantity must be at least 1")
+    return {
+        "model": parse_integer(config["model"], "model"),
+        "filament": parse_integer(config["filament"], "filament"),
+        "infill": infill,
+        "quantity": quantity,
+    }
+
+
+@require_http_methods(["POST"])
+def calculate_prices(request):
+    """
+    API endpoint pricing many configurations in one request.
+    Expects a JSON body {"configurations": [{"model": id, "filament": id,
+    "infill": percentage, "quantity": n}, ...]}, where infill (default: the
+    model's base infill) and quantity (default 1) are optional, and returns
+    one calculate_price result per configuration, in order.
+    """
+    try:
+        payload = json.loads(request.body, parse_float=Decimal)
+        configurations = [
+            parse_configuration(config) for config in payload["configurations"]
+        ]
+    except (ValueError, TypeError, KeyError, AttributeError, InvalidOperation):
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": "Send JSON with configurations of integer model, filament "
+                "and quantity (at least 1) and a numeric infill",
+            },
+            status=400,
+        )
+    if not 1 <= len(configurations) <= MAX_CONFIGURATIONS:
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": f"Send between 1 and {MAX_CONFIGURATIONS} configurations",
+            },
+            status=400,
+        )
+
+    return JsonResponse(
+        {"status": "success", "prices": price_configurations(configurations)},
+        json_dumps_params={"default": str},
+    )
+
+
 def premade_gallery(request):
     """
     Gallery for premade items (OrderItems with no Order assigned)
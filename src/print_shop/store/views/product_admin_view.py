@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.http import JsonResponse
 from django.urls import reverse
@@ -13,6 +14,7 @@ from store.models import (
     Orders,
     FulfillmentStatus,
     InventoryChange,
+    InventoryBalance,
 )
 from store.forms.order_forms import AdminItemForm
 from store.views.cart_checkout_view import get_draft_order
@@ -21,6 +23,9 @@ from store.forms.order_forms import CustomOrderItemForm
 from store.views.gallery_view import get_available_inventory_items
 from decimal import Decimal
 
+# Most identical premade units created from one submission
+MAX_PREMADE_UNITS = 100
+
 
 def is_staff(user):
     """Check if user is staff"""
@@ -106,6 +111,19 @@ def add_premade_item(request):
             inventory_id = request.POST.get("InventoryChange")
             infill_multiplier = request.POST.get("InfillMultiplier")
             calculated_price = request.POST.get("calculated_price")
+            try:
+                units = int(request.POST.get("Units") or 1)
+            except ValueError:
+                units = 0
+
+            if not 1 <= units <= MAX_PREMADE_UNITS:
+                return JsonResponse(
+                    {
+                        "status": "error",
+                        "message": f"Units must be between 1 and {MAX_PREMADE_UNITS}",
+                    },
+                    status=400,
+                )
             
             if not model_id:
                 return JsonResponse(
@@ -165,7 +183,7 @@ def add_premade_item(request):
                 InfillMultiplier=infill_multiplier,
             )
             
-            total_weight = temp_order_item.calculate_required_weight()
+            total_weight = temp_order_item.calculate_required_weight() * units
             
             if not selected_inventory.RawMaterial.find_inventory_for_weight(total_weight):
                 return JsonResponse(
@@ -178,26 +196,38 @@ def add_premade_item(request):
                 
             price_components = temp_order_item.calculate_price_components()
             
-            order_item = OrderItems(
-                Model=model,
-                InventoryChange=selected_inventory,
-                InfillMultiplier=infill_multiplier,
-                ItemQuantity=1,
-                IsCustom=False,
-                TotalWeight=price_components["weight"],
-                CostOfGoodsSold=price_components["cost_of_goods"],
-                ItemPrice=price_components["price"],
+            # One ledger row for the spool however many units are printed from it
+            with InventoryBalance.objects.coalesce_ledger_writes():
+                for _ in range(units):
+                    OrderItems(
+                        Model=model,
+                        InventoryChange=selected_inventory,
+                        InfillMultiplier=infill_multiplier,
+                        ItemQuantity=1,
+                        IsCustom=False,
+                        TotalWeight=price_components["weight"],
+                        CostOfGoodsSold=price_components["cost_of_goods"],
+                        ItemPrice=price_components["price"],
+                    ).save()
+
+            created = (
+                f"{units} units of premade item '{model.Name}' were"
+                if units > 1
+                else f"Premade item '{model.Name}' was"
             )
-            order_item.save()
             
             return JsonResponse(
                 {
                     "status": "success",
-                    "message": f"Premade item '{model.Name}' was created successfully",
+                    "message": f"{created} created successfully",
                     "redirect_url": reverse("product-admin-premade-items"),
                 }
             )
             
+        except ValidationError as e:
+            return JsonResponse(
+                {"status": "error", "message": " ".join(e.messages)}, status=400
+            )
         except Exception as e:
             error_msg = f"Error creating premade item: {str(e)}"
             return JsonResponse({"status": "error", "message": error_msg}, status=400)
@@ -357,13 +387,17 @@ def edit_premade_item(request, pk):
                 
             price_components = temp_order_item.calculate_price_components()
             
+            previous_raw_material_id = item.InventoryChange.RawMaterial_id
+            previous_weight = item.TotalWeight
             item.Model = model
             item.InventoryChange = selected_inventory
             item.InfillMultiplier = infill_multiplier
             item.TotalWeight = price_components["weight"]
             item.CostOfGoodsSold = price_components["cost_of_goods"]
             item.ItemPrice = price_components["price"]
-            item.save()
+            with transaction.atomic():
+                item.save()
+                item.move_reservation(previous_raw_material_id, previous_weight)
             
             return JsonResponse(
                 {
@@ -373,6 +407,10 @@ def edit_premade_item(request, pk):
                 }
             )
             
+        except ValidationError as e:
+            return JsonResponse(
+                {"status": "error", "message": " ".join(e.messages)}, status=400
+            )
         except Exception as e:
             error_msg = f"Error updating premade item: {str(e)}"
             return JsonResponse({"status": "error", "message": error_msg}, status=400)
@@ -561,34 +599,36 @@ def generate_quote(request):
                     },
                     status=400,
                 )
-            original_user = request.user
-            request.user = customer
-
-            draft_order = get_draft_order(request) or Orders.objects.create(
-                User=customer,
-                TotalPrice=0,
-                ExpeditedService=False,
-                Shipping=None,
-            )
-            if original_user:
-                request.user = original_user
-
             calculated_price = request.POST.get("calculated_price")
 
             price_components = temp_order_item.calculate_price_components()
 
-            order_item = OrderItems(
-                Model=model,
-                InventoryChange=selected_inventory,
-                InfillMultiplier=infill_multiplier,
-                ItemQuantity=quantity,
-                IsCustom=True,
-                Order=draft_order,
-                TotalWeight=price_components["weight"],
-                CostOfGoodsSold=price_components["cost_of_goods"],
-                ItemPrice=price_components["price"],
-            )
-            order_item.save()
+            # A new draft order is only kept if the quote reserves its grams
+            with transaction.atomic():
+                original_user = request.user
+                request.user = customer
+
+                draft_order = get_draft_order(request) or Orders.objects.create(
+                    User=customer,
+                    TotalPrice=0,
+                    ExpeditedService=False,
+                    Shipping=None,
+                )
+                if original_user:
+                    request.user = original_user
+
+                order_item = OrderItems(
+                    Model=model,
+                    InventoryChange=selected_inventory,
+                    InfillMultiplier=infill_multiplier,
+                    ItemQuantity=quantity,
+                    IsCustom=True,
+                    Order=draft_order,
+                    TotalWeight=price_components["weight"],
+                    CostOfGoodsSold=price_components["cost_of_goods"],
+                    ItemPrice=price_components["price"],
+                )
+                order_item.save()
             return JsonResponse(
                 {
                     "status": "success",
@@ -597,6 +637,10 @@ def generate_quote(request):
                 }
             )
 
+        except ValidationError as e:
+            return JsonResponse(
+                {"status": "error", "message": " ".join(e.messages)}, status=400
+            )
         except Exception as e:
             error_msg = f"Error creating quote: {str(e)}"
             return JsonResponse({"status": "error", "message": error_msg}, status=400)